@@ -1,15 +1,57 @@
 import subprocess
+import time
 import tkinter as tk
 from tkinter import BOTH, filedialog, messagebox, simpledialog
 
-import psutil
-import requests
 import customtkinter as ctk
 import os
 
+from cloud_core import AdmissionError, CloudCore
+from container_bulk import BULK_ACTIONS, container_name, match_containers
+from container_model import ContainerDelta, ContainerTable
+from container_stats import POLL_WORKERS, SORT_KEYS, ContainerStats
+from disk_images import PREALLOCATION
+from docker_api import DockerClient, DockerConnectionError
+from docker_hub import DockerHubClient, HubSearch
+from progress_stream import BuildProgress, ProgressSnapshot, ProgressStream, PullProgress, format_bytes
+from pull_queue import dedupe_refs, load_refs, parse_refs
+from refresh_scheduler import RefreshScheduler
+from state_store import DEFAULT_STATE_PATH, StateReconciler, StateStore
+from task_runner import TaskRunner, current_token
+from view_router import ViewRouter
+from virtual_table import Column, VirtualTable
+from vm_manifest import load_manifest
+from vm_memory import BalloonController, ksm_merged_bytes, memory_args
+from vm_profiles import DEFAULT_PROFILE, PROFILES, QEMU_BINARY
+from vm_monitor import ResourceMonitor
+from vm_registry import new_vm_id, scan_qemu_processes
+from vm_snapshots import SnapshotManager
+
 
 class DesktopApplication(ctk.CTk):
-    def __init__(self):
+    # Lines of build/pull output kept in memory and in the log pane
+    LOG_LINES = 2000
+
+    # Seconds before a local image search also refreshes the image inventory
+    IMAGE_INVENTORY_MAX_AGE = 30
+
+    # VM chart choices: monitor metrics, caption and value format
+    VM_CHART_METRICS = {
+        "CPU %": (("cpu",), "CPU", lambda value: f"{value:.1f}%"),
+        "Memory": (("rss",), "Memory", lambda value: format_bytes(int(value))),
+        "Disk I/O": (("disk_read", "disk_write"), "Disk read / write", lambda value: f"{format_bytes(int(value))}/s"),
+        "Network": (("net_rx", "net_tx"), "Network rx / tx", lambda value: f"{format_bytes(int(value))}/s"),
+    }
+
+    # Columns of the inventory tables (widths in characters)
+    IMAGE_COLUMNS = [Column("IMAGE", 40), Column("IMAGE ID", 12), Column("SIZE", 10, "e", format_bytes)]
+    CONTAINER_COLUMNS = [Column("CONTAINER ID", 12, format=lambda container_id: container_id[:12]),
+                         Column("IMAGE", 28), Column("STATE", 10), Column("STATUS", 24), Column("NAMES", 28)]
+    VM_COLUMNS = [Column("NAME", 20), Column("ID", 10), Column("PID", 8, "e"), Column("STATE", 22),
+                  Column("DISK", 36), Column("RECLAIMED", 24), Column("PORTS", 14)]
+    HUB_COLUMNS = [Column("NAME", 24), Column("REPOSITORY", 40), Column("STARS", 8, "e")]
+
+    def __init__(self, state_path=DEFAULT_STATE_PATH):
         super().__init__()
 
         # Set consistent color scheme
@@ -26,13 +68,146 @@ class DesktopApplication(ctk.CTk):
         self.cpu_var = ctk.StringVar(value="1")
         self.memory_var = ctk.StringVar(value="1024")
         self.disk_var = ctk.StringVar()
+        self.vm_profile_var = ctk.StringVar(value=DEFAULT_PROFILE)
+        self.linked_clone_var = ctk.BooleanVar(value=False)
+        self.selected_vm_var = ctk.StringVar()
+        self.snapshot_var = ctk.StringVar()
+        self.cpu_overcommit_var = ctk.StringVar(value="1.0")
+        self.memory_overcommit_var = ctk.StringVar(value="1.0")
+        self.pin_vcpus_var = ctk.BooleanVar(value=True)
+        self.hugepages_var = ctk.BooleanVar(value=False)
+        self.balloon_var = ctk.BooleanVar(value=True)
+        self.ksm_merge_var = ctk.BooleanVar(value=True)
+        self.start_ksm_var = ctk.BooleanVar(value=False)
+        self.manifest_concurrency_var = ctk.StringVar(value="4")
+        self.convert_format_var = ctk.StringVar(value="qcow2")
+        self.preallocation_var = ctk.StringVar(value="off")
+        self.cluster_size_var = ctk.StringVar(value="64K")
+        self.compress_image_var = ctk.BooleanVar(value=False)
+        for var in (self.cpu_var, self.memory_var, self.disk_var, self.vm_profile_var,
+                    self.hugepages_var, self.balloon_var, self.ksm_merge_var):
+            var.trace_add("write", self.update_vm_command_preview)
 
         # Docker-related Variables
         self.dockerfile_path_var = ctk.StringVar()
         self.docker_image_name_var = ctk.StringVar()
+        self.pull_concurrency_var = ctk.StringVar(value="3")
+        # Bulk container operations: action, parallelism, stop grace period and the match filters
+        self.bulk_action_var = ctk.StringVar(value="stop")
+        self.bulk_concurrency_var = ctk.StringVar(value="8")
+        self.bulk_timeout_var = ctk.StringVar(value="10")
+        self.bulk_label_var = ctk.StringVar()
+        self.bulk_name_var = ctk.StringVar()
+        self.bulk_status_var = ctk.StringVar(value="any")
+
+        # Background worker pool for docker/qemu commands
+        self.tasks = TaskRunner(self, max_workers=4)
+
+        # The VM and Docker engine (shared with the cloudctl command line); its callbacks come back on the Tk thread
+        self.core = CloudCore(
+            on_vm_exit=lambda record: self.tasks.post(self._vm_exited, record),
+            on_vm_event=lambda vm_id, event: self.tasks.post(self._vm_event, (vm_id, event)),
+            spawn=lambda watch: self.tasks.spawn(watch, name="vm-registry")
+        )
+        self.docker = self.core.docker
+        self.clone_manager = self.core.clone_manager
+        self.disk_images = self.core.disk_images
+        self.vm_scheduler = self.core.vm_scheduler
+        self.vm_registry = self.core.vm_registry
+        self.qmp = self.core.qmp
+        self.image_inventory = self.core.image_inventory
+        self.disk_var.trace_add("write", self._probe_disk)
+        for var in (self.cpu_overcommit_var, self.memory_overcommit_var, self.pin_vcpus_var):
+            var.trace_add("write", self._apply_scheduler_settings)
+
+        # QEMU processes already running are adopted at startup
+        self.tasks.submit(lambda: list(scan_qemu_processes()), on_success=self._adopt_vms,
+                          name="reconcile-vms")
+        self._vm_status = {}
+
+        # Saved VM states to resume from instead of cold-booting
+        self.vm_snapshots = SnapshotManager(self.qmp, self.clone_manager)
+        self._snapshots = {}
+
+        # Sampled CPU/memory/disk/network history of every VM, charted in the VM panel
+        self.vm_monitor = ResourceMonitor(self.vm_registry, self.qmp,
+                                          on_sample=lambda vm_ids: self.tasks.post(self._vm_sampled, vm_ids))
+        self._vm_monitor_task = None
+
+        # Balloon policy reclaiming guest memory while the host is under memory pressure
+        self.balloon = BalloonController(self.vm_registry, self.qmp)
+        self._balloon_task = None
+
+        # Per-VM state of a running manifest batch, shown above the VM list
+        self._provisioning = {}
+        self.vm_chart_metric_var = ctk.StringVar(value="CPU %")
+        self.vm_monitor_interval_var = ctk.StringVar(value="2")
+        self.vm_monitor_interval_var.trace_add("write", self._set_vm_monitor_interval)
+        for var in (self.selected_vm_var, self.vm_chart_metric_var):
+            var.trace_add("write", lambda *args: self.draw_vm_chart())
+
+        # Live container table fed by the Docker events stream
+        self.container_table = ContainerTable(self.docker)
+        self._container_watch = None
+
+        # Last-known VMs/images/containers on disk: views render from it at once while the reconciler rescans
+        self.state_store = StateStore(state_path)
+        self.state_reconciler = StateReconciler(self.state_store)
+        self.state_reconciler.add_source("image", lambda: {image["Id"]: image for image in self.docker.images()})
+        self.state_reconciler.add_source(
+            "container", lambda: {container["Id"]: container for container in self.docker.containers(all=True)})
+        self.state_reconciler.add_source("vm", self._vm_state)
+        self._known_vms = None
+        self._load_state()
+
+        # Sampled resource usage of running containers, on its own small pool so polls never starve other calls
+        self.container_stats = ContainerStats(DockerClient(pool_size=POLL_WORKERS))
+        self.stats_sort_var = ctk.StringVar(value="cpu")
+        self.stats_top_var = ctk.StringVar(value="10")
+        self._stats_after = None
+
+        # Cached Docker Hub search client; set DOCKER_HUB_CACHE_DIR to keep results on disk
+        self.docker_hub = DockerHubClient(cache_dir=os.environ.get("DOCKER_HUB_CACHE_DIR"))
+        self._hub_pager = None
+        self._hub_typeahead = None
+        self.hub_page_size_var = ctk.StringVar(value="25")
+
+        # Polls the lists of the section on screen; each interval adapts to how often its list changes
+        self.refresh = RefreshScheduler(self, self.tasks)
+        self.refresh.register("vm", self._poll_vm_status, self._apply_vm_status, interval=5.0)
+        self.refresh.register("image", self._reconcile_images, lambda changes: self._show_docker_images(),
+                              interval=10.0, min_interval=5.0, max_interval=120.0)
+        self.refresh.register("container", self._poll_containers, self.apply_container_delta, interval=5.0)
+
+        # Sections are built on their first visit and kept; beyond the cap the least recently used is destroyed
+        self.views = ViewRouter(capacity=4)
+        self.views.register("home", self._build_homepage, pack=dict(expand=True, fill=BOTH, padx=20, pady=20),
+                            pinned=True)
+        self.views.register("vm", self._build_vm_section, pack=dict(expand=True, fill=ctk.BOTH, padx=40, pady=40),
+                            on_show=self._vm_section_shown, on_hide=lambda: self.refresh.pause("vm"))
+        self.views.register("docker_files", self._build_docker_files_section,
+                            pack=dict(expand=True, fill=ctk.BOTH, padx=20, pady=20, anchor='center'))
+        self.views.register("docker_hub", self._build_docker_hub_section,
+                            pack=dict(expand=True, fill=ctk.BOTH, padx=20, pady=20), on_evict=self._cancel_hub_search)
+        self.views.register("containers", self._build_containers_section,
+                            pack=dict(expand=True, fill=ctk.BOTH, padx=20, pady=20),
+                            on_show=self._containers_section_shown, on_hide=self._containers_section_hidden)
+        self.views.register("docker_control", self._build_docker_control_panel, pack=dict(expand=True, fill=ctk.BOTH))
 
         self.homepage()
 
+    def destroy(self):
+        """Cancel background work before tearing down the window"""
+        if self._stats_after is not None:
+            self.after_cancel(self._stats_after)
+        self.refresh.close()
+        self.tasks.shutdown()
+        self.core.close()
+        self.container_stats.close()
+        self.docker_hub.close()
+        self.state_store.close()
+        super().destroy()
+
     def add_return_button(self, frame, r, c):
         """Add a button to return to the homepage"""
         return_btn = ctk.CTkButton(
@@ -44,17 +219,24 @@ class DesktopApplication(ctk.CTk):
         )
         return_btn.grid(row=r, column=c, padx=10, pady=10)
 
+    def add_table_filter(self, frame, table, r, c, width=200):
+        """Add an entry that filters the rows of `table` as the user types"""
+        filter_entry = ctk.CTkEntry(frame, placeholder_text="Filter...", width=width)
+        filter_entry.bind("<KeyRelease>", lambda event: table.set_filter(filter_entry.get()))
+        filter_entry.grid(row=r, column=c, padx=5, pady=5, sticky='e')
+        return filter_entry
+
     def return_to_homepage(self, frame):
-        """Return to the homepage"""
-        if frame:
-            frame.pack_forget()  # Hide current frame
-            self.homepage()  # Recreate and show homepage
+        """Return to the homepage; `frame` stays cached for the next visit"""
+        self.homepage()
 
     def homepage(self):
         """Display the homepage with Application Features"""
+        self.views.show("home")
+
+    def _build_homepage(self):
         # Create homepage frame
         self.homepage_frame = ctk.CTkFrame(self, bg_color=self.GREEN_LIGHT, fg_color=self.GREEN_LIGHT)
-        self.homepage_frame.pack(expand=True, fill=BOTH, padx=20, pady=20)
 
         self.hompage_label = ctk.CTkLabel(self.homepage_frame, text="Cloud Management System",
                                           font=('Helvetica', 20, 'bold'))
@@ -82,16 +264,15 @@ class DesktopApplication(ctk.CTk):
                                 border_color="#00BCD4" 
                                 )
             btn.pack(padx=10, pady=20)
+        return self.homepage_frame
 
     def show_vm_section(self):
         """Display Virtual Machine configuration section"""
-        # Hide the homepage
-        if self.homepage_frame:
-            self.homepage_frame.pack_forget()
+        self.views.show("vm")
 
+    def _build_vm_section(self):
         # VM Configuration Frame
         self.vm_frame = ctk.CTkFrame(self, bg_color='#121212', fg_color='#121212')
-        self.vm_frame.pack(expand=True, fill=ctk.BOTH, padx=40, pady=40)
 
         # Title
         title_label = ctk.CTkLabel(self.vm_frame, text="Virtual Machine Configuration",
@@ -125,6 +306,72 @@ class DesktopApplication(ctk.CTk):
           corner_radius=20, border_width=2, border_color="#00BCD4")
         browse_btn.grid(row=3, column=1, padx=10, pady=10, sticky='w')
 
+        # Performance Profile
+        profile_label = ctk.CTkLabel(config_frame, text="Performance Profile:", font=('Helvetica', 16, 'bold'))
+        profile_label.grid(row=4, column=0, padx=10, pady=10, sticky='e')
+        profile_menu = ctk.CTkOptionMenu(config_frame, variable=self.vm_profile_var, values=list(PROFILES), width=160)
+        profile_menu.grid(row=4, column=1, padx=10, pady=10, sticky='w')
+
+        # Linked Clone (qcow2 overlay on top of the selected image)
+        clone_check = ctk.CTkCheckBox(config_frame, text="Boot a linked clone of this image",
+                                      variable=self.linked_clone_var, onvalue=True, offvalue=False)
+        clone_check.grid(row=5, column=0, columnspan=2, padx=10, pady=10, sticky='w')
+
+        clone_buttons = ctk.CTkFrame(config_frame, bg_color='#121212', fg_color='#121212')
+        clone_buttons.grid(row=6, column=0, columnspan=2, padx=10, pady=5, sticky='w')
+        flatten_btn = ctk.CTkButton(clone_buttons, text="Flatten Clone", command=self.flatten_clone,
+                                    bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=140)
+        flatten_btn.grid(row=0, column=0, padx=5)
+        commit_btn = ctk.CTkButton(clone_buttons, text="Commit Clone", command=self.commit_clone,
+                                   bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=140)
+        commit_btn.grid(row=0, column=1, padx=5)
+
+        # Admission control: how far VMs may overcommit the host, and dedicated cores per vCPU
+        overcommit_label = ctk.CTkLabel(config_frame, text="Overcommit CPU / RAM:", font=('Helvetica', 16, 'bold'))
+        overcommit_label.grid(row=7, column=0, padx=10, pady=10, sticky='e')
+        overcommit_frame = ctk.CTkFrame(config_frame, bg_color='#121212', fg_color='#121212')
+        overcommit_frame.grid(row=7, column=1, padx=10, pady=10, sticky='w')
+        cpu_overcommit_entry = ctk.CTkEntry(overcommit_frame, textvariable=self.cpu_overcommit_var, width=75)
+        cpu_overcommit_entry.grid(row=0, column=0, padx=(0, 10))
+        memory_overcommit_entry = ctk.CTkEntry(overcommit_frame, textvariable=self.memory_overcommit_var, width=75)
+        memory_overcommit_entry.grid(row=0, column=1)
+        pin_check = ctk.CTkCheckBox(config_frame, text="Pin vCPUs to dedicated host cores (no CPU overcommit)",
+                                    variable=self.pin_vcpus_var, onvalue=True, offvalue=False)
+        pin_check.grid(row=8, column=0, columnspan=2, padx=10, pady=10, sticky='w')
+
+        # Memory density: hugepage backing, balloon reclaim and KSM page merging
+        memory_frame = ctk.CTkFrame(config_frame, bg_color='#121212', fg_color='#121212')
+        memory_frame.grid(row=9, column=0, columnspan=2, padx=10, pady=5, sticky='w')
+        for column, (text, var) in enumerate([("Hugepages", self.hugepages_var), ("Balloon", self.balloon_var),
+                                              ("KSM merging", self.ksm_merge_var),
+                                              ("Start host KSM", self.start_ksm_var)]):
+            check = ctk.CTkCheckBox(memory_frame, text=text, variable=var, onvalue=True, offvalue=False)
+            check.grid(row=0, column=column, padx=(0, 10), sticky='w')
+
+        # Disk image tools: inspect the layout, convert with preallocation/compression/cluster size
+        image_frame = ctk.CTkFrame(config_frame, bg_color='#121212', fg_color='#121212')
+        image_frame.grid(row=10, column=0, columnspan=2, padx=10, pady=5, sticky='w')
+        inspect_btn = ctk.CTkButton(image_frame, text="Inspect Image", command=self.inspect_disk_image,
+                                    bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=120)
+        inspect_btn.grid(row=0, column=0, padx=5)
+        convert_btn = ctk.CTkButton(image_frame, text="Convert Image", command=self.convert_disk_image,
+                                    bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=120)
+        convert_btn.grid(row=0, column=1, padx=5)
+        for column, (var, values) in enumerate([
+            (self.convert_format_var, list(PREALLOCATION)),
+            (self.preallocation_var, list(PREALLOCATION["qcow2"])),
+            (self.cluster_size_var, ["64K", "128K", "256K", "1M", "2M"]),
+        ]):
+            menu = ctk.CTkOptionMenu(image_frame, variable=var, values=values, width=80)
+            menu.grid(row=1, column=column, padx=5, pady=5)
+        compress_check = ctk.CTkCheckBox(image_frame, text="Compress", variable=self.compress_image_var,
+                                         onvalue=True, offvalue=False)
+        compress_check.grid(row=1, column=3, padx=5, pady=5)
+
         # Action Buttons Frame (for Create and List VM buttons)
         action_frame = ctk.CTkFrame(self.vm_frame, bg_color='#121212', fg_color='#121212')
         action_frame.grid(row=2, column=10, columnspan=3, padx=20, pady=20, sticky='nsew')
@@ -140,12 +387,90 @@ class DesktopApplication(ctk.CTk):
           corner_radius=20, border_width=2, border_color="#00BCD4", width=200)
         list_vms_btn.grid(row=0, column=1, padx=10, pady=10, sticky='nsew')
 
-        # VM Listbox
-        self.vm_listbox = ctk.CTkTextbox(action_frame, width=400, height=100)  # Use self.vm_listbox
+        # VM table: selecting a running VM picks it for the controls below
+        self.vm_listbox = VirtualTable(action_frame, self.VM_COLUMNS, width=400, height=100, selectmode="browse",
+                                       placeholder="No running virtual machines found.",
+                                       on_select=self._vm_row_selected)
         self.vm_listbox.grid(row=1, column=0, columnspan=2, padx=20, pady=20, sticky='nsew')
+        self.add_table_filter(action_frame, self.vm_listbox, r=0, c=2, width=140)
+
+        # Controls for the selected VM (over its QMP socket)
+        control_frame = ctk.CTkFrame(action_frame, bg_color='#121212', fg_color='#121212')
+        control_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=5, sticky='nsew')
+        self.vm_select_menu = ctk.CTkOptionMenu(control_frame, variable=self.selected_vm_var, values=[""], width=200)
+        self.vm_select_menu.grid(row=0, column=0, padx=5)
+        for column, (text, command) in enumerate([
+            ("Pause", lambda: self.control_vm("pause")),
+            ("Resume", lambda: self.control_vm("resume")),
+            ("Shut Down", lambda: self.control_vm("powerdown")),
+            ("Stats", self.show_vm_stats),
+        ], start=1):
+            btn = ctk.CTkButton(control_frame, text=text, command=command, bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=90)
+            btn.grid(row=0, column=column, padx=5)
+
+        # Snapshots: save the selected VM, resume new VMs from a saved state
+        snapshot_frame = ctk.CTkFrame(action_frame, bg_color='#121212', fg_color='#121212')
+        snapshot_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky='nsew')
+        for column, (text, command) in enumerate([
+            ("Save State", lambda: self.save_vm_snapshot("state")),
+            ("Save Internal", lambda: self.save_vm_snapshot("internal")),
+        ]):
+            btn = ctk.CTkButton(snapshot_frame, text=text, command=command, bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=100)
+            btn.grid(row=0, column=column, padx=5)
+        self.snapshot_menu = ctk.CTkOptionMenu(snapshot_frame, variable=self.snapshot_var, values=[""], width=180)
+        self.snapshot_menu.grid(row=0, column=2, padx=5)
+        for column, (text, command) in enumerate([
+            ("Refresh", self.refresh_snapshots),
+            ("Launch From Snapshot", self.launch_from_snapshot),
+        ], start=3):
+            btn = ctk.CTkButton(snapshot_frame, text=text, command=command, bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=100)
+            btn.grid(row=0, column=column, padx=5)
+
+        # Batch provisioning from a JSON/YAML manifest
+        manifest_frame = ctk.CTkFrame(action_frame, bg_color='#121212', fg_color='#121212')
+        manifest_frame.grid(row=4, column=0, columnspan=2, padx=10, pady=5, sticky='nsew')
+        manifest_btn = ctk.CTkButton(manifest_frame, text="Launch Manifest", command=self.launch_manifest,
+                                     bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=140)
+        manifest_btn.grid(row=0, column=0, padx=5)
+        boots_label = ctk.CTkLabel(manifest_frame, text="Parallel boots:")
+        boots_label.grid(row=0, column=1, padx=5, sticky='e')
+        boots_entry = ctk.CTkEntry(manifest_frame, textvariable=self.manifest_concurrency_var, width=50)
+        boots_entry.grid(row=0, column=2, padx=5, sticky='w')
+
+        # QEMU command preview (flags chosen by the profile and host capabilities)
+        self.vm_command_preview = ctk.CTkTextbox(self.vm_frame, width=400, height=90)
+        self.vm_command_preview.grid(row=3, column=10, columnspan=3, padx=20, pady=10, sticky='nsew')
+
+        # Live resource chart of the selected VM
+        chart_frame = ctk.CTkFrame(self.vm_frame, bg_color='#121212', fg_color='#121212')
+        chart_frame.grid(row=4, column=10, columnspan=3, padx=20, pady=10, sticky='nsew')
+        chart_menu = ctk.CTkOptionMenu(chart_frame, variable=self.vm_chart_metric_var,
+                                       values=list(self.VM_CHART_METRICS), width=120)
+        chart_menu.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        interval_label = ctk.CTkLabel(chart_frame, text="Sample every (s):")
+        interval_label.grid(row=0, column=1, padx=5, pady=5, sticky='e')
+        interval_menu = ctk.CTkOptionMenu(chart_frame, variable=self.vm_monitor_interval_var,
+                                          values=["1", "2", "5", "10", "30"], width=70)
+        interval_menu.grid(row=0, column=2, padx=5, pady=5, sticky='w')
+        self.vm_chart = tk.Canvas(chart_frame, width=400, height=120, bg='#121212', highlightthickness=0)
+        self.vm_chart.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky='nsew')
+        self._vm_chart_items = None
 
         # Add return button
-        self.add_return_button(self.vm_frame, 4, 10)
+        self.add_return_button(self.vm_frame, 5, 10)
+        return self.vm_frame
+
+    def _vm_section_shown(self):
+        """Bring the (possibly cached) VM section up to date"""
+        self.update_vm_command_preview()
+        self._ensure_vm_monitor()
+        self.render_vms()
+        self.draw_vm_chart()
+        self.refresh.resume("vm")
 
     def browse_disk(self):
         """Open file dialog to select disk image"""
@@ -178,73 +503,571 @@ class DesktopApplication(ctk.CTk):
                 messagebox.showerror("Error", "Disk image file does not exist!")
                 return
 
-            # Prepare QEMU command
-            qemu_cmd = [
-                "qemu-system-x86_64",
-                f"-smp", str(cpu),
-                f"-m", str(memory),
-                f"-drive", f"file={disk},format=qcow2" if disk.endswith(".qcow2") else f"file={disk},format=raw",
-                "-vga", "virtio",
-                "-net", "nic",
-                "-net", "user"
-            ]
-
-            # Launch VM
-            subprocess.Popen(qemu_cmd)
-            messagebox.showinfo("Success", "Virtual machine launched!")
+            if self.linked_clone_var.get():
+                # Boot from a fresh copy-on-write overlay instead of the shared base image
+                self.tasks.submit(
+                    self.clone_manager.create_clone, disk,
+                    on_success=lambda overlay: self.launch_vm(cpu, memory, overlay),
+                    on_error=lambda e: self.report_vm_error("Failed to create linked clone", e),
+                    name="create-clone"
+                )
+                return
 
-            # Refresh VM list
-            self.list_vms()
+            self.launch_vm(cpu, memory, disk)
 
         except ValueError:
             messagebox.showerror("Error", "Please enter valid numeric values for CPU and memory.")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
-    def list_vms(self):
-        """List existing virtual machines by checking QEMU processes"""
-        self.vm_listbox.delete("1.0", "end")
+    def launch_vm(self, cpu, memory, disk, qemu_cmd=None, snapshot=None, queued=False):
+        """Launch QEMU for a validated configuration, or with the saved command of a state snapshot.
+
+        `queued` marks a launch started from the scheduler queue; if it still does not fit it goes back to the head.
+        """
+        vm_id = new_vm_id()
+        restore = self.vm_snapshots.restore_args(snapshot) if snapshot is not None and qemu_cmd is None else ()
         try:
-            # Get all running QEMU processes
-            running_vms = self.get_running_vms()
+            # Admission control inside: only launch what the host can run without thrashing
+            launch = self.core.launch_vm(cpu, memory, disk, self.vm_profile_var.get(), self._memory_options(),
+                                         extra_args=restore, vm_id=vm_id, qemu_cmd=qemu_cmd)
+        except AdmissionError as e:
+            if e.admission.decision == "queue":
+                position = self.vm_scheduler.enqueue(
+                    e.vcpus, e.memory, lambda: self.launch_vm(cpu, memory, disk, qemu_cmd, snapshot, queued=True),
+                    front=queued)
+                if not queued:
+                    messagebox.showinfo("Queued", f"VM queued at position {position}: {e.admission.reason}. "
+                                                  "It starts when enough running VMs exit.")
+            else:
+                messagebox.showerror("Error", f"{str(e)}.")
+            return
+        except Exception as e:
+            if self.vm_registry.get(vm_id) is None:
+                self._release_vm(vm_id)
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            return
 
-            if not running_vms:
-                self.vm_listbox.insert(ctk.END, "No running virtual machines found.")
+        self.show_vm_command(launch.command, launch.notes)
+        self._vm_started(launch)
+        if snapshot is not None and snapshot.kind == "state":
+            # Start the guest once its RAM has been loaded from the state file
+            self.tasks.submit(
+                lambda: (launch.connected.result(30), self.vm_snapshots.finish_restore(vm_id)),
+                on_success=lambda result: self.list_vms(),
+                on_error=lambda e: self.report_vm_error("Failed to resume VM from snapshot", e),
+                name="finish-restore"
+            )
+        messagebox.showinfo("Success", "Virtual machine launched!")
+
+        # Refresh VM list
+        self.list_vms()
+
+    def _memory_options(self):
+        """Guest RAM settings of the VM form, read on the Tk thread for launches from workers"""
+        return {"hugepages": self.hugepages_var.get(), "merge": self.ksm_merge_var.get(),
+                "balloon": self.balloon_var.get(), "start_ksm": self.start_ksm_var.get()}
+
+    def _vm_started(self, launch):
+        """Start monitoring a launched VM and pin it to its cores"""
+        self._ensure_vm_monitor()
+        self._save_vm_state()
+        if launch.cores:
+            # Keep the VM on its cores now, then give each vCPU thread its own core once QMP names them
+            self.vm_scheduler.pin_process(launch.pid, launch.cores)
+            self.tasks.submit(self.core.pin_vcpus, launch.vm_id, launch.pid, launch.cores, launch.connected,
+                              name="pin-vcpus")
+
+    def _release_vm(self, vm_id):
+        """Free a VM's scheduler allocation and start the queued launches that fit now"""
+        for launch in self.core.release_vm(vm_id):
+            launch()
+
+    def launch_manifest(self):
+        """Provision every VM of a JSON/YAML manifest: linked clones, cloud-init seeds, bounded parallel boots"""
+        file_path = filedialog.askopenfilename(
+            title="Select VM Manifest",
+            filetypes=(("VM Manifests", "*.json *.yaml *.yml"), ("All Files", "*.*"))
+        )
+        if not file_path:
+            return
+        try:
+            specs = load_manifest(file_path)
+            concurrency = int(self.manifest_concurrency_var.get())
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Invalid manifest: {str(e)}")
+            return
+        missing = sorted({spec.image for spec in specs if not os.path.exists(spec.image)})
+        if missing:
+            messagebox.showerror("Error", "Base images do not exist:\n" + "\n".join(missing))
+            return
+
+        self._provisioning = {spec.name: "queued" for spec in specs}
+        self.render_vms()
+
+        def provisioned(report):
+            self._provisioning = {}
+            self.list_vms()
+            lines = [f"{len(report.ready)}/{len(report.results)} VMs ready in {report.seconds:.1f}s"]
+            lines += [f"{result.name}: ready after {result.seconds:.1f}s" for result in report.ready]
+            lines += [f"{result.name}: {result.error}" for result in report.failed]
+            if report.failed:
+                messagebox.showerror("Error", "Some VMs failed to start:\n" + "\n".join(lines))
             else:
-                # Display the list of running VMs
-                for vm in running_vms:
-                    self.vm_listbox.insert(ctk.END, f"VM Name: {vm}\n")
+                messagebox.showinfo("Success", "\n".join(lines))
+
+        def failed(e):
+            self._provisioning = {}
+            self.render_vms()
+            self.report_vm_error("Failed to provision manifest", e)
+
+        # Runs in a worker: everything the core reports back goes through post()
+        self.tasks.submit(
+            self.core.provision, specs, concurrency, self.vm_profile_var.get(), self._memory_options(),
+            lambda name, state, result: self.tasks.post(self._show_provisioning, (name, state, result)),
+            lambda launch: self.tasks.post(self._vm_started, launch),
+            lambda vm_id: self.tasks.post(self._release_vm, vm_id),
+            on_success=provisioned, on_error=failed, name="provision-manifest"
+        )
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An unexpected error occurred: {e}")
+    def _show_provisioning(self, update):
+        name, state, result = update
+        if name in self._provisioning:
+            self._provisioning[name] = state if result is None else f"{state} after {result.seconds:.1f}s"
+            self.render_vms()
+
+    def _apply_scheduler_settings(self, *args):
+        """Push the overcommit/pinning settings of the VM form into the scheduler"""
+        try:
+            self.vm_scheduler.cpu_overcommit = max(0.1, float(self.cpu_overcommit_var.get()))
+            self.vm_scheduler.memory_overcommit = max(0.1, float(self.memory_overcommit_var.get()))
+        except ValueError:
+            pass
+        self.vm_scheduler.pin = self.pin_vcpus_var.get()
+
+    def report_vm_error(self, message, error):
+        """Show the error of a failed background qemu/qemu-img command"""
+        if isinstance(error, FileNotFoundError) and error.filename in ("qemu-img", QEMU_BINARY):
+            messagebox.showerror("Error", "QEMU is not installed or not in PATH.")
+        elif isinstance(error, subprocess.CalledProcessError):
+            messagebox.showerror("Error", f"{message}:\n{(error.stderr or str(error)).strip()}")
+        else:
+            messagebox.showerror("Error", f"{message}: {str(error)}")
+
+    def _probe_disk(self, *args):
+        """Probe the selected image in the background so launches and the preview use its real format"""
+        disk = self.disk_var.get()
+        if not os.path.isfile(disk) or self.disk_images.cached(disk) is not None:
+            return
+        self.tasks.submit(self.disk_images.info, disk, on_success=lambda info: self.update_vm_command_preview(),
+                          name="probe-disk")
+
+    def inspect_disk_image(self):
+        """Show the probed layout of the selected image and the layout that gives it the best I/O"""
+        disk = self.disk_var.get()
+        if not os.path.isfile(disk):
+            messagebox.showerror("Error", "Disk image file does not exist!")
+            return
+
+        def show(result):
+            info, layout = result
+            options = [f"format={layout.format}"]
+            if layout.preallocation:
+                options.append(f"preallocation={layout.preallocation}")
+            if layout.cluster_size:
+                options.append(f"cluster_size={layout.cluster_size // 1024}K")
+            if layout.extended_l2:
+                options.append("extended_l2=on")
+            lines = [
+                f"Format: {info.format}",
+                f"Virtual size: {format_bytes(info.virtual_size)}",
+                f"On disk: {format_bytes(info.actual_size)}",
+            ]
+            if info.cluster_size:
+                lines.append(f"Cluster size: {info.cluster_size // 1024}K" + (" (subclusters)" if info.extended_l2 else ""))
+            if info.backing:
+                lines.append(f"Backing image: {info.backing}")
+            lines += ["", "Best layout: " + ", ".join(options)] + layout.reasons
+            messagebox.showinfo("Disk Image", "\n".join(lines))
+
+        self.tasks.submit(
+            lambda: (self.disk_images.info(disk), self.disk_images.recommend(disk)),
+            on_success=show,
+            on_error=lambda e: self.report_vm_error("Failed to inspect disk image", e),
+            name="inspect-disk"
+        )
+
+    def convert_disk_image(self):
+        """Convert the selected image into a new file with the chosen format and layout"""
+        disk = self.disk_var.get()
+        if not os.path.isfile(disk):
+            messagebox.showerror("Error", "Disk image file does not exist!")
+            return
+        fmt = self.convert_format_var.get()
+        target = filedialog.asksaveasfilename(
+            title="Save Converted Image",
+            initialfile=f"{os.path.splitext(os.path.basename(disk))[0]}-converted.{'qcow2' if fmt == 'qcow2' else 'img'}",
+            filetypes=(("Disk Images", "*.qcow2 *.img"), ("All Files", "*.*"))
+        )
+        if not target:
+            return
+        cluster = self.cluster_size_var.get()
+        cluster_size = int(cluster[:-1]) * (1024 if cluster.endswith("K") else 2 ** 20)
+        options = {
+            "compress": self.compress_image_var.get(),
+            "preallocation": None if self.preallocation_var.get() == "off" else self.preallocation_var.get(),
+            # Only pass a non-default cluster size, so raw targets accept the default menu value
+            "cluster_size": cluster_size if fmt == "qcow2" and cluster != "64K" else None,
+        }
+
+        def converted(info):
+            self.disk_var.set(target)
+            messagebox.showinfo("Success", f"Converted to {info.format}: {format_bytes(info.actual_size)} on disk "
+                                           f"for {format_bytes(info.virtual_size)} virtual.")
+
+        self.tasks.submit(
+            self.disk_images.convert, disk, target, fmt, **options,
+            on_success=converted,
+            on_error=lambda e: messagebox.showerror("Error", str(e)) if isinstance(e, ValueError)
+            else self.report_vm_error("Failed to convert disk image", e),
+            name="convert-disk"
+        )
+
+    def flatten_clone(self):
+        """Make the selected linked clone independent of its base image"""
+        disk = self.disk_var.get()
+        if not self.clone_manager.is_clone(disk):
+            messagebox.showerror("Error", "Select a linked clone from the clone directory first.")
+            return
+        self.tasks.submit(
+            self.clone_manager.flatten, disk,
+            on_success=lambda result: messagebox.showinfo("Success", f"{os.path.basename(disk)} is now standalone."),
+            on_error=lambda e: self.report_vm_error("Failed to flatten clone", e),
+            name="flatten-clone"
+        )
+
+    def commit_clone(self):
+        """Write the selected linked clone's changes back into its base image"""
+        disk = self.disk_var.get()
+        if not self.clone_manager.is_clone(disk):
+            messagebox.showerror("Error", "Select a linked clone from the clone directory first.")
+            return
+        if not messagebox.askyesno("Commit Clone",
+                                   "This rewrites the base image and affects every clone made from it. Continue?"):
+            return
+        self.tasks.submit(
+            self.clone_manager.commit, disk,
+            on_success=lambda result: messagebox.showinfo("Success", "Clone committed into its base image."),
+            on_error=lambda e: self.report_vm_error("Failed to commit clone", e),
+            name="commit-clone"
+        )
+
+    def update_vm_command_preview(self, *args):
+        """Show the QEMU flags the current form would launch with"""
+        try:
+            cpu = int(self.cpu_var.get())
+            memory = int(self.memory_var.get())
+        except ValueError:
+            self.show_vm_command(None, ["Enter numeric values for CPU and memory."])
+            return
+        disk = self.disk_var.get() or "<disk image>"
+        qemu_cmd, notes = self.core.vm_command(cpu, memory, disk, self.vm_profile_var.get())
+        info = self.disk_images.cached(disk) if self.disk_var.get() else None
+        if info is not None:
+            notes = [f"Image: {info.format}, {format_bytes(info.virtual_size)} virtual, "
+                     f"{format_bytes(info.actual_size)} on disk"] + notes
+        backing, memory_notes = memory_args(memory, hugepages=self.hugepages_var.get(),
+                                            merge=self.ksm_merge_var.get(), balloon=self.balloon_var.get())
+        self.show_vm_command(qemu_cmd + backing, notes + memory_notes)
+
+    def show_vm_command(self, qemu_cmd, notes):
+        preview = getattr(self, "vm_command_preview", None)
+        if preview is None or not preview.winfo_exists():
+            return
+        text = " ".join(qemu_cmd) if qemu_cmd else ""
+        if notes:
+            text = "\n".join(notes + [text])
+        preview.configure(state="normal")
+        preview.delete("1.0", "end")
+        preview.insert("end", text)
+        preview.configure(state="disabled")
+
+    def _load_state(self):
+        """Seed the in-memory models with the last-known state from the store"""
+        self.image_inventory.update(list(self.state_store.load("image").values()))
+        # Still refresh before answering searches from it
+        self.image_inventory.loaded_at = None
+        self.container_table.resync(sorted(self.state_store.load("container").values(),
+                                           key=lambda container: container.get("Created", 0), reverse=True))
+        self._known_vms = self.state_store.load("vm")
+
+    def _vm_state(self):
+        """Running VMs as stored in the state store, keyed by their QEMU -name"""
+        return {vm.name: {"vm_id": vm.vm_id, "disk": vm.disk, "pid": vm.pid if isinstance(vm.pid, int) else None,
+                          "ports": list(vm.ports)}
+                for vm in self.vm_registry.running()}
+
+    def _save_vm_state(self):
+        self.tasks.submit(self.state_reconciler.reconcile, "vm", name="save-vm-state")
+
+    def list_vms(self):
+        """List the virtual machines in the VM registry and refresh their QMP state"""
+        self.render_vms()
+        self.refresh.request("vm")
+
+    def _poll_vm_status(self):
+        """QMP run state of the VMs whose state differs from the one shown (runs in a worker)"""
+        if not self.qmp.connected():
+            return {}
+        shown = dict(self._vm_status)
+        statuses = self.qmp.query_all("query-status")
+        return {vm_id: status["status"] for vm_id, status in statuses.items()
+                if isinstance(status, dict) and shown.get(vm_id) != status["status"]}
+
+    def _apply_vm_status(self, changes):
+        if changes:
+            self._vm_status.update(changes)
+            self.render_vms()
+
+    def render_vms(self):
+        """Update the VM table with the running, provisioning and last-known VMs in one batch"""
+        listbox = getattr(self, "vm_listbox", None)
+        if listbox is None or not listbox.winfo_exists():
+            return
+        running_vms = self.get_running_vms()
+        self.vm_select_menu.configure(values=[f"{vm.vm_id} {vm.name}" for vm in running_vms] or [""])
+        if self.selected_vm_var.get().split(" ")[0] not in {vm.vm_id for vm in running_vms}:
+            self.selected_vm_var.set(f"{running_vms[0].vm_id} {running_vms[0].name}" if running_vms else "")
+
+        rows = [(f"provisioning:{name}", (name, None, None, f"provisioning: {state}", None, None, None))
+                for name, state in self._provisioning.items()]
+        # Until the process scan at startup finishes, show what was running last time
+        rows += [(f"known:{name}", (name, vm.get("vm_id"), vm["pid"], "last known, checking", vm["disk"], None, None))
+                 for name, vm in (self._known_vms or {}).items()
+                 if name not in {running.name for running in running_vms}]
+        for vm in running_vms:
+            state = self._vm_status.get(vm.vm_id, "running")
+            if vm.adopted:
+                state += " (found running)"
+            reclaimed = [f"{label} {format_bytes(size)}" for label, size in
+                         (("balloon", self.balloon.reclaimed(vm.vm_id)), ("KSM", ksm_merged_bytes(vm.pid))) if size]
+            rows.append((vm.vm_id, (vm.name, vm.vm_id, vm.pid, state, vm.disk, ", ".join(reclaimed) or None,
+                                    ", ".join(map(str, vm.ports)) or None)))
+        listbox.sync(rows)
+
+    def _vm_row_selected(self, keys):
+        """Pick the VM selected in the table for the VM controls"""
+        vm = self.vm_registry.get(keys[0]) if keys else None
+        if vm is not None:
+            self.selected_vm_var.set(f"{vm.vm_id} {vm.name}")
 
     def get_running_vms(self):
-        """Get a list of running virtual machines by checking QEMU processes"""
-        running_vms = []
-
-        # Check running QEMU processes
-        for proc in psutil.process_iter(attrs=['pid', 'name', 'cmdline']):
-            if 'qemu-system-x86_64' in proc.info['name']:  # Filter for QEMU processes
-                # Extract VM name or disk image from command line
-                cmdline = proc.info['cmdline']
-                if cmdline and len(cmdline) > 2:
-                    # Get the disk image path or any other info that can represent the VM
-                    disk_path = [arg for arg in cmdline if arg.startswith('file=')]
-                    if disk_path:
-                        disk_path = disk_path[0].split('=')[1]  # Extract the file path from the argument
-                        running_vms.append(disk_path)  # You can customize this as needed (e.g., VM name or ID)
-
-        return running_vms
+        """Running VMs, straight from the registry (no process table scan)"""
+        return self.vm_registry.running()
+
+    def _adopt_vms(self, processes):
+        """Track QEMU processes found at startup and reattach to their QMP sockets"""
+        adopted = self.core.adopt_vms(processes)
+        self._known_vms = None
+        self._save_vm_state()
+        self.render_vms()
+        if adopted:
+            self._ensure_vm_monitor()
+
+    def _vm_exited(self, record):
+        """Refresh the VM list when a tracked VM exits"""
+        self.qmp.disconnect(record.vm_id)
+        self._vm_status.pop(record.vm_id, None)
+        self.vm_monitor.forget(record.vm_id)
+        self.balloon.forget(record.vm_id)
+        self._save_vm_state()
+        self.render_vms()
+        self.draw_vm_chart()
+        # Start queued launches that fit now
+        self._release_vm(record.vm_id)
+
+    def _vm_event(self, update):
+        """Track run state from asynchronous QMP events"""
+        vm_id, event = update
+        state = {"STOP": "paused", "RESUME": "running", "POWERDOWN": "shutting down",
+                 "SHUTDOWN": "shutdown"}.get(event["event"])
+        if state:
+            self._vm_status[vm_id] = state
+            self.render_vms()
+
+    def _selected_vm(self):
+        vm_id = self.selected_vm_var.get().split(" ")[0]
+        if vm_id not in self.qmp.connected():
+            messagebox.showerror("Error", "Select a running VM with a QMP connection first.")
+            return None
+        return vm_id
+
+    def control_vm(self, action):
+        """Pause, resume or cleanly shut down the selected VM"""
+        vm_id = self._selected_vm()
+        if vm_id is None:
+            return
+        labels = {"pause": "pause", "resume": "resume", "powerdown": "shut down"}
+        self.tasks.submit(
+            self.core.control_vm, vm_id, action,
+            on_success=lambda result: self.list_vms(),
+            on_error=lambda e: self.report_vm_error(f"Failed to {labels[action]} VM", e),
+            name=f"vm-{action}"
+        )
+
+    def show_vm_stats(self):
+        """Show CPU time and block I/O counters of the selected VM"""
+        vm_id = self._selected_vm()
+        if vm_id is None:
+            return
+
+        def show(counters):
+            messagebox.showinfo("VM Stats", "\n".join([
+                f"vCPUs: {counters['vcpus']}",
+                f"CPU time: {counters['cpu_seconds']:.1f} s",
+                f"Disk read: {format_bytes(counters['rd_bytes'])} ({counters['rd_operations']} ops)",
+                f"Disk written: {format_bytes(counters['wr_bytes'])} ({counters['wr_operations']} ops)",
+            ]))
+
+        self.tasks.submit(self.qmp.counters, vm_id, on_success=show,
+                          on_error=lambda e: self.report_vm_error("Failed to read VM stats", e), name="vm-stats")
+
+    def save_vm_snapshot(self, kind):
+        """Save the selected VM as a state snapshot (RAM file + frozen disk) or a qcow2 internal snapshot"""
+        vm_id = self._selected_vm()
+        if vm_id is None:
+            return
+        record = self.vm_registry.get(vm_id)
+        if kind == "internal" and not record.disk.endswith(".qcow2"):
+            messagebox.showerror("Error", "Internal snapshots need a qcow2 disk image.")
+            return
+        name = simpledialog.askstring("Save Snapshot", "Snapshot name:")
+        if not name:
+            return
+        if not name.replace("-", "").replace("_", "").isalnum():
+            messagebox.showerror("Error", "Use only letters, digits, '-' and '_' in snapshot names.")
+            return
+
+        save = self.vm_snapshots.save_state if kind == "state" else self.vm_snapshots.save_internal
+        self.tasks.submit(
+            save, record, name,
+            on_success=lambda snapshot: (messagebox.showinfo("Success", f"Snapshot '{name}' saved."),
+                                         self.refresh_snapshots(), self.list_vms()),
+            on_error=lambda e: self.report_vm_error("Failed to save snapshot", e),
+            name="save-snapshot"
+        )
+
+    def refresh_snapshots(self):
+        """List the snapshots of the selected disk image (all state snapshots without one)"""
+        self.tasks.submit(
+            self.vm_snapshots.list, self.disk_var.get() or None,
+            on_success=self._show_snapshots,
+            on_error=lambda e: self.report_vm_error("Failed to list snapshots", e),
+            name="list-snapshots"
+        )
+
+    def _show_snapshots(self, snapshots):
+        self._snapshots = {f"{snapshot.name} ({snapshot.kind})": snapshot for snapshot in snapshots}
+        menu = getattr(self, "snapshot_menu", None)
+        if menu is None or not menu.winfo_exists():
+            return
+        menu.configure(values=list(self._snapshots) or [""])
+        if self.snapshot_var.get() not in self._snapshots:
+            self.snapshot_var.set(next(iter(self._snapshots), ""))
+
+    def launch_from_snapshot(self):
+        """Start a new VM from the selected snapshot instead of booting it"""
+        snapshot = self._snapshots.get(self.snapshot_var.get())
+        if snapshot is None:
+            messagebox.showerror("Error", "Select a snapshot first (Refresh lists them).")
+            return
+        if snapshot.kind == "internal":
+            # -loadvm needs the same CPU/memory/profile the snapshot was saved with
+            try:
+                cpu, memory = int(self.cpu_var.get()), int(self.memory_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Please enter valid numeric values for CPU and memory.")
+                return
+            self.launch_vm(cpu, memory, snapshot.disk, snapshot=snapshot)
+            return
+        self.tasks.submit(
+            self.vm_snapshots.prepare_restore, snapshot,
+            on_success=lambda prepared: self.launch_vm(None, None, prepared[1], qemu_cmd=prepared[0],
+                                                       snapshot=snapshot),
+            on_error=lambda e: self.report_vm_error("Failed to prepare snapshot disk", e),
+            name="prepare-restore"
+        )
+
+    def _ensure_vm_monitor(self):
+        """Start resource sampling and the balloon policy unless they are already running"""
+        if self._vm_monitor_task is None or self._vm_monitor_task.done():
+            self._vm_monitor_task = self.tasks.spawn(self.vm_monitor.run, on_error=self._vm_monitor_failed,
+                                                     name="vm-monitor")
+        if self._balloon_task is None or self._balloon_task.done():
+            self._balloon_task = self.tasks.spawn(self.balloon.run, name="vm-balloon")
+
+    def _vm_monitor_failed(self, error):
+        """Restart sampling after an unexpected error, one interval later so a persistent fault cannot spin"""
+        self.after(int(self.vm_monitor.interval * 1000), self._ensure_vm_monitor)
+
+    def _set_vm_monitor_interval(self, *args):
+        try:
+            self.vm_monitor.interval = max(0.5, float(self.vm_monitor_interval_var.get()))
+        except ValueError:
+            pass
+
+    def _vm_sampled(self, vm_ids):
+        # A hidden VM section is redrawn when it is shown again
+        if self.views.current == "vm" and self.selected_vm_var.get().split(" ")[0] in vm_ids:
+            self.draw_vm_chart()
+
+    def draw_vm_chart(self):
+        """Plot the selected metric of the selected VM, one point per canvas pixel at most"""
+        canvas = getattr(self, "vm_chart", None)
+        if canvas is None or not canvas.winfo_exists():
+            return
+        width = max(canvas.winfo_width(), int(canvas["width"]))
+        height = max(canvas.winfo_height(), int(canvas["height"]))
+        if self._vm_chart_items is None:
+            # Reuse the same canvas items and only move their coordinates on every redraw
+            self._vm_chart_items = {
+                "lines": [canvas.create_line(0, 0, 0, 0, fill=color, width=2) for color in ('#00BCD4', '#FFB300')],
+                "label": canvas.create_text(8, 8, anchor="nw", fill="white", font=('Helvetica', 10)),
+            }
+        items = self._vm_chart_items
+
+        vm_id = self.selected_vm_var.get().split(" ")[0]
+        metrics, label, formatter = self.VM_CHART_METRICS[self.vm_chart_metric_var.get()]
+        series = []
+        for metric in metrics:
+            history = self.vm_monitor.history(vm_id, metric)
+            series.append(history.series(points=width // 2) if history else [])
+
+        values = [value for points in series for _, value in points]
+        top = max(values + [100.0 if metrics == ("cpu",) else 1.0])
+        start = min((points[0][0] for points in series if points), default=0)
+        end = max((points[-1][0] for points in series if points), default=0)
+        span = max(end - start, 1e-6)
+        for line, points in zip(items["lines"], series):
+            if len(points) < 2:
+                canvas.coords(line, 0, 0, 0, 0)
+                continue
+            coords = []
+            for timestamp, value in points:
+                coords += [(timestamp - start) / span * (width - 4) + 2, height - 2 - value / top * (height - 24)]
+            canvas.coords(line, *coords)
+
+        latest = [points[-1][1] for points in series if points]
+        text = f"{label}: " + " / ".join(formatter(value) for value in latest) if latest else "No samples yet"
+        canvas.itemconfigure(items["label"], text=text)
 
     def show_docker_files_section(self):
         """Display Docker Files section"""
-        # Remove homepage frame
-        if self.homepage_frame:
-            self.homepage_frame.destroy()
+        self.views.show("docker_files")
 
+    def _build_docker_files_section(self):
         # Docker Files Frame
         self.docker_frame = ctk.CTkFrame(self, bg_color='#121212', fg_color='#121212')
-        self.docker_frame.pack(expand=True, fill=ctk.BOTH, padx=20, pady=20, anchor='center')
 
         # Title
         title_label = ctk.CTkLabel(self.docker_frame, text="Docker Files Management", font=('Helvetica', 16, 'bold'))
@@ -299,6 +1122,7 @@ class DesktopApplication(ctk.CTk):
 
         # Add return button
         self.add_return_button(self.docker_frame, 3, 10)
+        return self.docker_frame
 
     def set_dockerfile_path(self):
         """Set path for Dockerfile"""
@@ -343,13 +1167,11 @@ class DesktopApplication(ctk.CTk):
 
     def display_docker_hub_section(self):
         """Display Docker Hub section"""
-        # Clear previous content
-        if self.homepage_frame:
-            self.homepage_frame.destroy()
+        self.views.show("docker_hub")
 
+    def _build_docker_hub_section(self):
         # Docker Hub Frame
         self.hub_frame = ctk.CTkFrame(self, bg_color='#121212', fg_color='#121212')
-        self.hub_frame.pack(expand=True, fill=ctk.BOTH, padx=20, pady=20)
 
         # Search Frame
         search_frame = ctk.CTkFrame(self.hub_frame, bg_color='#121212', fg_color='#121212')
@@ -373,52 +1195,163 @@ class DesktopApplication(ctk.CTk):
         )
         search_btn.grid(row=0, column=2)
 
+        # Search as you type; superseded searches are cancelled
+        search_entry.bind("<KeyRelease>", lambda event: self._schedule_hub_search(search_entry))
+        search_entry.bind("<Return>", lambda event: self.search_docker_hub(search_entry.get()))
+
         # Configure grid weights for `search_frame`
         search_frame.grid_columnconfigure(1, weight=1)  # Allow search entry to expand
 
-        # Results Textbox
-        self.docker_hub_listbox = ctk.CTkTextbox(self.hub_frame, width=400, height=100)
+        # Results table; the next page is fetched when the user scrolls to the bottom of the results
+        self.docker_hub_listbox = VirtualTable(self.hub_frame, self.HUB_COLUMNS, width=400, height=100,
+                                               on_scroll=self._hub_scrolled)
         self.docker_hub_listbox.grid(row=1, column=0, padx=10, pady=10, sticky='nsew')
+        self.add_table_filter(search_frame, self.docker_hub_listbox, r=0, c=3, width=140)
+
+        # Paging Frame
+        paging_frame = ctk.CTkFrame(self.hub_frame, bg_color='#121212', fg_color='#121212')
+        paging_frame.grid(row=2, column=0, padx=10, pady=5, sticky='ew')
+
+        self.hub_status_label = ctk.CTkLabel(paging_frame, text="")
+        self.hub_status_label.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+
+        page_size_label = ctk.CTkLabel(paging_frame, text="Results per page:")
+        page_size_label.grid(row=0, column=1, padx=5, pady=5, sticky='e')
+
+        page_size_menu = ctk.CTkOptionMenu(paging_frame, variable=self.hub_page_size_var,
+                                           values=["10", "25", "50", "100"], width=80)
+        page_size_menu.grid(row=0, column=2, padx=5, pady=5)
+
+        self.hub_more_button = ctk.CTkButton(paging_frame, text="Load More", command=self.load_more_docker_hub,
+                                             bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4", width=100, state="disabled")
+        self.hub_more_button.grid(row=0, column=3, padx=5, pady=5)
+
+        paging_frame.grid_columnconfigure(0, weight=1)
 
         # Configure grid weights for `hub_frame`
-        self.hub_frame.grid_rowconfigure(1, weight=1)  # Results textbox expands vertically
-        self.hub_frame.grid_columnconfigure(0, weight=1)  # Results textbox expands horizontally
+        self.hub_frame.grid_rowconfigure(1, weight=1)  # Results table expands vertically
+        self.hub_frame.grid_columnconfigure(0, weight=1)  # Results table expands horizontally
 
         # Add return button
-        self.add_return_button(self.hub_frame, r=2, c=0)
+        self.add_return_button(self.hub_frame, r=3, c=0)
+        return self.hub_frame
+
+    def _cancel_hub_search(self):
+        """Stop the pending typeahead and page fetches of the current search"""
+        if self._hub_typeahead is not None:
+            self.after_cancel(self._hub_typeahead)
+            self._hub_typeahead = None
+        if self._hub_pager is not None:
+            self._hub_pager.cancel()
+            self._hub_pager = None
 
     def search_docker_hub(self, query):
         """Search Docker Hub for images"""
-        self.docker_hub_listbox.delete("1.0", "end")  # Clear previous results
-        try:
-            # Query the Docker Hub API
-            response = requests.get(f"https://hub.docker.com/v2/search/repositories/?query={query}")
-            response.raise_for_status()
-            results = response.json().get('results', [])
+        # A new search supersedes whatever is still in flight
+        self._cancel_hub_search()
 
-            if not results:
-                self.docker_hub_listbox.insert("end", "No results found.\n")
-                return
+        self.docker_hub_listbox.clear(placeholder="")  # Clear previous results
+        if not query.strip():
+            self.docker_hub_listbox.clear(placeholder="No results found.")
+            self._update_hub_status()
+            return
 
-            # Insert container names into the textbox
-            for result in results:
-                container_name = result.get('name', 'N/A')  # Adjust the key if necessary
-                repo_name = result.get('repo_name', 'N/A')
-                stars = result.get('star_count', 0)
-                self.docker_hub_listbox.insert("end",
-                                               f"Container: {container_name} | Repository: {repo_name} | Stars: {stars}\n")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to search Docker Hub: {str(e)}")
+        # Results are fetched page by page in the background (or served from the cache)
+        self._hub_pager = HubSearch(self.docker_hub, query, page_size=int(self.hub_page_size_var.get()))
+        self.load_more_docker_hub()
+
+    def load_more_docker_hub(self):
+        """Show the next page of the current Docker Hub search"""
+        pager = self._hub_pager
+        if pager is None:
+            return
+        self._fetch_hub_pages(pager, pager.want_next())
+        # The page may already have been prefetched
+        self._show_docker_hub_results(pager)
+
+    def _fetch_hub_pages(self, pager, pages):
+        for page in pages:
+            pager.tasks.append(self.tasks.submit(
+                pager.fetch, page,
+                on_success=lambda response, page=page: self._hub_page_loaded(pager, page, response),
+                on_error=lambda e, page=page: self._hub_page_failed(pager, page, e),
+                name="docker-hub-search"
+            ))
+
+    def _hub_page_loaded(self, pager, page, response):
+        if pager is not self._hub_pager:
+            return  # Superseded search
+        pager.add_page(page, response)
+        self._show_docker_hub_results(pager)
+        # Now that the result count is known, prefetch ahead
+        self._fetch_hub_pages(pager, pager.pages_to_fetch())
+
+    def _hub_page_failed(self, pager, page, error):
+        if pager is not self._hub_pager:
+            return
+        pager.page_failed(page)
+        # Failed prefetches are retried silently when the page is actually wanted
+        if page <= pager.rendered + 1:
+            messagebox.showerror("Error", f"Failed to search Docker Hub: {str(error)}")
+        self._update_hub_status()
+
+    def _show_docker_hub_results(self, pager):
+        """Append the rows of every page that is ready to the results table"""
+        if not self.docker_hub_listbox.winfo_exists():
+            return
+        results = pager.take_ready()
+
+        if pager.rendered and not pager.rows:
+            self.docker_hub_listbox.clear(placeholder="No results found.")
+        elif results:
+            # Rows are keyed by their position in the results, so pages append in order
+            first = self.docker_hub_listbox.model.total()
+            self.docker_hub_listbox.apply([
+                (first + offset, (result.get('name', 'N/A'), result.get('repo_name', 'N/A'),
+                                  result.get('star_count', 0)))
+                for offset, result in enumerate(results)
+            ])
+        self._update_hub_status()
+
+    def _update_hub_status(self):
+        pager = self._hub_pager
+        if not getattr(self, "hub_status_label", None) or not self.hub_status_label.winfo_exists():
+            return
+        if pager is None or not pager.rows:
+            self.hub_status_label.configure(text="")
+        else:
+            total = pager.count if pager.count is not None else pager.rows
+            self.hub_status_label.configure(text=f"Showing {pager.rows} of {total} results")
+        more = pager is not None and pager.rendered and pager.has_more
+        self.hub_more_button.configure(state="normal" if more else "disabled")
+
+    def _hub_scrolled(self):
+        """Load the next page once the results are scrolled near the bottom"""
+        pager = self._hub_pager
+        if pager is None or not pager.rendered or not pager.has_more:
+            return
+        if self.docker_hub_listbox.yview()[1] >= 0.95:
+            self.load_more_docker_hub()
+
+    def _schedule_hub_search(self, entry):
+        """Search as the user types, once they pause for a moment"""
+        if self._hub_typeahead is not None:
+            self.after_cancel(self._hub_typeahead)
+        self._hub_typeahead = self.after(400, lambda: self._typeahead_search(entry))
+
+    def _typeahead_search(self, entry):
+        self._hub_typeahead = None
+        if entry.winfo_exists() and entry.get().strip():
+            self.search_docker_hub(entry.get())
 
     def show_containers_section(self):
         """Display Containers Management section"""
-        # Remove homepage frame
-        if self.homepage_frame:
-            self.homepage_frame.destroy()
+        self.views.show("containers")
 
+    def _build_containers_section(self):
         # Containers Frame
         self.containers_frame = ctk.CTkFrame(self, bg_color='#121212', fg_color='#121212')
-        self.containers_frame.pack(expand=True, fill=ctk.BOTH, padx=20, pady=20)
 
         # Frame Label
         title_label = ctk.CTkLabel(self.containers_frame, text="Docker Containers Management",
@@ -448,73 +1381,234 @@ class DesktopApplication(ctk.CTk):
         images_label = ctk.CTkLabel(list_frame, text="Docker Images:")
         images_label.grid(row=0, column=0, padx=5, pady=5, sticky='w')
 
-        self.images_listbox = ctk.CTkTextbox(list_frame, width=200, height=100)
-        self.images_listbox.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
+        self.images_listbox = VirtualTable(list_frame, self.IMAGE_COLUMNS, width=200, height=100,
+                                           placeholder="No Docker images found.")
+        self.images_listbox.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        self.add_table_filter(list_frame, self.images_listbox, r=0, c=1)
 
         # Containers Label and Listbox
         containers_label = ctk.CTkLabel(list_frame, text="Docker Containers:")
         containers_label.grid(row=2, column=0, padx=5, pady=5, sticky='w')
 
-        self.containers_listbox = ctk.CTkTextbox(list_frame, width=200, height=100)
-        self.containers_listbox.grid(row=3, column=0, padx=5, pady=5, sticky="nsew")
+        self.containers_listbox = VirtualTable(list_frame, self.CONTAINER_COLUMNS, width=200, height=100,
+                                               placeholder="No containers found.")
+        self.containers_listbox.grid(row=3, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
+        self.add_table_filter(list_frame, self.containers_listbox, r=2, c=1)
 
         # Make the list_frame grid expand properly
         list_frame.grid_rowconfigure(1, weight=1)
         list_frame.grid_rowconfigure(3, weight=1)
         list_frame.grid_columnconfigure(0, weight=1)
 
+        # Bulk operations on the selected containers or on every container matching the filters
+        bulk_frame = ctk.CTkFrame(self.containers_frame, bg_color='#121212', fg_color='#121212')
+        bulk_frame.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky='w')
+        action_menu = ctk.CTkOptionMenu(bulk_frame, variable=self.bulk_action_var, values=list(BULK_ACTIONS), width=90)
+        action_menu.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        for column, (text, var, width) in enumerate((("Parallel:", self.bulk_concurrency_var, 40),
+                                                     ("Timeout (s):", self.bulk_timeout_var, 40),
+                                                     ("Label:", self.bulk_label_var, 120),
+                                                     ("Name:", self.bulk_name_var, 100))):
+            label = ctk.CTkLabel(bulk_frame, text=text)
+            label.grid(row=0, column=1 + 2 * column, padx=(10, 2), pady=5, sticky='e')
+            entry = ctk.CTkEntry(bulk_frame, textvariable=var, width=width)
+            entry.grid(row=0, column=2 + 2 * column, pady=5, sticky='w')
+        status_menu = ctk.CTkOptionMenu(bulk_frame, variable=self.bulk_status_var, width=90,
+                                        values=["any", "running", "exited", "paused", "created", "restarting"])
+        status_menu.grid(row=0, column=9, padx=5, pady=5, sticky='w')
+        for column, (text, command) in enumerate((("Apply to Selected", self.bulk_selected_containers),
+                                                  ("Apply to Matching", self.bulk_matching_containers),
+                                                  ("Prune Stopped", self.prune_containers))):
+            button = ctk.CTkButton(bulk_frame, text=text, command=command, bg_color="transparent",
+                                   hover_color='#26C6DA', corner_radius=20, border_width=2, border_color="#00BCD4",
+                                   width=120)
+            button.grid(row=0, column=10 + column, padx=5, pady=5)
+
+        # Top-N container resource usage, streamed from the daemon
+        stats_frame = ctk.CTkFrame(self.containers_frame, bg_color='#121212', fg_color='#121212')
+        stats_frame.grid(row=4, column=0, columnspan=2, padx=10, pady=10, sticky='nsew')
+        stats_label = ctk.CTkLabel(stats_frame, text="Container Stats - sort by:")
+        stats_label.grid(row=0, column=0, padx=5, pady=5, sticky='w')
+        sort_menu = ctk.CTkOptionMenu(stats_frame, variable=self.stats_sort_var, values=list(SORT_KEYS), width=90,
+                                      command=lambda value: self.render_container_stats())
+        sort_menu.grid(row=0, column=1, padx=5, pady=5, sticky='w')
+        top_label = ctk.CTkLabel(stats_frame, text="Show top:")
+        top_label.grid(row=0, column=2, padx=5, pady=5, sticky='e')
+        top_menu = ctk.CTkOptionMenu(stats_frame, variable=self.stats_top_var, values=["5", "10", "25", "50"], width=70,
+                                     command=lambda value: self.render_container_stats())
+        top_menu.grid(row=0, column=3, padx=5, pady=5, sticky='w')
+        self.stats_listbox = ctk.CTkTextbox(stats_frame, width=600, height=120, font=('Courier', 12))
+        self.stats_listbox.grid(row=1, column=0, columnspan=4, padx=5, pady=5, sticky='nsew')
+        stats_frame.grid_columnconfigure(3, weight=1)
+
         # Add return button
-        self.add_return_button(self.containers_frame, r=3, c=0)
+        self.add_return_button(self.containers_frame, r=5, c=0)
+        return self.containers_frame
+
+    def _containers_section_shown(self):
+        self.render_container_stats()
+
+        # Show the live table (or the last-known state) straight away, then keep reconciling it in the
+        # background while the section is on screen (errors stay quiet here; the list buttons report them)
+        if len(self.image_inventory):
+            self._show_docker_images()
+        self.render_containers()
+        self.refresh.resume("image", "container")
+
+    def _containers_section_hidden(self):
+        self._stop_stats_view()
+        self.refresh.pause("image", "container")
 
     def list_docker_images(self):
         """List all Docker images on the system"""
-        self.images_listbox.delete("1.0", "end")  # Clear the listbox
-        try:
-            # Run `docker images` command
-            result = subprocess.run(["docker", "images"], capture_output=True, text=True, check=True)
-            output = result.stdout.strip().split('\n')
-
-            # Skip the header and add images
-            if len(output) > 1:
-                for line in output[1:]:  # Skip header
-                    columns = line.split()  # Adjust as necessary for your output format
-                    if columns:
-                        self.images_listbox.insert("end", f"{columns[0]}:{columns[1]}\n")
-            else:
-                self.images_listbox.insert("end", "No Docker images found.")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to list Docker images: {str(e)}")
-        except FileNotFoundError:
-            messagebox.showerror("Error", "Docker is not installed or not in PATH.")
+        # Sync the image inventory and the state store with the Docker Engine API in the background
+        self.refresh.request("image", on_error=lambda e: self.report_docker_error("Failed to list Docker images", e))
+
+    def _reconcile_images(self):
+        """Fetch the image list once, store what changed and re-index the inventory"""
+        images, _ = self.state_reconciler.reconcile("image")
+        return self.image_inventory.update(list(images.values()))
+
+    def _reconcile_containers(self):
+        """Fetch the container list once, store what changed and diff it into the live table"""
+        containers, _ = self.state_reconciler.reconcile("container")
+        return self.container_table.resync(list(containers.values()))
+
+    def _poll_containers(self):
+        """Resync the container table, unless the events stream already keeps it current"""
+        watch = self._container_watch
+        if watch is not None and not watch.done():
+            return ContainerDelta([], [], [])
+        return self._reconcile_containers()
+
+    def _show_docker_images(self):
+        """Render the image inventory in the images table"""
+        listbox = getattr(self, "images_listbox", None)
+        if listbox is None or not listbox.winfo_exists():
+            return
+        self.images_listbox.sync((record.id, (", ".join(record.names), record.short_id, record.size))
+                                 for record in self.image_inventory.records())
+
+    def refresh_image_inventory(self):
+        """Pick up images added or removed by a pull/build without blocking the UI"""
+        self.refresh.request("image")
 
     def list_docker_containers(self):
         """List Docker containers in the listbox."""
-        self.containers_listbox.delete("1.0", "end")  # Clear the listbox
-        try:
-            # Run the `docker ps -a` command
-            result = subprocess.run(["docker", "ps", "-a"], capture_output=True, text=True, check=True)
-            containers = result.stdout.strip().split('\n')
+        if self._container_watch is not None and not self._container_watch.done():
+            # The live table is already current; just redraw it
+            self.render_containers()
+            return
 
-            if len(containers) > 1:  # If there are containers
-                header = containers[0]  # Header row
-                self.containers_listbox.insert("end", f"{header}\n{'-' * len(header)}\n")
+        # One snapshot, then incremental updates from the Docker events stream
+        self._container_watch = self.tasks.spawn(
+            self.container_table.watch,
+            lambda delta: self.tasks.post(self.apply_container_delta, delta),
+            on_error=lambda e: self.report_docker_error("Failed to list containers", e),
+            name="container-events"
+        )
 
-                for container in containers[1:]:  # Skip the header
-                    self.containers_listbox.insert("end", f"{container}\n")
-            else:
-                self.containers_listbox.insert("end", "No containers found.\n")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to list containers: {str(e)}")
-        except FileNotFoundError:
+    def render_containers(self):
+        """Load the whole live container table into the containers table"""
+        if not self._containers_listbox_alive():
+            return
+        self.containers_listbox.set_rows((container["Id"], self.container_cells(container))
+                                         for container in self.container_table.rows())
+
+    def apply_container_delta(self, delta):
+        """Update only the table rows of containers that changed"""
+        self.sync_container_stats()
+        if any(delta):
+            containers = {container["Id"]: container for container in self.container_table.rows()}
+            self.tasks.submit(self.state_store.sync, "container", containers, time.monotonic(),
+                              name="save-containers")
+        if not self._containers_listbox_alive():
+            return
+        if not self.containers_listbox.model.total():
+            # First render: load the table whole
+            self.render_containers()
+            return
+
+        upserts = []
+        for container_id in delta.added + delta.updated:
+            container = self.container_table.get(container_id)
+            if container is not None:
+                upserts.append((container_id, self.container_cells(container)))
+        self.containers_listbox.apply(upserts, delta.removed)
+
+    def sync_container_stats(self):
+        """Sample stats of exactly the containers the live table shows as running"""
+        self.container_stats.sync(
+            [container["Id"] for container in self.container_table.rows() if container.get("State") == "running"])
+
+    def _stop_stats_view(self):
+        """Stop redrawing the stats table while the containers section is hidden"""
+        if self._stats_after is not None:
+            self.after_cancel(self._stats_after)
+            self._stats_after = None
+
+    def render_container_stats(self):
+        """Redraw the top-N stats table; repeats every second while the table is on screen"""
+        self._stop_stats_view()
+        listbox = getattr(self, "stats_listbox", None)
+        if listbox is None or not listbox.winfo_exists():
+            return
+
+        rows = self.container_stats.top(int(self.stats_top_var.get()), self.stats_sort_var.get())
+        lines = [self.format_stats_row(None)]
+        for container_id, sample, network, block in rows:
+            container = self.container_table.get(container_id) or {}
+            lines.append(self.format_stats_row((container_id, container, sample, network, block)))
+        if not rows:
+            lines.append("No stats yet: list containers to start sampling them.\n"
+                         if not self.container_stats.watched() else "Waiting for samples...\n")
+
+        listbox.delete("1.0", "end")
+        listbox.insert("end", "".join(lines))
+        self._stats_after = self.after(1000, self.render_container_stats)
+
+    @staticmethod
+    def format_stats_row(row):
+        """Format one top-N stats row (or the header row when `row` is None) as a fixed-width line"""
+        if row is None:
+            columns = ("CONTAINER ID", "NAME", "CPU %", "MEM USAGE", "MEM %", "NET I/O", "BLOCK I/O", "PIDS")
+        else:
+            container_id, container, sample, network, block = row
+            name = ",".join(name.lstrip("/") for name in container.get("Names") or [])
+            memory_percent = sample.memory / sample.memory_limit * 100 if sample.memory_limit else 0.0
+            columns = (container_id[:12], name[:24], f"{sample.cpu_percent:.1f}%", format_bytes(sample.memory),
+                       f"{memory_percent:.1f}%", f"{format_bytes(int(network))}/s", f"{format_bytes(int(block))}/s",
+                       sample.pids)
+        return "{:<14}{:<26}{:>8}  {:<12}{:>7}  {:<14}{:<14}{}\n".format(*columns)
+
+    def _containers_listbox_alive(self):
+        listbox = getattr(self, "containers_listbox", None)
+        return listbox is not None and listbox.winfo_exists()
+
+    @staticmethod
+    def container_cells(container):
+        """The CONTAINER_COLUMNS cells of one container"""
+        return (container["Id"], container.get("Image", ""), container.get("State", ""),
+                container.get("Status", ""), container_name(container))
+
+    def report_docker_error(self, message, error):
+        """Show the error of a failed background docker command"""
+        if isinstance(error, FileNotFoundError):
             messagebox.showerror("Error", "Docker is not installed or not in PATH.")
+        elif isinstance(error, DockerConnectionError):
+            messagebox.showerror("Error", f"Docker is not running or not reachable:\n{str(error)}")
+        elif isinstance(error, subprocess.CalledProcessError):
+            messagebox.showerror("Error", f"{message}:\n{(error.stderr or str(error)).strip()}")
+        else:
+            messagebox.showerror("Error", f"{message}: {str(error)}")
 
     def docker_control_panel(self):
-        if self.homepage_frame:
-            self.homepage_frame.destroy()
+        """Display the Docker Control Panel"""
+        self.views.show("docker_control")
 
+    def _build_docker_control_panel(self):
         # Docker control frame centered
         self.docker_control_frame = ctk.CTkFrame(self, bg_color='#121212', fg_color='#121212')
-        self.docker_control_frame.pack(expand=True, fill=ctk.BOTH)
 
         # Title for Docker Control Panel
         title_label = ctk.CTkLabel(self.docker_control_frame, text="Docker Control Panel",
@@ -533,11 +1627,33 @@ class DesktopApplication(ctk.CTk):
           corner_radius=20, border_width=2, border_color="#00BCD4")
         self.stop_button.grid(row=1, column=13, padx=10, pady=10)
 
-        # Download Docker Image Section
-        self.download_button = ctk.CTkButton(self.docker_control_frame, text="Download Image",
+        # Download Docker Images Section (pull queue)
+        self.pull_queue_label = ctk.CTkLabel(self.docker_control_frame, text="Images to Download\n(one per line):")
+        self.pull_queue_label.grid(row=2, column=10, padx=10, pady=10, sticky='w')
+
+        queue_frame = ctk.CTkFrame(self.docker_control_frame, bg_color='#121212', fg_color='#121212')
+        queue_frame.grid(row=2, column=12, padx=10, pady=10, sticky='w')
+
+        self.pull_queue_text = ctk.CTkTextbox(queue_frame, width=200, height=60)
+        self.pull_queue_text.grid(row=0, column=0, columnspan=2, pady=(0, 5), sticky='w')
+
+        concurrency_label = ctk.CTkLabel(queue_frame, text="Parallel pulls:")
+        concurrency_label.grid(row=1, column=0, sticky='w')
+        concurrency_entry = ctk.CTkEntry(queue_frame, textvariable=self.pull_concurrency_var, width=50)
+        concurrency_entry.grid(row=1, column=1, sticky='e')
+
+        download_buttons = ctk.CTkFrame(self.docker_control_frame, bg_color='#121212', fg_color='#121212')
+        download_buttons.grid(row=2, column=13, padx=10, pady=10)
+
+        self.load_pull_list_button = ctk.CTkButton(download_buttons, text="Load List From File",
+                                                   command=self.load_pull_list,bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4")
+        self.load_pull_list_button.grid(row=0, column=0, pady=5)
+
+        self.download_button = ctk.CTkButton(download_buttons, text="Download Images",
                                              command=self.download_image,bg_color="transparent", hover_color='#26C6DA',
           corner_radius=20, border_width=2, border_color="#00BCD4")
-        self.download_button.grid(row=2, column=13, columnspan=3, padx=10, pady=15)
+        self.download_button.grid(row=1, column=0, pady=5)
 
         # Build Docker Image Section
         self.build_image_label = ctk.CTkLabel(self.docker_control_frame, text="Dockerfile Path:")
@@ -585,45 +1701,198 @@ class DesktopApplication(ctk.CTk):
           corner_radius=20, border_width=2, border_color="#00BCD4")
         self.local_search_button.grid(row=6, column=13, padx=10, pady=10)
 
+        # Cancel Background Operations
+        self.cancel_button = ctk.CTkButton(self.docker_control_frame, text="Cancel Running Operations",
+                                           command=self.cancel_docker_operations,bg_color="transparent", hover_color='#26C6DA',
+          corner_radius=20, border_width=2, border_color="#00BCD4")
+        self.cancel_button.grid(row=7, column=13, padx=10, pady=10)
+
+        # Build/Pull Progress Section
+        self.progress_label = ctk.CTkLabel(self.docker_control_frame, text="No operation running.")
+        self.progress_label.grid(row=8, column=10, columnspan=3, padx=10, pady=5, sticky='w')
+
+        self.progress_bar = ctk.CTkProgressBar(self.docker_control_frame, width=200, progress_color="#00BCD4")
+        self.progress_bar.grid(row=8, column=13, padx=10, pady=5)
+        self.progress_bar.set(0)
+
+        self.progress_view = ctk.CTkTextbox(self.docker_control_frame, width=300, height=120)
+        self.progress_view.grid(row=9, column=10, columnspan=3, padx=10, pady=5, sticky='nsew')
+        self.progress_view.configure(state="disabled")
+
+        self.log_textbox = ctk.CTkTextbox(self.docker_control_frame, width=400, height=120)
+        self.log_textbox.grid(row=9, column=13, padx=10, pady=5, sticky='nsew')
+        self.log_textbox.configure(state="disabled")
+
         # Add return button
-        self.add_return_button(self.docker_control_frame, 7, 12)
+        self.add_return_button(self.docker_control_frame, 10, 12)
+        return self.docker_control_frame
 
     def stop_selected_container(self):
-        """Stop the selected Docker container"""
+        """Stop every container selected in the containers table"""
+        selection = self.containers_listbox.selected_keys() if self._containers_listbox_alive() else []
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a container to stop.")
+            return
+        self.run_container_bulk("stop", selection)
+
+    def bulk_selected_containers(self):
+        """Apply the bulk action to the containers selected in the table"""
+        selection = self.containers_listbox.selected_keys()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select one or more containers.")
+            return
+        self.run_container_bulk(self.bulk_action_var.get(), selection)
+
+    def bulk_matching_containers(self):
+        """Apply the bulk action to every container of the live table matching the label/name/status filters"""
+        labels = self.bulk_label_var.get().replace(",", " ").split()
+        name = self.bulk_name_var.get().strip() or None
+        status = None if self.bulk_status_var.get() == "any" else [self.bulk_status_var.get()]
+        if not (labels or name or status):
+            messagebox.showwarning("Warning", "Please enter a label, a name pattern or a status to match.")
+            return
+        matches = match_containers(self.container_table.rows(), labels, name, status)
+        if not matches:
+            messagebox.showinfo("Info", "No containers match these filters.")
+            return
+        self.run_container_bulk(self.bulk_action_var.get(), [container["Id"] for container in matches])
+
+    def run_container_bulk(self, action, container_ids):
+        """Stop, restart or remove containers in parallel with the panel's parallelism and grace timeout"""
         try:
-            selection = self.containers_listbox.curselection()
-            if not selection:
-                messagebox.showwarning("Warning", "Please select a container to stop.")
+            concurrency = int(self.bulk_concurrency_var.get())
+            timeout = int(self.bulk_timeout_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid number of parallel operations and timeout.")
+            return
+        if len(container_ids) > 1 or action == "remove":
+            if not messagebox.askyesno("Confirm", f"{action.capitalize()} {len(container_ids)} container(s)?"):
                 return
 
-            container_id = self.containers_listbox.get(selection[0]).split()[0]
-            subprocess.run(["docker", "stop", container_id], check=True)
+        # List entries carry the names shown in the results; containers gone from the table go by id
+        containers = [self.container_table.get(container_id) or container_id for container_id in container_ids]
+        states = {container_id: "queued" for container_id in container_ids}
+
+        def update(container_id, state, result):
+            self.tasks.post(self._show_bulk_progress, (action, states, container_id, state, result))
 
-            messagebox.showinfo("Success", f"Container {container_id} stopped successfully!")
+        def finished(report):
             self.list_docker_containers()  # Refresh the list
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to stop container: {str(e)}")
+            lines = [f"{action}: {len(report.results) - len(report.failed)}/{len(report.results)} containers "
+                     f"in {report.seconds:.1f}s"]
+            lines += [f"{result.name}: {result.error}" for result in report.failed]
+            if report.failed:
+                messagebox.showerror("Error", f"Failed to {action} some containers:\n" + "\n".join(lines))
+            else:
+                messagebox.showinfo("Success", "\n".join(lines))
+
+        self.tasks.submit(
+            self.core.bulk_containers, action, containers, concurrency, timeout, False, False, update,
+            on_success=finished,
+            on_error=lambda e: self.report_docker_error(f"Failed to {action} containers", e),
+            name=f"docker-bulk-{action}"
+        )
+
+    def _show_bulk_progress(self, update):
+        """Show per-container state and timings of a running bulk operation"""
+        action, states, container_id, state, result = update
+        states[container_id] = state if result is None else f"{state} in {result.seconds:.1f}s"
+        line = f"{container_id[:12]}: {state}"
+        if result is not None and not result.ok:
+            line += f" ({result.error})"
+
+        finished = sum(1 for value in states.values() if value.startswith(("done", "failed")))
+        self._show_progress(ProgressSnapshot(
+            f"bulk {action}", [line], 0, finished / len(states),
+            [f"{key[:12]}: {value}" for key, value in states.items()], finished == len(states)
+        ))
+
+    def prune_containers(self):
+        """Delete every stopped container (with the bulk label filter, if any)"""
+        labels = self.bulk_label_var.get().replace(",", " ").split()
+        scope = f" labelled {', '.join(labels)}" if labels else ""
+        if not messagebox.askyesno("Confirm", f"Remove every stopped container{scope}?"):
+            return
+
+        def pruned(report):
+            self.list_docker_containers()
+            deleted = (report or {}).get("ContainersDeleted") or []
+            messagebox.showinfo("Success", f"Removed {len(deleted)} stopped container(s), "
+                                           f"reclaimed {format_bytes((report or {}).get('SpaceReclaimed') or 0)}.")
+
+        self.tasks.submit(
+            self.core.prune_containers, labels,
+            on_success=pruned,
+            on_error=lambda e: self.report_docker_error("Failed to prune containers", e),
+            name="docker-prune"
+        )
+
+    def load_pull_list(self):
+        """Load image references to download from a text file"""
+        file_path = filedialog.askopenfilename(
+            title="Select Image List",
+            filetypes=(("Text Files", "*.txt"), ("All Files", "*.*"))
+        )
+        if not file_path:
+            return
+        try:
+            refs = load_refs(file_path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to read image list: {str(e)}")
+            return
+        self.pull_queue_text.delete("1.0", "end")
+        self.pull_queue_text.insert("end", "\n".join(refs))
 
     def download_image(self):
-        """Download a Docker image from Docker Hub based on user input."""
-        image_name = self.search_entry.get().strip()
-        if not image_name:
+        """Download every Docker image listed in the pull queue, several at a time."""
+        refs = parse_refs(self.pull_queue_text.get("1.0", "end"))
+        if not refs:
             messagebox.showwarning("Input Error", "Please enter an image name to download.")
             return
-
         try:
-            # Run the docker pull command
-            result = subprocess.run(['docker', 'pull', image_name], capture_output=True, text=True)
+            concurrency = int(self.pull_concurrency_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid number of parallel pulls.")
+            return
+
+        states = {ref: "queued" for ref in dedupe_refs(refs)}
+
+        def update(ref, state, result):
+            self.tasks.post(self._show_pull_queue, (states, ref, state, result))
 
-            if result.returncode == 0:
-                messagebox.showinfo("Success", f"Image '{image_name}' downloaded successfully.")
+        def downloaded(report):
+            self.refresh_image_inventory()
+            lines = [f"{len(report.results) - len(report.failed)}/{len(report.results)} images downloaded "
+                     f"in {report.seconds:.1f}s ({format_bytes(report.total_bytes)}, "
+                     f"{format_bytes(int(report.throughput))}/s)"]
+            lines += [f"{result.ref}: {result.error}" for result in report.failed]
+            if report.failed:
+                messagebox.showerror("Error", "Failed to download some images:\n" + "\n".join(lines))
             else:
-                messagebox.showerror("Error", f"Failed to download image: {result.stderr.strip()}")
+                messagebox.showinfo("Success", "\n".join(lines))
 
-        except FileNotFoundError:
-            messagebox.showerror("Error", "Docker is not installed or not found in the system path.")
-        except Exception as e:
-            messagebox.showerror("Error", f"An unexpected error occurred: {str(e)}")
+        self.tasks.submit(
+            self.core.pull_images, refs, concurrency, update,
+            on_success=downloaded,
+            on_error=lambda e: self.report_docker_error("Failed to download images", e),
+            name="docker-pull-queue"
+        )
+
+    def _show_pull_queue(self, update):
+        """Show per-image state and timings of the running pull queue"""
+        states, ref, state, result = update
+        states[ref] = state if result is None else f"{state} in {result.seconds:.1f}s"
+        if result is not None:
+            message = f"{format_bytes(result.bytes)}" if result.ok else result.error
+            line = f"{ref}: {state} after {result.attempts} attempt(s), {result.seconds:.1f}s ({message})"
+        else:
+            line = f"{ref}: {state}"
+
+        finished = sum(1 for value in states.values() if value.startswith(("done", "failed")))
+        self._show_progress(ProgressSnapshot(
+            "pull queue", [line], 0, finished / len(states),
+            [f"{name}: {value}" for name, value in states.items()], finished == len(states)
+        ))
 
     def build_docker_image(self):
         """Build Docker image from a Dockerfile."""
@@ -637,14 +1906,30 @@ class DesktopApplication(ctk.CTk):
             messagebox.showerror("Error", "Please enter a valid image name and tag.")
             return
 
-        try:
-            result = subprocess.run(
-                ["docker", "build", "-t", image_name, "-f", dockerfile_path, os.path.dirname(dockerfile_path)],
-                capture_output=True, text=True, check=True
-            )
-            messagebox.showinfo("Success", f"Docker image built successfully:\n{result.stdout}")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to build Docker image:\n{e.stderr}")
+        progress = self._progress_stream(BuildProgress(), f"build {image_name}")
+
+        def build():
+            token = current_token()
+            outcome = "failed"
+            try:
+                for message in self.docker.build(dockerfile_path, image_name, token=token):
+                    progress.feed(message)
+                outcome = "finished"
+            finally:
+                # Also on errors and cancellation, so the progress view stops showing it as running
+                progress.close("cancelled" if token.cancelled else outcome)
+            return "\n".join(progress.tail(2))
+
+        def built(output):
+            self.refresh_image_inventory()
+            messagebox.showinfo("Success", f"Docker image built successfully:\n{output}")
+
+        self.tasks.submit(
+            build,
+            on_success=built,
+            on_error=lambda e: self.report_docker_error("Failed to build Docker image", e),
+            name="docker-build"
+        )
 
     def stop_docker_container(self):
         """Stop a specific Docker container."""
@@ -653,11 +1938,16 @@ class DesktopApplication(ctk.CTk):
             messagebox.showerror("Error", "Please enter a valid Container ID or Name.")
             return
 
-        try:
-            result = subprocess.run(["docker", "stop", container_id], capture_output=True, text=True, check=True)
-            messagebox.showinfo("Success", f"Container stopped:\n{result.stdout}")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to stop container:\n{e.stderr}")
+        def stopped(was_running):
+            state = "stopped" if was_running else "was already stopped"
+            messagebox.showinfo("Success", f"Container {state}:\n{container_id}")
+
+        self.tasks.submit(
+            self.core.stop_container, container_id,
+            on_success=stopped,
+            on_error=lambda e: self.report_docker_error("Failed to stop container", e),
+            name="docker-stop"
+        )
 
     def browse_disk_dockerfile(self):
         """Browse for a Dockerfile path."""
@@ -676,14 +1966,29 @@ class DesktopApplication(ctk.CTk):
             messagebox.showerror("Error", "Please enter a valid image name/tag.")
             return
 
-        try:
-            result = subprocess.run(["docker", "images", image_name], capture_output=True, text=True, check=True)
-            if result.stdout.strip():
-                messagebox.showinfo("Search Result", f"Image found:\n{result.stdout}")
+        def found(changes=None):
+            matches = self.image_inventory.search(image_name)
+            if matches:
+                lines = [f"{name}  {record.short_id}  {format_bytes(record.size)}"
+                         for record in matches for name in record.names]
+                messagebox.showinfo("Search Result", "Image found:\n" + "\n".join(lines))
             else:
                 messagebox.showinfo("Search Result", "No matching image found locally.")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Error searching for image:\n{e.stderr}")
+
+        if self.image_inventory.loaded_at is None:
+            # First lookup: load the inventory once, then search it
+            self.tasks.submit(
+                self._reconcile_images,
+                on_success=found,
+                on_error=lambda e: self.report_docker_error("Error searching for image", e),
+                name="docker-find-image"
+            )
+            return
+
+        # Answer from the in-memory index right away; refresh it if it is getting old
+        found()
+        if self.image_inventory.is_stale(self.IMAGE_INVENTORY_MAX_AGE):
+            self.refresh_image_inventory()
 
     def pull_docker_image(self):
         """Pull a Docker image from DockerHub."""
@@ -692,11 +1997,72 @@ class DesktopApplication(ctk.CTk):
             messagebox.showerror("Error", "Please enter a valid image name/tag.")
             return
 
-        try:
-            result = subprocess.run(["docker", "pull", image_name], capture_output=True, text=True, check=True)
-            messagebox.showinfo("Success", f"Image pulled successfully:\n{result.stdout}")
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"Failed to pull image:\n{e.stderr}")
+        progress = self._progress_stream(PullProgress(), f"pull {image_name}")
+
+        def pull():
+            token = current_token()
+            outcome = "failed"
+            try:
+                for message in self.docker.pull(image_name, token=token):
+                    progress.feed(message)
+                outcome = "finished"
+            finally:
+                progress.close("cancelled" if token.cancelled else outcome)
+            return progress.tracker.status
+
+        def pulled(output):
+            self.refresh_image_inventory()
+            messagebox.showinfo("Success", f"Image pulled successfully:\n{output}")
+
+        self.tasks.submit(
+            pull,
+            on_success=pulled,
+            on_error=lambda e: self.report_docker_error("Failed to pull image", e),
+            name="docker-pull"
+        )
+
+    def _progress_stream(self, tracker, label):
+        """Stream progress of a background build/pull into the control panel's log and progress views"""
+        return ProgressStream(tracker, lambda snapshot: self.tasks.post(self._show_progress, snapshot),
+                              label=label, maxlen=self.LOG_LINES)
+
+    def _show_progress(self, snapshot):
+        """Append new log lines and redraw the progress views"""
+        log = getattr(self, "log_textbox", None)
+        if log is None or not log.winfo_exists():
+            return
+
+        log.configure(state="normal")
+        if snapshot.dropped:
+            log.insert("end", f"[{snapshot.label}] ... {snapshot.dropped} lines skipped ...\n")
+        if snapshot.lines:
+            log.insert("end", "".join(f"[{snapshot.label}] {line}\n" for line in snapshot.lines))
+        # Keep the pane bounded like the ring buffer behind it
+        excess = int(log.index("end-1c").split(".")[0]) - self.LOG_LINES
+        if excess > 0:
+            log.delete("1.0", f"{excess + 1}.0")
+        log.see("end")
+        log.configure(state="disabled")
+
+        self.progress_view.configure(state="normal")
+        self.progress_view.delete("1.0", "end")
+        self.progress_view.insert("end", "\n".join(snapshot.summary))
+        self.progress_view.configure(state="disabled")
+
+        if snapshot.fraction is not None:
+            self.progress_bar.set(snapshot.fraction)
+        state = (snapshot.outcome or "finished") if snapshot.done else "running"
+        self.progress_label.configure(text=f"{snapshot.label}: {state}")
+
+    def cancel_docker_operations(self):
+        """Cancel every docker command still running in the background"""
+        # Only tasks named docker-*: VM work (provisioning, snapshots, conversions) keeps running,
+        # and so do long-lived watchers such as the events stream
+        running = [task for task in self.tasks.running
+                   if not task.spawned and (task.name or "").startswith("docker-")]
+        for task in running:
+            task.cancel()
+        messagebox.showinfo("Cancelled", f"Cancelled {len(running)} running operation(s).")
 
 
 if __name__ == "__main__":
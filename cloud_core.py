@@ -0,0 +1,267 @@
+import os
+import subprocess
+from collections import namedtuple
+
+from container_bulk import ContainerBulk, match_containers
+from disk_images import DiskImages
+from docker_api import DockerClient
+from image_inventory import ImageInventory
+from pull_queue import PullQueue
+from qmp import QMPMonitor, qmp_args, qmp_socket_path
+from vm_clones import CloneManager
+from vm_manifest import BatchProvisioner, seed_args
+from vm_memory import enable_ksm, memory_args
+from vm_profiles import DEFAULT_PROFILE, build_qemu_command
+from vm_registry import VMRegistry, new_vm_id, scan_qemu_processes
+from vm_scheduler import VMScheduler, command_resources
+
+# A started VM. connected is a future that resolves once its QMP socket is up.
+Launch = namedtuple("Launch", "vm_id name pid disk command notes cores connected")
+
+# Guest RAM settings of a launch: hugepage backing, KSM merging and a virtio balloon.
+# start_ksm turns on the host-wide KSM daemon, which affects every process, so it is opt-in
+DEFAULT_MEMORY_OPTIONS = {"hugepages": False, "merge": True, "balloon": True, "start_ksm": False}
+
+VM_ACTIONS = ("pause", "resume", "powerdown")
+
+
+class AdmissionError(Exception):
+    """The scheduler did not admit a launch; `admission.decision` says whether it could queue"""
+
+    def __init__(self, admission, vcpus, memory):
+        super().__init__(f"Cannot launch VM: {admission.reason}")
+        self.admission = admission
+        self.vcpus = vcpus
+        self.memory = memory
+
+
+def vm_info(record, status=None):
+    """A tracked VM as plain data"""
+    return {"vm_id": record.vm_id, "name": record.name, "pid": record.pid if isinstance(record.pid, int) else None,
+            "disk": record.disk, "ports": list(record.ports), "qmp": record.qmp_path, "adopted": record.adopted,
+            "running": record.running, "status": status}
+
+
+def image_info(record):
+    return {"id": record.id, "names": record.names, "digests": list(record.digests), "size": record.size,
+            "created": record.created}
+
+
+class CloudCore:
+    """The VM and Docker engine shared by the GUI and the command line.
+
+    Nothing here touches Tk: operations block, return plain values and raise on
+    failure, so they run the same on a GUI worker thread and in a script. The
+    callbacks are called from background threads.
+    """
+
+    def __init__(self, docker=None, on_vm_exit=None, on_vm_event=None, spawn=None):
+        # Pooled Docker Engine API client shared by every docker action
+        self.docker = docker or DockerClient(pool_size=8)
+        # Structured, indexed view of the local images
+        self.image_inventory = ImageInventory(self.docker)
+        # qcow2 overlays for linked-clone VMs
+        self.clone_manager = CloneManager()
+        # Probed format/size/layout of disk images, re-probed only when an image changes
+        self.disk_images = DiskImages()
+        # Admission control and vCPU pinning against the host's cores and memory
+        self.vm_scheduler = VMScheduler()
+        # VMs we launched or adopted, watched for exit
+        self.vm_registry = VMRegistry(on_exit=on_vm_exit, spawn=spawn)
+        # QMP sessions to every VM, multiplexed on one event loop
+        self.qmp = QMPMonitor(on_event=on_vm_event)
+
+    def close(self):
+        self.vm_registry.close()
+        self.qmp.close()
+        self.docker.close()
+
+    # VMs
+
+    def vm_command(self, cpu, memory, disk, profile=DEFAULT_PROFILE, network="user", forwards=()):
+        """(qemu argv, notes) for a VM, opening `disk` in its probed format"""
+        return build_qemu_command(profile, cpu, memory, disk, fmt=self.disk_images.format(disk), network=network,
+                                  forwards=forwards)
+
+    def memory_backing(self, memory, admission, hugepages=False, merge=True, balloon=True, start_ksm=False):
+        """Guest RAM backing flags: hugepages, NUMA binding, KSM merging and balloon.
+
+        `merge` only marks the guest's pages mergeable; the host's KSM daemon is started
+        as well when `start_ksm` is set.
+        """
+        if merge and start_ksm:
+            enable_ksm()
+        return memory_args(memory, node=self.vm_scheduler.numa_node(admission), hugepages=hugepages, merge=merge,
+                           balloon=balloon)
+
+    def start_vm(self, vm_id, name, qemu_cmd, disk, ports=(), detach=False):
+        """Start QEMU with a QMP socket and track it.
+
+        Returns (process, future resolving once QMP is connected). A detached VM gets
+        its own session and no terminal, so it outlives the process that started it.
+        """
+        qemu_cmd = qemu_cmd + ["-name", name]
+        # QMP control socket for status, pause/resume and clean shutdown
+        qmp_path = qmp_socket_path(vm_id)
+        qemu_cmd += qmp_args(qmp_path)
+
+        if detach:
+            process = subprocess.Popen(qemu_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL, start_new_session=True)
+        else:
+            process = subprocess.Popen(qemu_cmd)
+        self.vm_registry.register(process, name, disk, qemu_cmd, ports=ports, vm_id=vm_id)
+        return process, self.qmp.connect(vm_id, qmp_path)
+
+    def launch_vm(self, cpu, memory, disk, profile=DEFAULT_PROFILE, memory_options=None, name=None,
+                  network="user", forwards=(), extra_args=(), vm_id=None, qemu_cmd=None, detach=False):
+        """Admit and start one VM; returns a Launch.
+
+        `qemu_cmd` relaunches a saved command as is instead of building one. Raises
+        AdmissionError when the host cannot take the VM now, reserving nothing; if
+        starting fails after admission, the caller frees the reservation with release_vm().
+        """
+        if not os.path.exists(disk):
+            raise FileNotFoundError(2, "Disk image file does not exist", disk)
+        vm_id = vm_id or new_vm_id()
+        saved = qemu_cmd is not None
+        if saved:
+            qemu_cmd, notes = list(qemu_cmd), []
+        else:
+            qemu_cmd, notes = self.vm_command(cpu, memory, disk, profile, network, forwards)
+            qemu_cmd += list(extra_args)
+
+        vcpus, memory_mb = command_resources(qemu_cmd)
+        admission = self.vm_scheduler.admit(vm_id, vcpus, memory_mb)
+        if admission.decision != "admit":
+            raise AdmissionError(admission, vcpus, memory_mb)
+        if not saved:
+            backing, memory_notes = self.memory_backing(memory_mb, admission,
+                                                        **dict(DEFAULT_MEMORY_OPTIONS, **(memory_options or {})))
+            qemu_cmd += backing
+            notes += memory_notes
+        # Name the VM so it can be recognised again after a restart
+        name = name or f"{os.path.splitext(os.path.basename(disk))[0]}-{vm_id}"
+        process, connected = self.start_vm(vm_id, name, qemu_cmd, disk, ports=[host for host, _ in forwards],
+                                           detach=detach)
+        return Launch(vm_id, name, process.pid, disk, qemu_cmd, notes, admission.cores, connected)
+
+    def release_vm(self, vm_id):
+        """Free a VM's scheduler reservation; returns the queued launches that fit now"""
+        return self.vm_scheduler.release(vm_id)
+
+    def pin_vcpus(self, vm_id, pid, cores, connected, timeout=30):
+        """Give each vCPU thread of a started VM its own core once QMP can name the threads"""
+        connected.result(timeout)
+        threads = [cpu["thread-id"] for cpu in self.qmp.execute(vm_id, "query-cpus-fast") if "thread-id" in cpu]
+        self.vm_scheduler.pin_vcpus(pid, cores, threads)
+
+    def adopt_vms(self, processes=None, wait=None):
+        """Track QEMU processes that are already running and reattach to their QMP sockets.
+
+        With `wait`, block up to that many seconds per VM until its QMP session is up.
+        """
+        if processes is None:
+            processes = list(scan_qemu_processes())
+        adopted = self.vm_registry.reconcile(processes)
+        connecting = []
+        for record in adopted:
+            self.vm_scheduler.track(record.vm_id, *command_resources(record.cmdline))
+            if record.qmp_path:
+                connecting.append(self.qmp.connect(record.vm_id, record.qmp_path))
+        if wait:
+            for future in connecting:
+                try:
+                    future.result(wait)
+                except Exception:
+                    pass  # No QMP for this VM; it is still listed
+        return adopted
+
+    def find_vm(self, name_or_id):
+        """The running VM with this vm_id or QEMU -name"""
+        for record in self.vm_registry.running():
+            if name_or_id in (record.vm_id, record.name):
+                return record
+        raise LookupError(f"No running VM named {name_or_id}")
+
+    def vm_statuses(self, timeout=None):
+        """{vm_id: QMP run state} of every VM with a QMP connection"""
+        statuses = self.qmp.query_all("query-status", timeout=timeout)
+        return {vm_id: status["status"] for vm_id, status in statuses.items() if isinstance(status, dict)}
+
+    def control_vm(self, vm_id, action, timeout=None):
+        """Pause, resume or cleanly shut down (powerdown) a VM over QMP"""
+        if action not in VM_ACTIONS:
+            raise ValueError(f"Unknown VM action {action}: choose {', '.join(VM_ACTIONS)}")
+        return getattr(self.qmp, action)(vm_id, timeout=timeout)
+
+    def provision(self, specs, concurrency=4, profile=DEFAULT_PROFILE, memory_options=None, on_update=None,
+                  on_started=None, release=None, detach=False):
+        """Provision every VMSpec of a manifest; returns a ProvisionReport.
+
+        `on_started(launch)` is called from a provisioning worker for every VM that started;
+        `release(vm_id)` frees the reservation of a VM that failed to start (release_vm() by default).
+        """
+        release = release or self.release_vm
+
+        def launch(spec, disk, seed):
+            forwards = [(spec.ssh_port, 22)] if spec.ssh_port else []
+            vm_id = new_vm_id()
+            try:
+                started = self.launch_vm(spec.vcpus, spec.memory, disk, spec.profile or profile, memory_options,
+                                         name=spec.name, network=spec.network, forwards=forwards,
+                                         extra_args=seed_args(seed) if seed else (), vm_id=vm_id, detach=detach)
+            except AdmissionError as e:
+                # The batch already bounds concurrency; waiting in the scheduler queue would stall it
+                raise RuntimeError(f"not admitted, {e.admission.reason}")
+            except Exception:
+                release(vm_id)
+                raise
+            if on_started:
+                on_started(started)
+            return started.vm_id
+
+        provisioner = BatchProvisioner(self.clone_manager, self.qmp, launch, concurrency=concurrency)
+        return provisioner.run(specs, on_update)
+
+    # Docker
+
+    def list_images(self):
+        """Sync the image inventory with the daemon; returns its records, newest first"""
+        self.image_inventory.refresh()
+        return self.image_inventory.records()
+
+    def list_containers(self, all=True, filters=None):
+        return self.docker.containers(all=all, filters=filters)
+
+    def pull_images(self, refs, concurrency=3, on_update=None):
+        """Pull many images in parallel with retries; returns a PullReport"""
+        # Long-running pulls on a pool of their own, like bulk_containers
+        client = self.docker.fork(max(1, concurrency))
+        try:
+            return PullQueue(client, concurrency=concurrency).run(refs, on_update)
+        finally:
+            client.close()
+
+    def stop_container(self, container_id, timeout=None):
+        """Stop a container; returns False if it was already stopped"""
+        return self.docker.stop_container(container_id, timeout=timeout)
+
+    def find_containers(self, labels=(), name=None, status=None):
+        """Containers matching every given filter (see match_containers)"""
+        return match_containers(self.docker.containers(all=True), labels, name, status)
+
+    def bulk_containers(self, action, containers, concurrency=8, timeout=None, force=False, volumes=False,
+                        on_update=None):
+        """Stop, restart or remove many containers in parallel; returns a BulkReport"""
+        # A pool of its own, one connection per worker: stops that wait out their grace period
+        # never hold the connections of the shared client other calls (refreshes, listing) need
+        client = self.docker.fork(max(1, concurrency))
+        try:
+            return ContainerBulk(client, concurrency, timeout, force, volumes).run(action, containers, on_update)
+        finally:
+            client.close()
+
+    def prune_containers(self, labels=()):
+        """Delete every stopped container (with these labels); returns the deleted ids and reclaimed bytes"""
+        return self.docker.prune_containers({"label": list(labels)} if labels else None)
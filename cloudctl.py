@@ -0,0 +1,248 @@
+"""Command-line client of the VM and Docker engine; every command prints JSON.
+
+    python -m cloudctl vm launch --disk base.qcow2 --cpus 2 --memory 2048 --headless
+    python -m cloudctl vm provision fleet.yaml --parallel 8
+    python -m cloudctl images pull alpine nginx:1.25 --file more-images.txt --parallel 4
+    python -m cloudctl containers restart --label tier=web --status running --parallel 16 --timeout 5
+
+Exit status is 0 when everything succeeded, 1 when any item failed and 2 for usage errors.
+"""
+import argparse
+import json
+import sys
+
+from cloud_core import AdmissionError, CloudCore, image_info, vm_info
+from container_bulk import BULK_ACTIONS, match_containers
+from pull_queue import load_refs
+from vm_manifest import load_manifest
+from vm_profiles import DEFAULT_PROFILE, PROFILES
+
+# Seconds to wait for QMP sessions of started or adopted VMs
+QMP_WAIT = 30
+
+
+class UsageError(Exception):
+    """Arguments that parse but do not make a valid command (exit status 2)"""
+
+
+def _memory_options(args):
+    return {"hugepages": args.hugepages, "merge": not args.no_ksm, "balloon": not args.no_balloon,
+            "start_ksm": args.start_ksm}
+
+
+def _status(core, vm_id):
+    try:
+        return core.qmp.status(vm_id)
+    except Exception:
+        return None
+
+
+def vm_plan(core, args):
+    cmd, notes = core.vm_command(args.cpus, args.memory, args.disk, args.profile)
+    return {"command": cmd, "notes": notes}, True
+
+
+def vm_launch(core, args):
+    # Count the VMs already running against the host before admitting a new one
+    core.adopt_vms()
+    disk = core.clone_manager.create_clone(args.disk) if args.linked_clone else args.disk
+    forwards = [(args.ssh_port, 22)] if args.ssh_port else []
+    try:
+        launch = core.launch_vm(args.cpus, args.memory, disk, args.profile, _memory_options(args), name=args.name,
+                                forwards=forwards, extra_args=["-display", "none"] if args.headless else (),
+                                detach=True)
+    except AdmissionError as e:
+        return {"error": str(e), "decision": e.admission.decision}, False
+    try:
+        if launch.cores:
+            core.pin_vcpus(launch.vm_id, launch.pid, launch.cores, launch.connected, timeout=QMP_WAIT)
+        else:
+            launch.connected.result(QMP_WAIT)
+    except Exception as e:
+        result = vm_info(core.vm_registry.get(launch.vm_id))
+        result.update(command=launch.command, notes=launch.notes, error=f"QMP not reachable: {e}")
+        return result, False
+    result = vm_info(core.vm_registry.get(launch.vm_id), _status(core, launch.vm_id))
+    result.update(command=launch.command, notes=launch.notes)
+    return result, True
+
+
+def vm_list(core, args):
+    adopted = core.adopt_vms(wait=5)
+    statuses = core.vm_statuses() if core.qmp.connected() else {}
+    return [vm_info(record, statuses.get(record.vm_id)) for record in adopted], True
+
+
+def vm_control(core, args):
+    core.adopt_vms(wait=5)
+    results, ok = [], True
+    for name in args.vms:
+        try:
+            record = core.find_vm(name)
+            core.control_vm(record.vm_id, args.action)
+            results.append({"vm": name, "ok": True, "status": _status(core, record.vm_id)})
+        except Exception as e:
+            results.append({"vm": name, "ok": False, "error": str(e)})
+            ok = False
+    return results, ok
+
+
+def vm_provision(core, args):
+    core.adopt_vms()
+    specs = load_manifest(args.manifest)
+    report = core.provision(specs, concurrency=args.parallel, profile=args.profile,
+                            memory_options=_memory_options(args), detach=True)
+    return {"seconds": report.seconds, "ready": len(report.ready), "failed": len(report.failed),
+            "results": [result._asdict() for result in report.results]}, not report.failed
+
+
+def images_list(core, args):
+    return [image_info(record) for record in core.list_images()], True
+
+
+def images_pull(core, args):
+    refs = list(args.refs)
+    for path in args.file or ():
+        refs += load_refs(path)
+    if not refs:
+        raise UsageError("Name at least one image to pull")
+    report = core.pull_images(refs, concurrency=args.parallel)
+    return {"seconds": report.seconds, "bytes": report.total_bytes, "throughput": report.throughput,
+            "failed": len(report.failed), "results": [result._asdict() for result in report.results]}, \
+        not report.failed
+
+
+def _container_filters(args):
+    return {"labels": args.label or (), "name": args.name, "status": args.status}
+
+
+def containers_list(core, args):
+    containers = core.list_containers(all=args.all or bool(args.status))
+    return match_containers(containers, **_container_filters(args)), True
+
+
+def containers_bulk(core, args):
+    targets = list(args.containers)
+    filters = _container_filters(args)
+    if any(filters.values()):
+        targets += core.find_containers(**filters)
+    elif not targets:
+        # Never act on every container by accident
+        raise UsageError("Name containers or select them with --label, --name or --status")
+    report = core.bulk_containers(args.action, targets, concurrency=args.parallel, timeout=args.timeout,
+                                  force=args.force, volumes=args.volumes)
+    return {"action": report.action, "seconds": report.seconds, "changed": len(report.changed),
+            "failed": len(report.failed), "results": [result._asdict() for result in report.results]}, \
+        not report.failed
+
+
+def containers_prune(core, args):
+    return core.prune_containers(args.label or ()), True
+
+
+def disk_info(core, args):
+    info = core.disk_images.info(args.path)
+    return dict(info._asdict(), recommended=core.disk_images.recommend(args.path)._asdict()), True
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cloudctl", description="Manage QEMU VMs and Docker from scripts.")
+    parser.add_argument("--compact", action="store_true", help="print JSON on one line")
+    groups = parser.add_subparsers(dest="group", required=True)
+
+    def memory_flags(command):
+        command.add_argument("--profile", default=DEFAULT_PROFILE, choices=list(PROFILES))
+        command.add_argument("--hugepages", action="store_true", help="back guest RAM with hugepages")
+        command.add_argument("--no-ksm", action="store_true", help="do not let KSM merge guest pages")
+        command.add_argument("--start-ksm", action="store_true",
+                             help="start the host's KSM daemon (host-wide, needs root)")
+        command.add_argument("--no-balloon", action="store_true", help="launch without a virtio balloon")
+
+    vm = groups.add_parser("vm", help="virtual machines").add_subparsers(dest="command", required=True)
+    for name, handler in (("plan", vm_plan), ("launch", vm_launch)):
+        command = vm.add_parser(name, help="print the QEMU command" if name == "plan" else "start a VM")
+        command.add_argument("--disk", required=True)
+        command.add_argument("--cpus", type=int, default=1)
+        command.add_argument("--memory", type=int, default=1024, help="MB")
+        memory_flags(command)
+        if name == "launch":
+            command.add_argument("--name")
+            command.add_argument("--linked-clone", action="store_true", help="boot a copy-on-write overlay")
+            command.add_argument("--ssh-port", type=int, help="forward this host port to the guest's port 22")
+            command.add_argument("--headless", action="store_true", help="run without a display window")
+        command.set_defaults(handler=handler)
+    command = vm.add_parser("list", help="running VMs and their QMP state")
+    command.set_defaults(handler=vm_list)
+    for name, action in (("pause", "pause"), ("resume", "resume"), ("stop", "powerdown")):
+        command = vm.add_parser(name, help=f"{name} VMs by name or id")
+        command.add_argument("vms", nargs="+")
+        command.set_defaults(handler=vm_control, action=action)
+    command = vm.add_parser("provision", help="provision the VMs of a JSON/YAML manifest")
+    command.add_argument("manifest")
+    command.add_argument("--parallel", type=int, default=4, help="VMs booting at the same time")
+    memory_flags(command)
+    command.set_defaults(handler=vm_provision)
+
+    images = groups.add_parser("images", help="docker images").add_subparsers(dest="command", required=True)
+    images.add_parser("list").set_defaults(handler=images_list)
+    command = images.add_parser("pull", help="pull images in parallel")
+    command.add_argument("refs", nargs="*")
+    command.add_argument("--file", action="append", help="text file of image references")
+    command.add_argument("--parallel", type=int, default=3, help="pulls running at the same time")
+    command.set_defaults(handler=images_pull)
+
+    containers = groups.add_parser("containers", help="docker containers").add_subparsers(dest="command",
+                                                                                            required=True)
+
+    def container_filters(command):
+        command.add_argument("--label", action="append", help="key or key=value (repeatable)")
+        command.add_argument("--name", help="shell-style pattern matched against names and ids")
+        command.add_argument("--status", action="append", help="state such as running or exited (repeatable)")
+
+    command = containers.add_parser("list")
+    command.add_argument("--all", action="store_true", help="include stopped containers")
+    container_filters(command)
+    command.set_defaults(handler=containers_list)
+    for action in BULK_ACTIONS:
+        command = containers.add_parser(action, help=f"{action} containers in parallel")
+        command.add_argument("containers", nargs="*", help="ids or names")
+        container_filters(command)
+        command.add_argument("--parallel", type=int, default=8, help="operations running at the same time")
+        command.add_argument("--timeout", type=int, help="seconds to wait before killing (stop/restart)")
+        if action == "remove":
+            command.add_argument("--force", action="store_true", help="remove running containers too")
+            command.add_argument("--volumes", action="store_true", help="remove anonymous volumes too")
+        command.set_defaults(handler=containers_bulk, action=action, force=False, volumes=False)
+    command = containers.add_parser("prune", help="remove every stopped container")
+    command.add_argument("--label", action="append", help="only containers with this key or key=value")
+    command.set_defaults(handler=containers_prune)
+
+    disk = groups.add_parser("disk", help="disk images").add_subparsers(dest="command", required=True)
+    command = disk.add_parser("info", help="probe an image and recommend a layout")
+    command.add_argument("path")
+    command.set_defaults(handler=disk_info)
+    return parser
+
+
+def main(argv=None, core=None, out=None):
+    out = out or sys.stdout
+    args = build_parser().parse_args(argv)
+    owned = core is None
+    core = core or CloudCore()
+    try:
+        result, ok = args.handler(core, args)
+        status = 0 if ok else 1
+    except UsageError as e:
+        result, status = {"error": str(e), "type": "UsageError"}, 2
+    except Exception as e:
+        result, status = {"error": str(e), "type": type(e).__name__}, 1
+    finally:
+        if owned:
+            core.close()
+    json.dump(result, out, indent=None if args.compact else 2, default=str)
+    out.write("\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import fnmatch
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from task_runner import current_token
+
+# Container operations that run in bulk
+BULK_ACTIONS = ("stop", "restart", "remove")
+
+# Outcome of one container operation; changed is False when there was nothing to do (already stopped)
+BulkResult = namedtuple("BulkResult", "container name action ok changed seconds error")
+
+
+def container_name(container):
+    """Comma-separated names of a container list entry, without the leading slashes"""
+    return ",".join(name.lstrip("/") for name in container.get("Names") or [])
+
+
+def match_containers(containers, labels=(), name=None, status=None):
+    """The container list entries matching every given filter.
+
+    `labels` are "key" or "key=value" strings, `name` is a shell-style pattern
+    matched against each name and the id, and `status` is a collection of states
+    such as running, exited or paused.
+    """
+    wanted = [label.split("=", 1) for label in labels]
+    matches = []
+    for container in containers:
+        container_labels = container.get("Labels") or {}
+        if any(key not in container_labels or (value and container_labels[key] != value[0])
+               for key, *value in wanted):
+            continue
+        if status and container.get("State") not in status:
+            continue
+        if name:
+            candidates = [n.lstrip("/") for n in container.get("Names") or []] + [container["Id"]]
+            if not any(fnmatch.fnmatchcase(candidate, name) for candidate in candidates) \
+                    and not container["Id"].startswith(name):
+                continue
+        matches.append(container)
+    return matches
+
+
+class BulkReport:
+    """Per-container results and wall time of one bulk operation"""
+
+    def __init__(self, action, results, seconds):
+        self.action = action
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def changed(self):
+        return [result for result in self.results if result.ok and result.changed]
+
+
+class ContainerBulk:
+    """Stop, restart or remove many containers with bounded concurrency.
+
+    `timeout` is the per-container grace period before a stop or restart kills
+    it. `on_update(container_id, state, result)` is called from worker threads
+    as containers start ("running") and finish ("done"/"failed").
+    """
+
+    def __init__(self, client, concurrency=8, timeout=None, force=False, volumes=False):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.force = force
+        self.volumes = volumes
+
+    def run(self, action, containers, on_update=None):
+        """Apply `action` to containers given as ids or list entries; returns a BulkReport"""
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Unknown container action {action}: choose {', '.join(BULK_ACTIONS)}")
+        on_update = on_update or (lambda container_id, state, result: None)
+        token = current_token()
+        targets = {}
+        for container in containers:
+            if isinstance(container, dict):
+                targets.setdefault(container["Id"], container_name(container) or container["Id"][:12])
+            else:
+                targets.setdefault(container, container)
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"bulk-{action}") as pool:
+            futures = [pool.submit(self._run_one, action, container_id, name, token, on_update)
+                       for container_id, name in targets.items()]
+            results = [future.result() for future in futures]
+
+        token.raise_if_cancelled()
+        return BulkReport(action, results, time.monotonic() - started)
+
+    def _run_one(self, action, container_id, name, token, on_update):
+        if token.cancelled:
+            return BulkResult(container_id, name, action, False, False, 0.0, "cancelled")
+        started = time.monotonic()
+        on_update(container_id, "running", None)
+        try:
+            if action == "stop":
+                changed = self.client.stop_container(container_id, timeout=self.timeout)
+            elif action == "restart":
+                changed = self.client.restart_container(container_id, timeout=self.timeout)
+            else:
+                changed = self.client.remove_container(container_id, force=self.force, volumes=self.volumes)
+        except Exception as e:
+            result = BulkResult(container_id, name, action, False, False, time.monotonic() - started, str(e))
+            on_update(container_id, "failed", result)
+            return result
+        result = BulkResult(container_id, name, action, True, changed, time.monotonic() - started, None)
+        on_update(container_id, "done", result)
+        return result
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import namedtuple
+
+from docker_api import DockerAPIError
+from task_runner import current_token
+
+# Container ids that appeared, changed or disappeared since the previous delta
+ContainerDelta = namedtuple("ContainerDelta", "added updated removed")
+
+# Event actions that do not change a container's list entry
+IGNORED_ACTIONS = ("exec_", "attach", "resize", "top", "archive-path", "extract-to-dir",
+                   "copy", "commit", "export")
+
+
+class ContainerTable:
+    """In-memory container table kept current from the Docker events stream.
+
+    One snapshot of `GET /containers/json` seeds the table; after that only the
+    containers named in events are refetched and reported as deltas.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._lock = threading.Lock()
+        self._containers = {}
+        self._order = []
+
+    def __len__(self):
+        return len(self._containers)
+
+    def get(self, container_id):
+        with self._lock:
+            return self._containers.get(container_id)
+
+    def ids(self):
+        """Container ids in display order"""
+        with self._lock:
+            return list(self._order)
+
+    def rows(self):
+        """Containers in display order"""
+        with self._lock:
+            return [self._containers[cid] for cid in self._order]
+
+    def resync(self, containers):
+        """Replace the table with a full snapshot and return what changed"""
+        snapshot = {container["Id"]: container for container in containers}
+        with self._lock:
+            removed = [cid for cid in self._order if cid not in snapshot]
+            added, updated = [], []
+            for cid, container in snapshot.items():
+                old = self._containers.get(cid)
+                if old is None:
+                    added.append(cid)
+                    self._order.append(cid)
+                elif old != container:
+                    updated.append(cid)
+            for cid in removed:
+                self._order.remove(cid)
+            self._containers = snapshot
+        return ContainerDelta(added, updated, removed)
+
+    def apply(self, container_id, container):
+        """Store the latest list entry of one container (None if it is gone)"""
+        with self._lock:
+            old = self._containers.get(container_id)
+            if container is None:
+                if old is None:
+                    return None
+                del self._containers[container_id]
+                self._order.remove(container_id)
+                return ContainerDelta([], [], [container_id])
+            self._containers[container_id] = container
+            if old is None:
+                self._order.append(container_id)
+                return ContainerDelta([container_id], [], [])
+            if old != container:
+                return ContainerDelta([], [container_id], [])
+            return None
+
+    def apply_event(self, event):
+        """Apply one daemon event, returning a ContainerDelta or None if nothing changed"""
+        if event.get("Type", "container") != "container":
+            return None
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        action = event.get("Action") or event.get("status") or ""
+        if not container_id or action.startswith(IGNORED_ACTIONS):
+            return None
+        if action == "destroy":
+            return self.apply(container_id, None)
+        return self.apply(container_id, self.client.container(container_id))
+
+    def watch(self, on_delta, retry_delay=2.0):
+        """Snapshot the containers, then apply the events stream until the task is cancelled.
+
+        `on_delta(delta)` is called from the watching thread for every change. If the
+        stream drops, the table is resynced from a fresh snapshot and watching resumes.
+        """
+        token = current_token()
+        first = True
+        while not token.cancelled:
+            # Subscribe from just before the snapshot so no event slips between the two
+            since = int(time.time())
+            try:
+                delta = self.resync(self.client.containers(all=True))
+                if first or any(delta):
+                    on_delta(delta)
+                first = False
+
+                for event in self.client.events(since=since, filters={"type": ["container"]}, token=token):
+                    delta = self.apply_event(event)
+                    if delta is not None:
+                        on_delta(delta)
+            except (DockerAPIError, OSError):
+                # Report failures to reach the daemon up front; later drops are retried
+                if first:
+                    raise
+            token.wait(retry_delay)
@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from task_runner import CancelToken
+
+# One parsed `GET /containers/{id}/stats` message; byte counters are cumulative
+StatsSample = namedtuple("StatsSample", "time cpu_percent memory memory_limit net_rx net_tx block_read block_write pids")
+
+SORT_KEYS = ("cpu", "memory", "io")
+
+# Containers sampled at the same time, each on one connection of the shared client
+POLL_WORKERS = 4
+
+
+def parse_stats(stats, now=None):
+    """Turn an Engine API stats message into a StatsSample, computing CPU % like `docker stats`"""
+    cpu = stats.get("cpu_stats") or {}
+    precpu = stats.get("precpu_stats") or {}
+    cpu_delta = (cpu.get("cpu_usage") or {}).get("total_usage", 0) - (precpu.get("cpu_usage") or {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    cpu_percent = cpu_delta / system_delta * online * 100 if cpu_delta > 0 and system_delta > 0 else 0.0
+
+    # Page cache that can be reclaimed does not count as used memory (cgroup v1 / v2 names)
+    memory = stats.get("memory_stats") or {}
+    details = memory.get("stats") or {}
+    usage = memory.get("usage", 0)
+    usage -= min(usage, details.get("total_inactive_file", details.get("inactive_file", 0)))
+
+    networks = (stats.get("networks") or {}).values()
+    blkio = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+    return StatsSample(
+        time.monotonic() if now is None else now,
+        cpu_percent, usage, memory.get("limit", 0),
+        sum(net.get("rx_bytes", 0) for net in networks),
+        sum(net.get("tx_bytes", 0) for net in networks),
+        sum(entry.get("value", 0) for entry in blkio if entry.get("op", "").lower() == "read"),
+        sum(entry.get("value", 0) for entry in blkio if entry.get("op", "").lower() == "write"),
+        (stats.get("pids_stats") or {}).get("current", 0),
+    )
+
+
+class ContainerStats:
+    """Samples every running container on a few shared connections and keeps the last `history` samples of each.
+
+    Every `interval` seconds each container is read with a one-shot stats request,
+    spread over `workers` threads sharing `client`'s pool (size it to `workers`), so
+    hundreds of containers cost no more connections or threads than a handful. CPU %
+    is computed against the container's previous sample. Call sync() with the running
+    container ids whenever the container table changes.
+    """
+
+    def __init__(self, client, history=60, interval=1.0, workers=POLL_WORKERS, on_error=None):
+        self.client = client
+        self.history_size = history
+        self.interval = interval
+        self.on_error = on_error
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="container-stats")
+        self._lock = threading.Lock()
+        self._watched = []
+        self._token = None
+        self._cpu = {}
+        self._samples = {}
+
+    def watched(self):
+        """Ids of the containers being sampled"""
+        with self._lock:
+            return list(self._watched)
+
+    def sync(self, container_ids):
+        """Sample exactly the given containers; samples of the others are dropped"""
+        wanted = list(dict.fromkeys(container_ids))
+        with self._lock:
+            self._watched = wanted
+            for container_id in [c for c in self._samples if c not in wanted]:
+                del self._samples[container_id]
+            for container_id in [c for c in self._cpu if c not in wanted]:
+                del self._cpu[container_id]
+            token = None
+            if self._token is None and wanted:
+                token = self._token = CancelToken()
+        if token is not None:
+            threading.Thread(target=self._run, args=(token,), name="container-stats", daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            token, self._token = self._token, None
+        if token is not None:
+            token.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
+
+    def poll(self):
+        """Take one sample of every watched container; returns the ids that got a new sample"""
+        container_ids = self.watched()
+        return [container_id for container_id, sampled in
+                zip(container_ids, self._pool.map(self._poll_one, container_ids)) if sampled]
+
+    def history(self, container_id):
+        with self._lock:
+            return list(self._samples.get(container_id, ()))
+
+    def latest(self, container_id):
+        with self._lock:
+            samples = self._samples.get(container_id)
+            return samples[-1] if samples else None
+
+    def io_rates(self, container_id):
+        """(network, block) bytes per second between the last two samples"""
+        with self._lock:
+            samples = self._samples.get(container_id)
+            if not samples or len(samples) < 2:
+                return 0.0, 0.0
+            previous, current = samples[-2], samples[-1]
+        elapsed = max(current.time - previous.time, 1e-6)
+        network = (current.net_rx + current.net_tx - previous.net_rx - previous.net_tx) / elapsed
+        block = (current.block_read + current.block_write - previous.block_read - previous.block_write) / elapsed
+        return max(0.0, network), max(0.0, block)
+
+    def top(self, n=10, key="cpu"):
+        """The `n` busiest containers as (id, latest sample, network rate, block rate)"""
+        with self._lock:
+            container_ids = [container_id for container_id, samples in self._samples.items() if samples]
+        rows = []
+        for container_id in container_ids:
+            sample = self.latest(container_id)
+            if sample is not None:
+                rows.append((container_id, sample) + self.io_rates(container_id))
+        sort_key = {
+            "cpu": lambda row: row[1].cpu_percent,
+            "memory": lambda row: row[1].memory,
+            "io": lambda row: row[2] + row[3],
+        }[key]
+        return sorted(rows, key=sort_key, reverse=True)[:n]
+
+    def _run(self, token):
+        while not token.cancelled:
+            started = time.monotonic()
+            try:
+                self.poll()
+            except RuntimeError:
+                return  # Closed while a round was being scheduled
+            token.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _poll_one(self, container_id):
+        try:
+            message = self.client.stats(container_id)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(container_id, e)
+            return False
+        with self._lock:
+            if container_id not in self._watched:
+                return False
+            baseline = self._cpu.get(container_id)
+            self._cpu[container_id] = message.get("cpu_stats") or {}
+            if baseline is None:
+                return False  # The first sample is only the baseline for CPU %
+            samples = self._samples.get(container_id)
+            if samples is None:
+                samples = self._samples[container_id] = deque(maxlen=self.history_size)
+            samples.append(parse_stats(dict(message, precpu_stats=baseline)))
+        return True
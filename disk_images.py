@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+from task_runner import run_process
+
+# What `qemu-img info` reports about an image that matters for launching and tuning it.
+# actual_size is what the image occupies on the host; backing is the base of an overlay.
+ImageInfo = namedtuple("ImageInfo", "path format virtual_size actual_size cluster_size backing dirty extended_l2")
+
+# Suggested layout for an image: target format and creation options, plus the runtime
+# l2-cache-size (bytes, None when QEMU's default covers the image) and why
+Layout = namedtuple("Layout", "format preallocation cluster_size extended_l2 l2_cache_size reasons")
+
+PREALLOCATION = {
+    "qcow2": ("off", "metadata", "falloc", "full"),
+    "raw": ("off", "falloc", "full"),
+}
+
+DEFAULT_CLUSTER_SIZE = 64 * 1024
+
+# QEMU (3.1+) caches L2 tables for up to this much image data by default on Linux
+DEFAULT_L2_CACHE = 32 * 2 ** 20
+
+# Header magic of the image formats QEMU can open, with the offset it sits at
+_MAGIC = [
+    (0, b"QFI\xfb", "qcow2"),
+    (0, b"KDMV", "vmdk"),
+    (0, b"vhdxfile", "vhdx"),
+    (0, b"conectix", "vpc"),
+    (0x40, b"\x7f\x10\xda\xbe", "vdi"),
+]
+
+
+def detect_format(path):
+    """Image format from its header magic ("raw" if none matches), or None if unreadable or empty"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(0x44)
+    except OSError:
+        return None
+    if not header:
+        return None
+    for offset, magic, fmt in _MAGIC:
+        if header[offset:offset + len(magic)] == magic:
+            return fmt
+    return "raw"
+
+
+def parse_image_info(path, info):
+    """Build an ImageInfo from the JSON of `qemu-img info --output=json`"""
+    specific = (info.get("format-specific") or {}).get("data") or {}
+    return ImageInfo(
+        path, info["format"], info.get("virtual-size", 0), info.get("actual-size", 0),
+        info.get("cluster-size"), info.get("full-backing-filename") or info.get("backing-filename"),
+        bool(info.get("dirty-flag")), bool(specific.get("extended-l2")),
+    )
+
+
+def l2_cache_size(virtual_size, cluster_size=DEFAULT_CLUSTER_SIZE, extended_l2=False):
+    """Bytes of L2 cache needed to map a whole qcow2 image without re-reading L2 tables"""
+    entry = 16 if extended_l2 else 8
+    return -(-virtual_size // cluster_size) * entry
+
+
+def recommend_layout(info):
+    """The layout giving the best I/O for an image while keeping what it is used for.
+
+    qcow2 overlays must stay qcow2; everything else is judged on allocation and
+    metadata lookups, the two costs of a thin image on the write path.
+    """
+    reasons = []
+    sparse = info.actual_size < info.virtual_size * 0.9
+    if info.format == "raw":
+        if sparse:
+            reasons.append("Sparse raw image: every first write allocates host blocks and fragments the file. "
+                           "preallocation=falloc reserves them up front.")
+            return Layout("raw", "falloc", None, False, None, reasons)
+        reasons.append("Fully allocated raw image: already the fastest layout.")
+        return Layout("raw", None, None, False, None, reasons)
+
+    if info.format != "qcow2":
+        reasons.append(f"{info.format} is handled by a slower QEMU driver; convert it to qcow2 "
+                       "(or raw when snapshots and clones are not needed).")
+
+    cluster_size = info.cluster_size or DEFAULT_CLUSTER_SIZE
+    extended_l2 = info.extended_l2
+    if info.backing:
+        # Small guest writes to an overlay copy a whole cluster from the base; subclusters cut that to 1/32
+        if not extended_l2:
+            cluster_size, extended_l2 = 128 * 1024, True
+            reasons.append("Overlay without subclusters: overlays created with cluster_size=128K and "
+                           "extended_l2=on avoid copying whole clusters from the base on small writes.")
+        preallocation = None
+    else:
+        preallocation = "metadata" if sparse else None
+        if preallocation:
+            reasons.append("Thin qcow2 image: preallocation=metadata allocates the cluster tables up front "
+                           "so first writes only write data.")
+
+    needed = l2_cache_size(info.virtual_size, cluster_size, extended_l2)
+    l2_cache = None
+    if needed > DEFAULT_L2_CACHE:
+        l2_cache = needed
+        reasons.append(f"{info.virtual_size // 2 ** 30} GB image: launch with l2-cache-size={-(-needed // 2 ** 20)}M "
+                       "to keep every L2 table in memory.")
+    if info.dirty:
+        reasons.append("Image was not closed cleanly: run `qemu-img check -r leaks` before using it.")
+    if not reasons:
+        reasons.append("qcow2 image is already laid out for good I/O.")
+    return Layout("qcow2", preallocation, cluster_size, extended_l2, l2_cache, reasons)
+
+
+def convert_command(source, target, fmt, source_format=None, compress=False, preallocation=None,
+                    cluster_size=None, extended_l2=False):
+    """qemu-img convert argv; invalid option combinations raise ValueError"""
+    if fmt not in PREALLOCATION:
+        raise ValueError(f"Cannot convert to {fmt}: choose qcow2 or raw")
+    if preallocation not in (None, "off") + PREALLOCATION[fmt]:
+        raise ValueError(f"{fmt} does not support preallocation={preallocation}")
+    if compress and fmt != "qcow2":
+        raise ValueError("Only qcow2 images can be compressed")
+    if compress and preallocation not in (None, "off"):
+        raise ValueError("Compressed images cannot be preallocated")
+    if (cluster_size or extended_l2) and fmt != "qcow2":
+        raise ValueError("Cluster size and subclusters only apply to qcow2")
+    if cluster_size and (cluster_size & (cluster_size - 1) or not 512 <= cluster_size <= 2 * 2 ** 20):
+        raise ValueError("Cluster size must be a power of two between 512 bytes and 2 MB")
+
+    options = []
+    if preallocation:
+        options.append(f"preallocation={preallocation}")
+    if cluster_size:
+        options.append(f"cluster_size={cluster_size}")
+    if extended_l2:
+        options.append("extended_l2=on")
+    cmd = ["qemu-img", "convert"]
+    if source_format:
+        cmd += ["-f", source_format]
+    cmd += ["-O", fmt]
+    if compress:
+        cmd.append("-c")
+    if options:
+        cmd += ["-o", ",".join(options)]
+    return cmd + [source, target]
+
+
+class DiskImages:
+    """Probe disk images with `qemu-img info`, cached until the file's mtime or size changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _stamp(self, path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def info(self, path):
+        """ImageInfo of `path`, probing only when the file changed since the last probe"""
+        path = os.path.abspath(path)
+        stamp = self._stamp(path)
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        # -U: the image may be open in a running VM
+        info = parse_image_info(path, json.loads(run_process(["qemu-img", "info", "-U", "--output=json", path]).stdout))
+        with self._lock:
+            self._cache[path] = (stamp, info)
+        return info
+
+    def cached(self, path):
+        """The probed ImageInfo if it is still current, without running qemu-img"""
+        path = os.path.abspath(path)
+        with self._lock:
+            cached = self._cache.get(path)
+        try:
+            return cached[1] if cached is not None and cached[0] == self._stamp(path) else None
+        except OSError:
+            return None
+
+    def format(self, path):
+        """Format to open `path` with: probed, else from the header, else from the extension"""
+        info = self.cached(path)
+        if info is not None:
+            return info.format
+        return detect_format(path) or ("qcow2" if path.endswith(".qcow2") else "raw")
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.abspath(path), None)
+
+    def recommend(self, path):
+        return recommend_layout(self.info(path))
+
+    def convert(self, source, target, fmt, compress=False, preallocation=None, cluster_size=None,
+                extended_l2=False):
+        """Write `source` as a new `fmt` image at `target` and return the new image's info"""
+        if os.path.abspath(source) == os.path.abspath(target):
+            raise ValueError("Convert into a new file; the source is read while the target is written")
+        run_process(convert_command(source, target, fmt, self.format(source), compress, preallocation,
+                                    cluster_size, extended_l2))
+        return self.info(target)
@@ -0,0 +1,408 @@
+import http.client
+import io
+import json
+import os
+import posixpath
+import queue
+import re
+import socket
+import tarfile
+import tempfile
+import threading
+from urllib.parse import quote, urlencode
+
+DEFAULT_SOCKET = "/var/run/docker.sock"
+
+_DEFAULT = object()
+
+
+class DockerAPIError(Exception):
+    """Error returned by the Docker Engine API"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class DockerConnectionError(DockerAPIError):
+    """The Docker daemon socket could not be reached"""
+
+
+def socket_path_from_env():
+    """Return the unix socket named by DOCKER_HOST, or the default socket"""
+    host = os.environ.get("DOCKER_HOST", "")
+    if host.startswith("unix://"):
+        return host[len("unix://"):]
+    return DEFAULT_SOCKET
+
+
+def split_image_ref(ref):
+    """Split 'repo[:tag|@digest]' into (repo, tag) the way `docker pull` does"""
+    if "@" in ref:
+        repo, digest = ref.split("@", 1)
+        return repo, digest
+    slash = ref.rfind("/")
+    colon = ref.rfind(":")
+    if colon > slash:
+        return ref[:colon], ref[colon + 1:]
+    return ref, "latest"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a unix domain socket instead of TCP"""
+
+    def __init__(self, socket_path, timeout=60):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class _ConnectionCloser:
+    """Adapter letting a CancelToken shut down a streaming connection"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.closed = False
+
+    def kill(self):
+        self.closed = True
+        if self.conn.sock is not None:
+            try:
+                self.conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class DockerClient:
+    """Minimal Docker Engine API client with a pool of keep-alive connections.
+
+    All methods are blocking and thread safe; call them from the TaskRunner.
+    """
+
+    def __init__(self, socket_path=None, pool_size=4, timeout=60):
+        self.socket_path = socket_path or socket_path_from_env()
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._pool = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    # Connection pool
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return UnixHTTPConnection(self.socket_path, self.timeout)
+        # Pool exhausted: wait for a connection to be handed back
+        return self._pool.get()
+
+    def _release(self, conn, reusable=True):
+        if not reusable:
+            conn.close()
+        elif conn.timeout != self.timeout and conn.sock is not None:
+            conn.sock.settimeout(self.timeout)
+        conn.timeout = self.timeout
+        self._pool.put(conn)
+
+    def fork(self, pool_size):
+        """A client on the same socket with a connection pool of its own"""
+        return DockerClient(self.socket_path, pool_size=pool_size, timeout=self.timeout)
+
+    def close(self):
+        """Close every idle pooled connection"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # Requests
+
+    def _send(self, method, path, params=None, body=None, headers=None, read_timeout=_DEFAULT):
+        url = path
+        if params:
+            url += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = dict(headers or {})
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+            headers.setdefault("Content-Type", "application/json")
+
+        conn = self._acquire()
+        if read_timeout is not _DEFAULT:
+            # Also used by connect() if the connection is (re)opened; _release() restores it
+            conn.timeout = read_timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(read_timeout)
+        for attempt in range(2):
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                return conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # The daemon closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                if attempt or (body is not None and not isinstance(body, bytes)):
+                    self._release(conn)
+                    raise DockerConnectionError("Connection to the Docker daemon was lost")
+            except (FileNotFoundError, ConnectionRefusedError, PermissionError) as e:
+                conn.close()
+                self._release(conn)
+                raise DockerConnectionError(
+                    f"Cannot connect to the Docker daemon at unix://{self.socket_path}: {e.strerror}")
+            except Exception:
+                self._release(conn, reusable=False)
+                raise
+
+    def _raise_for_status(self, response, payload):
+        if response.status < 400:
+            return
+        message = payload.decode(errors="replace").strip()
+        try:
+            message = json.loads(message).get("message", message)
+        except (ValueError, AttributeError):
+            pass
+        raise DockerAPIError(message or response.reason, status=response.status)
+
+    def request(self, method, path, params=None, body=None, headers=None):
+        """Send a request and return the decoded JSON body (None for empty bodies)"""
+        conn, response = self._send(method, path, params, body, headers)
+        try:
+            payload = response.read()
+        except Exception:
+            self._release(conn, reusable=False)
+            raise
+        self._release(conn, reusable=not response.will_close)
+
+        self._raise_for_status(response, payload)
+        if not payload:
+            return None
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            return json.loads(payload)
+        return payload.decode(errors="replace")
+
+    def stream(self, method, path, params=None, body=None, headers=None, token=None, read_timeout=_DEFAULT):
+        """Send a request and yield each JSON object of a newline-delimited streaming response.
+
+        Cancelling `token` shuts the connection down so a blocked read returns immediately.
+        `read_timeout=None` waits forever between messages, as needed for event streams.
+        """
+        conn, response = self._send(method, path, params, body, headers)
+        finished = False
+        closer = _ConnectionCloser(conn)
+        if token is not None:
+            token.attach(closer)
+        if read_timeout is not _DEFAULT and conn.sock is not None:
+            conn.sock.settimeout(read_timeout)
+        try:
+            if response.status >= 400:
+                payload = response.read()
+                finished = True
+                self._raise_for_status(response, payload)
+
+            while True:
+                try:
+                    line = response.readline()
+                except (OSError, http.client.HTTPException):
+                    if closer.closed:
+                        return
+                    raise
+                if not line or closer.closed:
+                    finished = True
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise DockerAPIError(message["error"])
+                yield message
+        finally:
+            if token is not None:
+                token.detach(closer)
+            if conn.sock is not None:
+                conn.sock.settimeout(self.timeout)
+            # A stream abandoned half way cannot be reused for the next request
+            self._release(conn, reusable=finished and not closer.closed and not response.will_close)
+
+    # Engine API endpoints
+
+    def ping(self):
+        return self.request("GET", "/_ping") == "OK"
+
+    def images(self, all=False):
+        """Return the structured image list (`GET /images/json`)"""
+        return self.request("GET", "/images/json", {"all": int(all)})
+
+    def containers(self, all=True, filters=None):
+        """Return the structured container list (`GET /containers/json`)"""
+        params = {"all": int(all)}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        return self.request("GET", "/containers/json", params)
+
+    def container(self, container_id):
+        """Return the list entry of one container, or None if it no longer exists"""
+        matches = self.containers(all=True, filters={"id": [container_id]})
+        return next((c for c in matches if c["Id"] == container_id), None)
+
+    def events(self, since=None, filters=None, token=None):
+        """Yield daemon events (`GET /events`) until the stream ends or `token` is cancelled"""
+        params = {"since": since}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        return self.stream("GET", "/events", params, token=token, read_timeout=None)
+
+    def stats(self, container_id):
+        """One resource usage sample of a container (`GET /containers/{id}/stats`), without waiting for a second"""
+        return self.request("GET", f"/containers/{quote(container_id, safe='')}/stats",
+                            {"stream": 0, "one-shot": 1})
+
+    def _container_action(self, method, container_id, action="", params=None, wait=None):
+        """Send a container lifecycle request; returns False if the daemon had nothing to do (304).
+
+        `wait` is the grace period the daemon may spend before answering, on top of the client timeout.
+        """
+        path = f"/containers/{quote(container_id, safe='')}{action}"
+        conn, response = self._send(method, path, params, read_timeout=self.timeout + wait if wait else _DEFAULT)
+        try:
+            payload = response.read()
+        except Exception:
+            self._release(conn, reusable=False)
+            raise
+        self._release(conn, reusable=not response.will_close)
+        if response.status == 304:
+            return False
+        self._raise_for_status(response, payload)
+        return True
+
+    def stop_container(self, container_id, timeout=None):
+        """Stop a container, killing it after `timeout` seconds; returns False if it was already stopped"""
+        return self._container_action("POST", container_id, "/stop", {"t": timeout}, wait=timeout)
+
+    def restart_container(self, container_id, timeout=None):
+        """Restart a container, killing it after `timeout` seconds if it does not stop"""
+        return self._container_action("POST", container_id, "/restart", {"t": timeout}, wait=timeout)
+
+    def remove_container(self, container_id, force=False, volumes=False):
+        """Delete a container; `force` kills it first if it is running, `volumes` drops its anonymous volumes"""
+        return self._container_action("DELETE", container_id, params={"force": int(force), "v": int(volumes)})
+
+    def prune_containers(self, filters=None):
+        """Delete every stopped container matching `filters`; returns the deleted ids and reclaimed bytes"""
+        params = {"filters": json.dumps(filters)} if filters else None
+        return self.request("POST", "/containers/prune", params)
+
+    def pull(self, image, token=None):
+        """Pull an image, yielding the daemon's progress messages"""
+        repo, tag = split_image_ref(image)
+        return self.stream("POST", "/images/create", {"fromImage": repo, "tag": tag}, token=token)
+
+    def build(self, dockerfile_path, tag, context_dir=None, token=None):
+        """Build an image from a Dockerfile, yielding the daemon's build messages"""
+        context_dir = context_dir or os.path.dirname(os.path.abspath(dockerfile_path))
+        dockerfile = os.path.relpath(os.path.abspath(dockerfile_path), context_dir)
+        context = build_context(context_dir, keep=[dockerfile.replace(os.sep, "/")])
+        params = {"t": tag, "dockerfile": dockerfile.replace(os.sep, "/"), "rm": 1}
+        headers = {"Content-Type": "application/x-tar",
+                   "Content-Length": str(context.seek(0, io.SEEK_END))}
+        context.seek(0)
+        try:
+            yield from self.stream("POST", "/build", params, body=context, headers=headers, token=token)
+        finally:
+            context.close()
+
+
+def build_context(context_dir, keep=()):
+    """Pack `context_dir` into an uncompressed tar spooled to disk once it gets large.
+
+    Paths matched by the context's .dockerignore are left out, except the paths in
+    `keep` (the Dockerfile) and the .dockerignore itself, which the daemon also reads.
+    """
+    patterns = read_dockerignore(context_dir)
+    exceptions = any(not exclude for _, exclude in patterns)
+    keep = {posixpath.normpath(path) for path in keep} | {".dockerignore"}
+
+    def include(info):
+        path = info.name[2:]  # Members are named "./<path>" under arcname "."
+        if not path or path in keep or not ignored(path, patterns):
+            return info
+        # An ignored directory is still walked when a "!" pattern may bring back something inside it
+        return info if info.isdir() and exceptions else None
+
+    context = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+    with tarfile.open(fileobj=context, mode="w") as tar:
+        tar.add(context_dir, arcname=".", filter=include)
+    return context
+
+
+def read_dockerignore(context_dir):
+    """(regex, exclude) pairs of the context's .dockerignore in file order; "!" lines have exclude False"""
+    try:
+        with open(os.path.join(context_dir, ".dockerignore")) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    patterns = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        exclude = not line.startswith("!")
+        pattern = posixpath.normpath(line.lstrip("!").strip().lstrip("/"))
+        if pattern != ".":
+            patterns.append((re.compile(_pattern_regex(pattern)), exclude))
+    return patterns
+
+
+def ignored(path, patterns):
+    """Whether .dockerignore `patterns` leave out `path`; the last matching pattern wins"""
+    result = False
+    for regex, exclude in patterns:
+        if regex.match(path):
+            result = exclude
+    return result
+
+
+def _pattern_regex(pattern):
+    """Regex for a .dockerignore glob: * and ? stay within one path element, ** spans any number.
+
+    A pattern matching a directory also matches everything below it.
+    """
+    parts, i = [], 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        if char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and "]" in pattern[i + 1:]:
+            # Character classes share their syntax ([a-z], [^0-9]) with regexes
+            end = pattern.index("]", i + 1)
+            parts.append(pattern[i:end + 1])
+            i = end + 1
+            continue
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return "^" + "".join(parts) + "(?:/.*)?$"
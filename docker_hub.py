@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from task_runner import TaskCancelled, current_token
+
+SEARCH_URL = "https://hub.docker.com/v2/search/repositories/"
+
+# Hub requests in flight at once; matches the session's connection pool
+MAX_REQUESTS = 8
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries go stale after `ttl` seconds.
+
+    Stale entries are kept (up to `maxsize`) so their ETag can be revalidated.
+    With `cache_dir` set, entries are also written to disk and survive restarts.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, cache_dir=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key):
+        """Return (data, etag, fresh) for `key`, or None if it was never cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            self._store(key, entry)
+        stored_at, etag, data = entry
+        return data, etag, time.time() - stored_at < self.ttl
+
+    def put(self, key, data, etag=None):
+        entry = (time.time(), etag, data)
+        self._store(key, entry)
+        if self.cache_dir:
+            path = self._path(key)
+            tmp = f"{path}.tmp"
+            try:
+                with open(tmp, "w") as f:
+                    json.dump({"key": key, "stored_at": entry[0], "etag": etag, "data": data}, f)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+
+    def touch(self, key):
+        """Mark a revalidated entry as fresh again"""
+        cached = self.get(key)
+        if cached is not None:
+            self.put(key, cached[0], cached[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if record.get("key") != key:
+            return None
+        return record["stored_at"], record.get("etag"), record["data"]
+
+
+class DockerHubClient:
+    """Docker Hub search client sharing one pooled requests.Session.
+
+    Results are cached per (query, page, page_size); stale entries are
+    revalidated with If-None-Match so an unchanged page costs a 304.
+    """
+
+    def __init__(self, cache_dir=None, ttl=300, timeout=(3.05, 15), session=None):
+        self.timeout = timeout
+        self.cache = TTLCache(ttl=ttl, cache_dir=cache_dir)
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_REQUESTS)
+        self.session.mount("https://", adapter)
+        self._requests = ThreadPoolExecutor(max_workers=MAX_REQUESTS, thread_name_prefix="hub-search")
+
+    def search(self, query, page=1, page_size=25):
+        """Return the decoded search response for one page of `query`"""
+        query = query.strip()
+        key = json.dumps([query.lower(), page, page_size])
+        cached = self.cache.get(key)
+        if cached is not None and cached[2]:
+            return cached[0]
+
+        token = current_token()
+        token.raise_if_cancelled()
+
+        headers = {}
+        if cached is not None and cached[1]:
+            headers["If-None-Match"] = cached[1]
+        response = self._get(token, params={"query": query, "page": page, "page_size": page_size},
+                             headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and cached is not None:
+            self.cache.touch(key)
+            return cached[0]
+        response.raise_for_status()
+        data = response.json()
+        self.cache.put(key, data, response.headers.get("ETag"))
+        return data
+
+    def _get(self, token, **kwargs):
+        """session.get() that gives the worker back as soon as a newer search supersedes this one.
+
+        requests has no handle on a request before its headers arrive, so the GET runs on a
+        small bounded pool; it is streamed so an abandoned one is closed once its headers
+        arrive, without downloading the body.
+        """
+        settled = threading.Event()
+        request = self._requests.submit(self.session.get, SEARCH_URL, stream=True, **kwargs)
+        request.add_done_callback(lambda _: settled.set())
+        waker = _Waker(settled)
+        token.attach(waker)
+        try:
+            settled.wait()
+        finally:
+            token.detach(waker)
+        if token.cancelled:
+            # Still queued behind other searches: drop it; already sent: close it unread
+            request.cancel()
+            request.add_done_callback(_close_response)
+            raise TaskCancelled()
+        return request.result()
+
+    def close(self):
+        self._requests.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+
+class _Waker:
+    """Cancel hook that stops a search waiting for its response"""
+
+    def __init__(self, event):
+        self.event = event
+
+    def kill(self):
+        self.event.set()
+
+
+def _close_response(request):
+    if not request.cancelled() and request.exception() is None:
+        request.result().close()
+
+
+class HubSearch:
+    """Lazily paged Docker Hub search.
+
+    Pages are fetched only when the user asks for more rows, plus `prefetch`
+    pages ahead so scrolling stays instant. Pages may arrive out of order;
+    they are buffered until every earlier page has been handed out.
+    """
+
+    def __init__(self, client, query, page_size=25, prefetch=1):
+        self.client = client
+        self.query = query
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.count = None
+        self.last_page = None
+        self.rendered = 0
+        self.rows = 0
+        self.tasks = []
+        self._wanted = 0
+        self._requested = 0
+        self._failed = set()
+        self._buffer = {}
+
+    @property
+    def has_more(self):
+        return self.last_page is None or self.rendered < self.last_page
+
+    def fetch(self, page):
+        return self.client.search(self.query, page, self.page_size)
+
+    def want_next(self):
+        """Ask for one more page of rows; returns the page numbers that must be fetched now"""
+        if not self.has_more:
+            return []
+        self._wanted = max(self._wanted, self.rendered + 1)
+        return self.pages_to_fetch()
+
+    def pages_to_fetch(self):
+        """Pages not yet requested, or whose request failed, up to the wanted page plus the prefetch window.
+
+        Prefetching starts once the first response has told us how many results exist.
+        """
+        last = self._wanted + (self.prefetch if self.count is not None else 0)
+        if self.last_page is not None:
+            last = min(last, self.last_page)
+        retry = sorted(page for page in self._failed if page <= last)
+        self._failed.difference_update(retry)
+        pages = retry + list(range(self._requested + 1, last + 1))
+        self._requested = max(self._requested, last)
+        return pages
+
+    def add_page(self, page, response):
+        """Buffer a fetched page"""
+        results = response.get("results", [])
+        self.count = response.get("count", self.count)
+        last_page = None
+        if not response.get("next") or len(results) < self.page_size:
+            last_page = page
+        elif self.count is not None:
+            last_page = max(1, -(-self.count // self.page_size))
+        if last_page is not None:
+            self.last_page = last_page if self.last_page is None else min(self.last_page, last_page)
+        self._buffer[page] = results
+
+    def page_failed(self, page):
+        """Mark a page for a new request; pages after it that are in flight or buffered are kept"""
+        self._failed.add(page)
+        self._wanted = min(self._wanted, page - 1)
+
+    def take_ready(self):
+        """Return the rows of every buffered page the user has asked to see, in order"""
+        rows = []
+        while self.rendered < self._wanted and self.rendered + 1 in self._buffer:
+            self.rendered += 1
+            rows.extend(self._buffer.pop(self.rendered))
+        # Pages past the last one are no longer needed
+        if self.last_page is not None:
+            for page in [p for p in self._buffer if p > self.last_page]:
+                del self._buffer[page]
+        self.rows += len(rows)
+        return rows
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
@@ -0,0 +1,234 @@
+import bisect
+import difflib
+import string
+import threading
+import time
+
+
+class ImageRecord:
+    """Compact view of one `GET /images/json` entry"""
+
+    __slots__ = ("id", "repo_tags", "digests", "size", "created")
+
+    def __init__(self, image_id, repo_tags, digests, size, created):
+        self.id = image_id
+        self.repo_tags = repo_tags
+        self.digests = digests
+        self.size = size
+        self.created = created
+
+    @classmethod
+    def from_api(cls, image):
+        repo_tags = tuple(tuple(tag.rsplit(":", 1)) for tag in image.get("RepoTags") or []
+                          if tag != "<none>:<none>" and ":" in tag)
+        digests = tuple(digest.split("@", 1)[1] for digest in image.get("RepoDigests") or [] if "@" in digest)
+        return cls(image["Id"], repo_tags, digests, image.get("Size", 0), image.get("Created", 0))
+
+    @property
+    def short_id(self):
+        return self.id.split(":")[-1][:12]
+
+    @property
+    def names(self):
+        return [f"{repo}:{tag}" for repo, tag in self.repo_tags] or ["<none>:<none>"]
+
+    def _key(self):
+        return self.repo_tags, self.digests, self.size, self.created
+
+    def __eq__(self, other):
+        return isinstance(other, ImageRecord) and self.id == other.id and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"ImageRecord({self.short_id}, {', '.join(self.names)})"
+
+
+class ImageInventory:
+    """Local images indexed by repository, tag, ID prefix and digest.
+
+    Lookups never touch the daemon; `refresh()` refetches the image list and
+    re-indexes only the records that changed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.loaded_at = None
+        self._lock = threading.RLock()
+        self._records = {}
+        self._by_repo = {}
+        self._by_tag = {}
+        self._by_digest = {}
+        self._names = []  # sorted (lowercase name, image id); names are "repo" and "repo:tag"
+        self._ids = []  # sorted (hex digits, image id) for ID prefix lookups
+
+    def __len__(self):
+        return len(self._records)
+
+    def records(self):
+        """All images, newest first"""
+        with self._lock:
+            return sorted(self._records.values(), key=lambda record: record.created, reverse=True)
+
+    def refresh(self):
+        """Sync with the daemon; returns (added, removed, changed) image ids"""
+        return self.update(self.client.images())
+
+    def update(self, images):
+        """Apply a full image list, touching only records that differ"""
+        fresh = {image["Id"]: ImageRecord.from_api(image) for image in images}
+        with self._lock:
+            removed = [image_id for image_id in self._records if image_id not in fresh]
+            added, changed = [], []
+            for image_id in removed:
+                self._unindex(self._records.pop(image_id))
+            for image_id, record in fresh.items():
+                old = self._records.get(image_id)
+                if old == record:
+                    continue
+                if old is None:
+                    added.append(image_id)
+                else:
+                    changed.append(image_id)
+                    # Unindex while the lists are still sorted; _remove_sorted bisects them
+                    self._unindex(old)
+            for image_id in added + changed:
+                record = self._records[image_id] = fresh[image_id]
+                self._index(record)
+            if added or changed:
+                # Appended unsorted above; one sort beats an insort per name on a first load
+                self._names.sort()
+                self._ids.sort()
+            self.loaded_at = time.monotonic()
+        return added, removed, changed
+
+    def is_stale(self, max_age):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > max_age
+
+    # Lookups
+
+    def by_repository(self, repo):
+        with self._lock:
+            return [self._records[i] for i in self._by_repo.get(repo, ())]
+
+    def by_tag(self, tag):
+        with self._lock:
+            return [self._records[i] for i in self._by_tag.get(tag, ())]
+
+    def by_digest(self, digest):
+        with self._lock:
+            image_id = self._by_digest.get(digest)
+            return self._records.get(image_id) if image_id else None
+
+    def by_id_prefix(self, prefix):
+        prefix = prefix.lower()
+        if prefix.startswith("sha256:"):
+            prefix = prefix[len("sha256:"):]
+        if not prefix:
+            return []  # An empty prefix would match every image
+        with self._lock:
+            start = bisect.bisect_left(self._ids, (prefix,))
+            matches = []
+            for hex_id, image_id in self._ids[start:]:
+                if not hex_id.startswith(prefix):
+                    break
+                matches.append(self._records[image_id])
+            return matches
+
+    def search(self, query, limit=50):
+        """Find images by reference, repository/tag prefix, ID prefix or digest, falling back to fuzzy matching"""
+        query = query.strip()
+        if not query:
+            return []
+        lowered = query.lower()
+        with self._lock:
+            found = {}
+
+            if "@" in query or lowered.startswith("sha256:"):
+                record = self.by_digest(query.split("@", 1)[-1])
+                if record is not None:
+                    found[record.id] = record
+
+            # Exact reference first; a bare repository means :latest like `docker images`
+            reference = lowered if ":" in lowered.rsplit("/", 1)[-1] else f"{lowered}:latest"
+            for image_id in self._name_range(reference, exact=True):
+                found.setdefault(image_id, self._records[image_id])
+
+            for image_id in self._name_range(lowered):
+                found.setdefault(image_id, self._records[image_id])
+                if len(found) >= limit:
+                    break
+
+            hex_part = lowered.split(":")[-1]
+            if hex_part and all(c in string.hexdigits for c in hex_part):
+                for record in self.by_id_prefix(lowered):
+                    found.setdefault(record.id, record)
+
+            if not found:
+                for record in self._fuzzy(lowered, limit):
+                    found.setdefault(record.id, record)
+
+            return list(found.values())[:limit]
+
+    def _name_range(self, prefix, exact=False):
+        start = bisect.bisect_left(self._names, (prefix,))
+        for name, image_id in self._names[start:]:
+            if (name != prefix) if exact else not name.startswith(prefix):
+                break
+            yield image_id
+
+    def _fuzzy(self, query, limit):
+        names = {}
+        for name, image_id in self._names:
+            names.setdefault(name, image_id)
+        # Substring hits rank above close spellings
+        hits = [name for name in names if query in name]
+        hits += difflib.get_close_matches(query, names.keys(), n=limit, cutoff=0.6)
+        seen, records = set(), []
+        for name in hits:
+            image_id = names[name]
+            if image_id not in seen:
+                seen.add(image_id)
+                records.append(self._records[image_id])
+        return records[:limit]
+
+    # Index maintenance
+
+    def _index_names(self, record):
+        names = set()
+        for repo, tag in record.repo_tags:
+            names.add(repo.lower())
+            names.add(f"{repo}:{tag}".lower())
+        return names
+
+    def _index(self, record):
+        for repo, tag in record.repo_tags:
+            self._by_repo.setdefault(repo, set()).add(record.id)
+            self._by_tag.setdefault(tag, set()).add(record.id)
+        for digest in record.digests:
+            self._by_digest[digest] = record.id
+        # The caller sorts both lists once all records are indexed
+        self._names.extend((name, record.id) for name in self._index_names(record))
+        self._ids.append((record.id.split(":")[-1], record.id))
+
+    def _unindex(self, record):
+        for repo, tag in record.repo_tags:
+            for index, key in ((self._by_repo, repo), (self._by_tag, tag)):
+                ids = index.get(key)
+                if ids is not None:
+                    ids.discard(record.id)
+                    if not ids:
+                        del index[key]
+        for digest in record.digests:
+            if self._by_digest.get(digest) == record.id:
+                del self._by_digest[digest]
+        for entry in [(name, record.id) for name in self._index_names(record)]:
+            self._remove_sorted(self._names, entry)
+        self._remove_sorted(self._ids, (record.id.split(":")[-1], record.id))
+
+    @staticmethod
+    def _remove_sorted(items, item):
+        position = bisect.bisect_left(items, item)
+        if position < len(items) and items[position] == item:
+            del items[position]
@@ -0,0 +1,184 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+# What the UI needs to redraw: log lines appended since the last snapshot,
+# how many lines were dropped unseen, overall progress (0-1 or None) and per-layer/step summary.
+# outcome says how a done stream ended: "finished", "failed" or "cancelled"
+ProgressSnapshot = namedtuple("ProgressSnapshot", "label lines dropped fraction summary done outcome",
+                              defaults=(None,))
+
+
+class RingBuffer:
+    """Bounded line buffer that remembers how many lines ever passed through it"""
+
+    def __init__(self, maxlen=2000):
+        self._lines = deque(maxlen=maxlen)
+        self.total = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines)
+
+    @property
+    def maxlen(self):
+        return self._lines.maxlen
+
+    def extend(self, lines):
+        for line in lines:
+            self._lines.append(line)
+            self.total += 1
+
+    def since(self, seq):
+        """Return (lines appended after sequence number `seq`, lines lost to overflow)"""
+        new = self.total - seq
+        available = min(new, len(self._lines))
+        lines = list(self._lines)[len(self._lines) - available:] if available else []
+        return lines, new - available
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class PullProgress:
+    """Per-layer progress of an image pull parsed from Engine API messages"""
+
+    def __init__(self):
+        self.layers = OrderedDict()
+        self.status = ""
+
+    def update(self, message):
+        """Record one message; returns log lines worth keeping (status changes, not byte counters)"""
+        status = message.get("status", "")
+        layer = message.get("id")
+        detail = message.get("progressDetail") or {}
+
+        if not layer or status.startswith(("Pulling from", "Digest:", "Status:")):
+            self.status = status if not layer else f"{status} {layer}"
+            return [self.status]
+
+        previous = self.layers.get(layer)
+        current, total = detail.get("current"), detail.get("total")
+        if previous is not None and current is None:
+            # Keep the byte counters of the last phase (e.g. "Download complete")
+            current, total = previous[1], previous[2]
+        if status in ("Download complete", "Pull complete", "Already exists") and total:
+            current = total
+        self.layers[layer] = (status, current, total)
+
+        if previous is None or previous[0] != status:
+            return [f"{layer}: {status}"]
+        return []
+
+    @property
+    def fraction(self):
+        sized = [(current or 0, total) for _, current, total in self.layers.values() if total]
+        if not sized:
+            return None
+        return sum(current for current, _ in sized) / sum(total for _, total in sized)
+
+    def summary(self):
+        lines = []
+        for layer, (status, current, total) in self.layers.items():
+            if total:
+                lines.append(f"{layer}: {status} {format_bytes(current or 0)}/{format_bytes(total)}")
+            else:
+                lines.append(f"{layer}: {status}")
+        return lines
+
+
+class BuildProgress:
+    """Build-step progress parsed from the `stream` messages of `POST /build`"""
+
+    STEP = re.compile(r"^Step (\d+)/(\d+) : (.*)")
+
+    def __init__(self):
+        self.step = 0
+        self.steps = 0
+        self.current = ""
+        self.image_id = None
+        self._partial = ""
+
+    def update(self, message):
+        if "aux" in message:
+            self.image_id = message["aux"].get("ID", self.image_id)
+            return []
+        if "status" in message:
+            return [message["status"]]
+
+        # Stream text is not guaranteed to end on a line boundary
+        text = self._partial + message.get("stream", "")
+        *lines, self._partial = text.split("\n")
+        for line in lines:
+            match = self.STEP.match(line)
+            if match:
+                self.step, self.steps = int(match.group(1)), int(match.group(2))
+                self.current = match.group(3)
+        return [line for line in lines if line.strip()]
+
+    def flush(self):
+        partial, self._partial = self._partial, ""
+        return [partial] if partial.strip() else []
+
+    @property
+    def fraction(self):
+        return self.step / self.steps if self.steps else None
+
+    def summary(self):
+        if not self.steps:
+            return []
+        return [f"Step {self.step}/{self.steps}: {self.current}"]
+
+
+class ProgressStream:
+    """Feed streamed daemon messages through a tracker into a ring buffer.
+
+    `publish(snapshot)` is called from the worker at most every `interval`
+    seconds (and once when the stream ends), so a chatty build cannot flood
+    the Tk event queue.
+    """
+
+    def __init__(self, tracker, publish, label="", maxlen=2000, interval=0.1):
+        self.tracker = tracker
+        self.publish = publish
+        self.label = label
+        self.buffer = RingBuffer(maxlen)
+        self.interval = interval
+        self._published = 0
+        self._last_publish = 0.0
+        self._lock = threading.Lock()
+
+    def feed(self, message):
+        lines = self.tracker.update(message)
+        with self._lock:
+            self.buffer.extend(lines)
+        if time.monotonic() - self._last_publish >= self.interval:
+            self._emit(done=False)
+
+    def close(self, outcome="finished"):
+        """Flush any partial line and publish the final snapshot with how the stream ended"""
+        flush = getattr(self.tracker, "flush", None)
+        if flush:
+            with self._lock:
+                self.buffer.extend(flush())
+        self._emit(done=True, outcome=outcome)
+
+    def tail(self, count):
+        """The last `count` buffered lines"""
+        with self._lock:
+            return list(self.buffer)[-count:]
+
+    def _emit(self, done, outcome=None):
+        with self._lock:
+            lines, dropped = self.buffer.since(self._published)
+            self._published = self.buffer.total
+        self._last_publish = time.monotonic()
+        self.publish(ProgressSnapshot(self.label, lines, dropped, self.tracker.fraction,
+                                      self.tracker.summary(), done, outcome))
@@ -0,0 +1,157 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from docker_api import DockerAPIError, DockerConnectionError
+from progress_stream import PullProgress
+from task_runner import TaskCancelled, current_token
+
+DEFAULT_REGISTRY = "docker.io"
+
+# Outcome of pulling one image
+PullResult = namedtuple("PullResult", "ref ok attempts seconds bytes error")
+
+# Daemon error messages that are worth retrying
+TRANSIENT_ERRORS = ("timeout", "timed out", "tls handshake", "connection reset", "connection refused",
+                    "unexpected eof", "toomanyrequests", "too many requests", "service unavailable",
+                    "bad gateway", "temporary failure", "i/o timeout")
+
+
+def normalize_ref(ref):
+    """Expand an image reference to registry/namespace/repo:tag so duplicates compare equal"""
+    ref = ref.strip()
+    name, digest = (ref.split("@", 1) + [None])[:2]
+    slash, colon = name.rfind("/"), name.rfind(":")
+    tag = None
+    if colon > slash:
+        name, tag = name[:colon], name[colon + 1:]
+
+    first, _, rest = name.partition("/")
+    if rest and ("." in first or ":" in first or first == "localhost"):
+        registry, path = first, rest
+    else:
+        registry, path = DEFAULT_REGISTRY, name
+    if registry == DEFAULT_REGISTRY and "/" not in path:
+        path = f"library/{path}"
+
+    if digest:
+        return f"{registry}/{path}@{digest}"
+    return f"{registry}/{path}:{tag or 'latest'}"
+
+
+def load_refs(path):
+    """Read image references from a file, one per line; blank lines and # comments are ignored"""
+    with open(path) as f:
+        return parse_refs(f.read())
+
+
+def parse_refs(text):
+    refs = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            refs.extend(line.replace(",", " ").split())
+    return refs
+
+
+def dedupe_refs(refs):
+    """Drop references naming the same image, keeping the first spelling"""
+    seen, unique = set(), []
+    for ref in refs:
+        key = normalize_ref(ref)
+        if key not in seen:
+            seen.add(key)
+            unique.append(ref)
+    return unique
+
+
+def is_transient(error):
+    if isinstance(error, (DockerConnectionError, OSError)):
+        return True
+    if isinstance(error, DockerAPIError):
+        if error.status is not None and error.status >= 500:
+            return True
+        return any(marker in str(error).lower() for marker in TRANSIENT_ERRORS)
+    return False
+
+
+class PullReport:
+    """Per-image results and aggregate throughput of one queue run"""
+
+    def __init__(self, results, seconds):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def total_bytes(self):
+        return sum(result.bytes for result in self.results)
+
+    @property
+    def throughput(self):
+        """Bytes per second over the wall time of the whole run"""
+        return self.total_bytes / self.seconds if self.seconds else 0.0
+
+
+class PullQueue:
+    """Pull many images with bounded concurrency, de-duplication and retries.
+
+    `on_update(ref, state, result)` is called from worker threads as images
+    start ("pulling"), retry ("retrying") and finish ("done"/"failed").
+    """
+
+    def __init__(self, client, concurrency=3, retries=2, backoff=1.0):
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+
+    def run(self, refs, on_update=None):
+        on_update = on_update or (lambda ref, state, result: None)
+        token = current_token()
+        refs = dedupe_refs(refs)
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pull-queue") as pool:
+            futures = [pool.submit(self._pull_one, ref, token, on_update) for ref in refs]
+            results = [future.result() for future in futures]
+
+        token.raise_if_cancelled()
+        return PullReport(results, time.monotonic() - started)
+
+    def _pull_one(self, ref, token, on_update):
+        started = time.monotonic()
+        attempts = 0
+        error = None
+        while attempts <= self.retries:
+            if token.cancelled:
+                return PullResult(ref, False, attempts, time.monotonic() - started, 0, "cancelled")
+            attempts += 1
+            on_update(ref, "pulling" if attempts == 1 else "retrying", None)
+            progress = PullProgress()
+            try:
+                for message in self.client.pull(ref, token=token):
+                    progress.update(message)
+                if token.cancelled:
+                    raise TaskCancelled()
+            except TaskCancelled:
+                return PullResult(ref, False, attempts, time.monotonic() - started, 0, "cancelled")
+            except Exception as e:
+                error = e
+                if not is_transient(e) or attempts > self.retries:
+                    break
+                # Exponential backoff, cut short by cancellation
+                token.wait(self.backoff * 2 ** (attempts - 1))
+                continue
+
+            size = sum(total for _, _, total in progress.layers.values() if total)
+            result = PullResult(ref, True, attempts, time.monotonic() - started, size, None)
+            on_update(ref, "done", result)
+            return result
+
+        result = PullResult(ref, False, attempts, time.monotonic() - started, 0, str(error))
+        on_update(ref, "failed", result)
+        return result
@@ -0,0 +1,282 @@
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import tempfile
+import threading
+
+# Unix socket paths are limited to ~108 bytes, so keep them in a short per-user runtime directory
+DEFAULT_QMP_DIR = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+
+# Replies can list every block device; asyncio's default 64 KiB line limit is too small
+READ_LIMIT = 2 ** 20
+
+
+class QMPError(Exception):
+    """Error reply to a QMP command"""
+
+    def __init__(self, error_class, desc):
+        super().__init__(f"{error_class}: {desc}")
+        self.error_class = error_class
+        self.desc = desc
+
+
+def qmp_socket_path(vm_id, qmp_dir=DEFAULT_QMP_DIR):
+    return os.path.join(qmp_dir, f"cloud-manager-{vm_id}.qmp")
+
+
+def qmp_args(path):
+    """QEMU flags that expose a QMP server on the unix socket `path`"""
+    return ["-qmp", f"unix:{path},server=on,wait=off"]
+
+
+def parse_qmp_socket(cmdline):
+    """Return the QMP unix socket of a QEMU command line, if it has one"""
+    for flag, value in zip(cmdline, cmdline[1:]):
+        if flag == "-qmp" and value.startswith("unix:"):
+            return value[len("unix:"):].split(",")[0]
+    return None
+
+
+def thread_cpu_seconds(tid):
+    """User + system CPU time of one thread (e.g. a vCPU) from /proc/<tid>/stat"""
+    try:
+        with open(f"/proc/{tid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return 0.0
+    # Fields after the command name start at "state"; utime and stime follow 10 fields later
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class QMPConnection:
+    """One QMP session; every method runs on the monitor's event loop"""
+
+    def __init__(self, path, on_event=None):
+        self.path = path
+        self.on_event = on_event
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader = self._writer = self._read_task = None
+
+    async def connect(self, timeout=10.0):
+        """Connect (QEMU creates the socket shortly after starting) and negotiate capabilities"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=READ_LIMIT)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if loop.time() >= deadline:
+                    raise
+                await asyncio.sleep(0.1)
+
+        greeting = json.loads(await self._reader.readline() or b"{}")
+        if "QMP" not in greeting:
+            await self.close()
+            raise QMPError("GenericError", f"{self.path} is not a QMP server")
+        self._read_task = asyncio.ensure_future(self._read_loop())
+        await self.execute("qmp_capabilities")
+
+    async def execute(self, command, arguments=None):
+        if self.closed:
+            raise ConnectionError("QMP connection is closed")
+        message_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        message = {"execute": command, "id": message_id}
+        if arguments:
+            message["arguments"] = arguments
+        try:
+            self._writer.write(json.dumps(message).encode() + b"\n")
+            await self._writer.drain()
+            return await future
+        finally:
+            # Already gone once answered; a cancelled call must not leave its id behind
+            self._pending.pop(message_id, None)
+
+    async def close(self):
+        self.closed = True
+        if self._read_task is not None:
+            self._read_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        self._fail_pending()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "event" in message:
+                    if self.on_event:
+                        self.on_event(message)
+                    continue
+                future = self._pending.pop(message.get("id"), None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    error = message["error"]
+                    future.set_exception(QMPError(error.get("class"), error.get("desc")))
+                else:
+                    future.set_result(message.get("return"))
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.closed = True
+            self._fail_pending()
+
+    def _fail_pending(self):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("QMP connection closed"))
+
+
+class QMPMonitor:
+    """Talks QMP to every VM over one asyncio event loop running on a background thread.
+
+    Public methods are thread-safe and block until the reply arrives or `timeout`
+    passes; query_all() fans a command out to all VMs concurrently.
+    `on_event(vm_id, event)` is called on the loop thread for asynchronous QMP events.
+    """
+
+    def __init__(self, on_event=None, timeout=5.0):
+        self.on_event = on_event
+        self.timeout = timeout
+        self._connections = {}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def connected(self):
+        return [vm_id for vm_id, connection in list(self._connections.items()) if not connection.closed]
+
+    def connect(self, vm_id, path, timeout=10.0):
+        """Start connecting to a VM; returns a concurrent Future that resolves when ready"""
+        return self._submit(self._connect(vm_id, path, timeout))
+
+    def disconnect(self, vm_id):
+        if self._loop is not None:
+            self._submit(self._disconnect(vm_id))
+
+    def execute(self, vm_id, command, arguments=None, timeout=None):
+        return self._call(self._execute(vm_id, command, arguments), timeout)
+
+    def query_all(self, command, arguments=None, timeout=None):
+        """Run `command` on every connected VM at once; returns {vm_id: result or exception}"""
+        return self._call(self._query_all(command, arguments), timeout)
+
+    def status(self, vm_id, timeout=None):
+        """Run state such as "running", "paused" or "shutdown" """
+        return self.execute(vm_id, "query-status", timeout=timeout)["status"]
+
+    def blockstats(self, vm_id, timeout=None):
+        return self.execute(vm_id, "query-blockstats", timeout=timeout)
+
+    def balloon(self, vm_id, timeout=None):
+        """Current guest memory in bytes as seen by the balloon device"""
+        return self.execute(vm_id, "query-balloon", timeout=timeout)["actual"]
+
+    def powerdown(self, vm_id, timeout=None):
+        """Ask the guest OS to shut down cleanly (ACPI power button)"""
+        self.execute(vm_id, "system_powerdown", timeout=timeout)
+
+    def pause(self, vm_id, timeout=None):
+        self.execute(vm_id, "stop", timeout=timeout)
+
+    def resume(self, vm_id, timeout=None):
+        self.execute(vm_id, "cont", timeout=timeout)
+
+    def counters(self, vm_id, timeout=None):
+        """Cumulative vCPU time and block I/O of one VM"""
+        return self._call(self._counters(vm_id), timeout)
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._close_all(), loop)
+        try:
+            future.result(self.timeout)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    # Event loop side
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="qmp-monitor", daemon=True).start()
+            return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def _call(self, coro, timeout):
+        future = self._submit(coro)
+        try:
+            return future.result(timeout or self.timeout)
+        except concurrent.futures.TimeoutError:
+            # Stop waiting on the loop too, so a VM that never answers leaves nothing pending
+            future.cancel()
+            raise
+
+    def _get(self, vm_id):
+        connection = self._connections.get(vm_id)
+        if connection is None or connection.closed:
+            raise ConnectionError(f"No QMP connection to VM {vm_id}")
+        return connection
+
+    async def _connect(self, vm_id, path, timeout):
+        on_event = (lambda event: self.on_event(vm_id, event)) if self.on_event else None
+        connection = QMPConnection(path, on_event)
+        await connection.connect(timeout)
+        old = self._connections.pop(vm_id, None)
+        if old is not None:
+            await old.close()
+        self._connections[vm_id] = connection
+
+    async def _disconnect(self, vm_id):
+        connection = self._connections.pop(vm_id, None)
+        if connection is not None:
+            await connection.close()
+
+    async def _execute(self, vm_id, command, arguments):
+        return await self._get(vm_id).execute(command, arguments)
+
+    async def _query_all(self, command, arguments):
+        vm_ids = [vm_id for vm_id, connection in self._connections.items() if not connection.closed]
+        results = await asyncio.gather(*(self._execute(vm_id, command, arguments) for vm_id in vm_ids),
+                                       return_exceptions=True)
+        return dict(zip(vm_ids, results))
+
+    async def _counters(self, vm_id):
+        connection = self._get(vm_id)
+        cpus, blocks = await asyncio.gather(connection.execute("query-cpus-fast"),
+                                            connection.execute("query-blockstats"))
+        stats = [block.get("stats", {}) for block in blocks]
+        return {
+            "vcpus": len(cpus),
+            "cpu_seconds": sum(thread_cpu_seconds(cpu["thread-id"]) for cpu in cpus if "thread-id" in cpu),
+            "rd_bytes": sum(s.get("rd_bytes", 0) for s in stats),
+            "wr_bytes": sum(s.get("wr_bytes", 0) for s in stats),
+            "rd_operations": sum(s.get("rd_operations", 0) for s in stats),
+            "wr_operations": sum(s.get("wr_operations", 0) for s in stats),
+        }
+
+    async def _close_all(self):
+        connections, self._connections = self._connections, {}
+        for connection in connections.values():
+            await connection.close()
+        # Stop connection attempts still waiting for their socket
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task():
+                task.cancel()
@@ -0,0 +1,124 @@
+class RefreshSource:
+    """Polling state of one refreshed list"""
+
+    def __init__(self, name, fetch, apply, interval, min_interval, max_interval):
+        self.name = name
+        self.fetch = fetch
+        self.apply = apply
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.active = False
+        self.timer = None
+        self.running = False
+        self.task = None
+        self.pending = False
+        self.waiters = []
+
+
+class RefreshScheduler:
+    """Polls lists on after() timers while their section is on screen.
+
+    `fetch()` runs in a worker and returns a diff (any sequence of change lists, such
+    as a ContainerDelta); `apply(diff)` gets it on the Tk thread. A poll that finds
+    changes halves the interval down to its minimum; quiet polls stretch it by half
+    up to its maximum, so busy lists stay fresh and idle ones cost little. Requests
+    made while a fetch is in flight are folded into one follow-up fetch.
+    """
+
+    def __init__(self, widget, tasks):
+        self.widget = widget
+        self.tasks = tasks
+        self._sources = {}
+
+    def register(self, name, fetch, apply, interval=5.0, min_interval=2.0, max_interval=60.0):
+        self._sources[name] = RefreshSource(name, fetch, apply, interval, min_interval, max_interval)
+
+    def interval(self, name):
+        return self._sources[name].interval
+
+    def active(self, name):
+        return self._sources[name].active
+
+    def resume(self, *names):
+        """Start polling (the section came on screen): refresh now, then on the timer"""
+        for name in names:
+            source = self._sources[name]
+            source.active = True
+            self.request(name)
+
+    def pause(self, *names):
+        """Stop polling (the section was hidden); a fetch in flight still applies its diff"""
+        for name in names:
+            source = self._sources[name]
+            source.active = False
+            self._cancel_timer(source)
+
+    def request(self, name, on_error=None):
+        """Refresh `name` as soon as possible; `on_error(exception)` hears if that refresh fails"""
+        source = self._sources[name]
+        if on_error is not None:
+            source.waiters.append(on_error)
+        if source.running:
+            source.pending = True
+            return
+        self._cancel_timer(source)
+        source.running = True
+        source.pending = False
+        waiters, source.waiters = source.waiters, []
+        task = self.tasks.submit(source.fetch,
+                                 on_success=lambda diff: self._fetched(source, diff),
+                                 on_error=lambda e: self._failed(source, e, waiters),
+                                 name=f"refresh-{name}")
+        source.task = task
+
+        def finished(future):
+            # A cancelled task calls neither callback; free the source so later requests still fetch
+            if task.cancelled:
+                self.tasks.post(lambda _: self._cancelled(source, task))
+
+        task.future.add_done_callback(finished)
+
+    def close(self):
+        for source in self._sources.values():
+            source.active = False
+            self._cancel_timer(source)
+
+    def _fetched(self, source, diff):
+        source.running = False
+        if any(diff):
+            source.interval = max(source.min_interval, source.interval / 2)
+        else:
+            source.interval = min(source.max_interval, source.interval * 1.5)
+        source.apply(diff)
+        self._next(source)
+
+    def _failed(self, source, error, waiters):
+        source.running = False
+        # Back off while the daemon is unreachable; the timer keeps retrying
+        source.interval = source.max_interval
+        for on_error in waiters:
+            on_error(error)
+        self._next(source)
+
+    def _cancelled(self, source, task):
+        if source.task is task and source.running:
+            source.running = False
+            self._next(source)
+
+    def _next(self, source):
+        if source.pending:
+            self.request(source.name)
+        elif source.active:
+            self._cancel_timer(source)
+            source.timer = self.widget.after(int(source.interval * 1000), lambda: self._tick(source))
+
+    def _tick(self, source):
+        source.timer = None
+        if source.active:
+            self.request(source.name)
+
+    def _cancel_timer(self, source):
+        if source.timer is not None:
+            self.widget.after_cancel(source.timer)
+            source.timer = None
@@ -0,0 +1,121 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".cloud_manager", "state.db")
+
+# Keys whose stored row was inserted, rewritten or deleted by one sync
+StoreDelta = namedtuple("StoreDelta", "added changed removed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID
+"""
+
+
+def _encode(data):
+    # Stable text so unchanged items compare equal to what is stored
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+class StateStore:
+    """Last-known VMs, images and containers in SQLite, so views can render before any rescan.
+
+    Every thread gets its own connection. The database runs in WAL mode: the UI
+    thread keeps reading the last committed state while a reconciler writes.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        # Snapshot time of the newest sync per kind, so an older snapshot never overwrites it
+        self._as_of = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints; a crash can only lose the last syncs, which the next reconcile redoes
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def load(self, kind):
+        """{key: data} of every stored item of `kind`"""
+        rows = self._connection().execute("SELECT key, data FROM items WHERE kind = ? ORDER BY key", (kind,))
+        return {key: json.loads(data) for key, data in rows}
+
+    def sync(self, kind, items, as_of=None):
+        """Make the stored items of `kind` equal `items` ({key: data}), writing only rows that differ.
+
+        `as_of` is when `items` was taken (time.monotonic()); a snapshot older than the last
+        one synced for `kind` is ignored. Syncs from different threads run one after another.
+        """
+        encoded = {str(key): _encode(data) for key, data in items.items()}
+        conn = self._connection()
+        # Read, diff and write in one write transaction so concurrent syncs cannot interleave
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            with self._lock:
+                if as_of is not None and as_of < self._as_of.get(kind, as_of):
+                    conn.rollback()
+                    return StoreDelta([], [], [])
+                if as_of is not None:
+                    self._as_of[kind] = as_of
+            stored = dict(conn.execute("SELECT key, data FROM items WHERE kind = ?", (kind,)))
+            added = [key for key in encoded if key not in stored]
+            changed = [key for key in encoded if key in stored and stored[key] != encoded[key]]
+            removed = [key for key in stored if key not in encoded]
+            now = time.time()
+            conn.executemany("INSERT OR REPLACE INTO items (kind, key, data, updated) VALUES (?, ?, ?, ?)",
+                             [(kind, key, encoded[key], now) for key in added + changed])
+            conn.executemany("DELETE FROM items WHERE kind = ? AND key = ?", [(kind, key) for key in removed])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return StoreDelta(added, changed, removed)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class StateReconciler:
+    """Diffs live sources against the store and writes back only what changed.
+
+    A source is `fetch()` returning {key: data} for one kind; run reconcile() from a
+    worker so the UI keeps rendering from the store in the meantime.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._sources = {}
+
+    def add_source(self, kind, fetch):
+        self._sources[kind] = fetch
+
+    def reconcile(self, kind):
+        """Fetch one kind and sync it into the store; returns (items, StoreDelta)"""
+        taken = time.monotonic()
+        items = self._sources[kind]()
+        return items, self.store.sync(kind, items, as_of=taken)
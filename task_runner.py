@@ -0,0 +1,245 @@
+import queue
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task once it has been cancelled"""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between a task and the UI"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = []
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Flag the task as cancelled and kill any process it is waiting on"""
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for proc in processes:
+            try:
+                proc.kill()
+            except OSError:
+                pass
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def wait(self, timeout):
+        """Sleep for up to `timeout` seconds, returning True if cancelled meanwhile"""
+        return self._event.wait(timeout)
+
+    def attach(self, proc):
+        """Kill `proc` (a Popen or anything else with a kill() method) when the token is cancelled"""
+        with self._lock:
+            self._processes.append(proc)
+        if self._event.is_set():
+            proc.kill()
+
+    def detach(self, proc):
+        with self._lock:
+            if proc in self._processes:
+                self._processes.remove(proc)
+
+
+_local = threading.local()
+
+
+def current_token():
+    """Return the CancelToken of the task running on this thread (a dummy one outside tasks)"""
+    token = getattr(_local, "token", None)
+    return token if token is not None else CancelToken()
+
+
+def run_process(cmd, check=True, input=None):
+    """Run `cmd` like subprocess.run(capture_output=True, text=True) but honour task cancellation"""
+    token = current_token()
+    token.raise_if_cancelled()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if input is not None else None,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    token.attach(proc)
+    try:
+        stdout, stderr = proc.communicate(input)
+    finally:
+        token.detach(proc)
+    token.raise_if_cancelled()
+
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+class Task:
+    """Handle for a piece of work submitted to a TaskRunner"""
+
+    def __init__(self, name, token):
+        self.name = name
+        self.token = token
+        self.future = None
+        self.spawned = False
+
+    @property
+    def cancelled(self):
+        return self.token.cancelled
+
+    def cancel(self):
+        """Cancel the task; a task that has not started yet never runs"""
+        self.token.cancel()
+        if self.future is not None:
+            self.future.cancel()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+class TaskRunner:
+    """Run blocking work on a bounded thread pool and deliver results on the Tk thread.
+
+    Workers never touch widgets: finished tasks push their callback onto a queue which
+    is drained from the Tk main loop with `after()`.
+    """
+
+    def __init__(self, widget, max_workers=4, poll_interval=50):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task-runner")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._poll_id = None
+        self._closed = False
+
+    @property
+    def running(self):
+        """Tasks that have been submitted and not yet completed"""
+        with self._lock:
+            return [task for task in self._tasks if not task.done()]
+
+    def submit(self, func, *args, on_success=None, on_error=None, name=None, **kwargs):
+        """Run `func(*args, **kwargs)` in the pool.
+
+        `on_success(result)` or `on_error(exception)` are later called on the Tk thread.
+        Cancelled tasks call neither.
+        """
+        task, work = self._prepare(func, args, kwargs, on_success, on_error, name)
+        task.future = self._executor.submit(work)
+        return self._track(task)
+
+    def spawn(self, func, *args, on_success=None, on_error=None, name=None, **kwargs):
+        """Like submit(), but on a dedicated thread for long-lived work such as event streams.
+
+        Spawned tasks do not occupy a pool worker; they usually report progress with post().
+        """
+        task, work = self._prepare(func, args, kwargs, on_success, on_error, name)
+        task.future = Future()
+        task.spawned = True
+
+        def run():
+            if not task.future.set_running_or_notify_cancel():
+                return
+            try:
+                work()
+            finally:
+                task.future.set_result(None)
+
+        threading.Thread(target=run, name=f"task-runner-{task.name}", daemon=True).start()
+        return self._track(task)
+
+    def post(self, callback, value=None):
+        """Call `callback(value)` on the Tk thread; safe to use from any worker thread"""
+        self._results.put((callback, value))
+
+    def _prepare(self, func, args, kwargs, on_success, on_error, name):
+        if self._closed:
+            raise RuntimeError("TaskRunner has been shut down")
+
+        task = Task(name or getattr(func, "__name__", "task"), CancelToken())
+
+        def work():
+            _local.token = task.token
+            try:
+                task.token.raise_if_cancelled()
+                result = func(*args, **kwargs)
+            except TaskCancelled:
+                return
+            except Exception as e:
+                if not task.cancelled and on_error:
+                    self._results.put((on_error, e))
+                return
+            finally:
+                _local.token = None
+            if not task.cancelled and on_success:
+                self._results.put((on_success, result))
+
+        return task, work
+
+    def _track(self, task):
+        with self._lock:
+            self._tasks.add(task)
+        task.future.add_done_callback(lambda _: self._forget(task))
+        self._schedule_poll()
+        return task
+
+    def cancel_all(self):
+        """Cancel every task that is queued or running"""
+        with self._lock:
+            tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+
+    def wait(self, timeout=None):
+        """Block until all in-flight tasks finish, then deliver their callbacks"""
+        with self._lock:
+            futures = [task.future for task in self._tasks]
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        self._drain()
+
+    def shutdown(self):
+        """Cancel outstanding work and stop polling; called when the window closes"""
+        self._closed = True
+        self.cancel_all()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._poll_id is not None:
+            try:
+                self.widget.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+
+    def _forget(self, task):
+        with self._lock:
+            self._tasks.discard(task)
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.widget.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        self._drain()
+        with self._lock:
+            pending = bool(self._tasks)
+        if pending or not self._results.empty():
+            self._schedule_poll()
+
+    def _drain(self):
+        while True:
+            try:
+                callback, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            callback(value)
@@ -1,18 +1,56 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
+import random
+import socketserver
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from io import StringIO
 import requests
 import os
+import sys
 import tkinter.messagebox as messagebox
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import tkinter.messagebox as tk_messagebox
 from app import DesktopApplication
+from cloud_core import AdmissionError, CloudCore
+from cloudctl import main as cloudctl_main
+from container_bulk import ContainerBulk, match_containers
+from container_model import ContainerDelta, ContainerTable
+from container_stats import ContainerStats, parse_stats
+from disk_images import DiskImages, ImageInfo, convert_command, detect_format, recommend_layout
+from docker_hub import DockerHubClient, HubSearch
+from docker_api import DockerAPIError, DockerClient, build_context, split_image_ref
+from progress_stream import BuildProgress, ProgressStream, PullProgress, RingBuffer
+from image_inventory import ImageInventory
+from pull_queue import PullQueue, dedupe_refs, normalize_ref, parse_refs
+from qmp import QMPError, QMPMonitor, parse_qmp_socket, qmp_args
+from refresh_scheduler import RefreshScheduler
+from state_store import StateReconciler, StateStore, StoreDelta
+from vm_clones import CloneManager
+from vm_manifest import BatchProvisioner, VMSpec, load_manifest, parse_manifest
+from vm_memory import BalloonController, memory_args, memory_pressure
+from vm_profiles import HostCapabilities, build_qemu_command
+from vm_monitor import MetricHistory, ResourceMonitor, TimeSeries, interface_bytes, tap_interfaces
+from vm_registry import VMRecord, VMRegistry, parse_vm_cmdline
+from vm_scheduler import VMScheduler, command_resources, parse_cpulist
+from vm_snapshots import SnapshotManager, replace_drive_file, strip_launch_flags
+from task_runner import TaskRunner, current_token, run_process
+from view_router import ViewRouter
+from virtual_table import Column, TableModel
 
 
 class TestDockerHubSearch(unittest.TestCase):
     def setUp(self):
-        self.app = DesktopApplication()
+        # Keep the state database out of the developer's home directory
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.app = DesktopApplication(state_path=os.path.join(state_dir.name, "state.db"))
 
         # Hide the main window to avoid popping up a GUI during tests
         self.app.withdraw()
@@ -21,10 +59,10 @@ class TestDockerHubSearch(unittest.TestCase):
         # Destroy the application after each test
         self.app.destroy()
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_search_docker_hub(self, mock_requests_get):
         """
-        Test that searching for 'alpine' yields the expected number of lines in docker_hub_listbox.
+        Test that searching for 'alpine' yields the expected number of rows in docker_hub_listbox.
         """
         
         # Mock data mimicking Docker Hub API JSON response
@@ -36,19 +74,20 @@ class TestDockerHubSearch(unittest.TestCase):
             ]
         }
 
-        mock_requests_get.return_value = MagicMock(status_code=200, json=lambda: mock_data)
+        mock_requests_get.return_value = MagicMock(status_code=200, headers={}, json=lambda: mock_data)
         
         # Click on display_docker_hub_section button to go into the test area
         self.app.display_docker_hub_section()
 
-        # Call the method that performs the Docker Hub search
+        # Call the method that performs the Docker Hub search and wait for the background request
         self.app.search_docker_hub("alpine")
+        self.app.tasks.wait(timeout=5)
 
-        # Grab all the text currently in the Textbox
-        content = self.app.docker_hub_listbox.get("1.0", "end-1c").strip()
-        lines = content.split("\n")
+        # Grab every row currently in the results table
+        lines = self.app.docker_hub_listbox.get(0, "end")
+        content = "\n".join(lines)
 
-        # We expect 3 lines (since mock_data has 3 results)
+        # We expect 3 rows (since mock_data has 3 results)
         expected_line_count = 3
         self.assertEqual(
             len(lines), 
@@ -56,7 +95,7 @@ class TestDockerHubSearch(unittest.TestCase):
             f"Expected {expected_line_count} lines, but got {len(lines)}. results of the get:\n{content}"
         )
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     def test_search_docker_hub_empty_query(self, mock_requests_get):
         """
         Tests that searching with an empty string returns nothing 
@@ -67,19 +106,21 @@ class TestDockerHubSearch(unittest.TestCase):
             "results": []
         }
 
-        mock_requests_get.return_value = MagicMock(status_code=200, json=lambda: mock_data)
+        mock_requests_get.return_value = MagicMock(status_code=200, headers={}, json=lambda: mock_data)
 
         # Click on display_docker_hub_section button to go into the test area
         self.app.display_docker_hub_section()
 
         # Call the method that performs the Docker Hub search and search with an empty sstring
         self.app.search_docker_hub("")
+        self.app.tasks.wait(timeout=5)
 
-        content = self.app.docker_hub_listbox.get("1.0", "end-1c").strip()
+        content = self.app.docker_hub_listbox.placeholder
 
+        self.assertEqual(self.app.docker_hub_listbox.size(), 0)
         self.assertIn("No results found", content, f"Expected 'No results found' message, got:\n{content}")
 
-    @patch("requests.get")
+    @patch("requests.Session.get")
     @patch("tkinter.messagebox.showerror")
     def test_search_docker_hub_network_error(self, mock_showerror, mock_requests_get):
         """
@@ -92,8 +133,9 @@ class TestDockerHubSearch(unittest.TestCase):
         # Click on display_docker_hub_section button to go into the test area
         self.app.display_docker_hub_section()
 
-        # Call the method that performs the Docker Hub search
+        # Call the method that performs the Docker Hub search and wait for the background request
         self.app.search_docker_hub("alpine")
+        self.app.tasks.wait(timeout=5)
 
         # Check that the app raised the error message in the messagebox
         mock_showerror.assert_called_with(
@@ -108,7 +150,10 @@ class TestVMCreation(unittest.TestCase):
         Setup runs before each test. We instantiate the application
         and hide the UI to avoid popping up windows.
         """
-        self.app = DesktopApplication()
+        # Keep the state database out of the developer's home directory
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.app = DesktopApplication(state_path=os.path.join(state_dir.name, "state.db"))
         
         # Hide the main window to avoid actually showing a GUI during tests
         self.app.withdraw()
@@ -204,7 +249,10 @@ class TestDockerfileCreation(unittest.TestCase):
         Setup runs before each test. We instantiate the application
         and hide the UI to avoid popping up windows.
         """
-        self.app = DesktopApplication()
+        # Keep the state database out of the developer's home directory
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.app = DesktopApplication(state_path=os.path.join(state_dir.name, "state.db"))
         self.app.withdraw()
 
         # Set default values for test
@@ -329,5 +377,2129 @@ class TestDockerfileCreation(unittest.TestCase):
         # Assert error message
         mock_showerror.assert_called_once_with("Error", "Failed to create Dockerfile: Simulated file write error")
 
+
+class FakeScheduler:
+    """
+    Stand-in for a Tk widget: records after() callbacks instead of running a main loop.
+    """
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+        return len(self.callbacks)
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class TestTaskRunner(unittest.TestCase):
+    def setUp(self):
+        self.runner = TaskRunner(FakeScheduler(), max_workers=2)
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def test_results_are_delivered_through_callbacks(self):
+        """
+        Results are only handed to on_success once the runner is drained.
+        """
+        results = []
+        self.runner.submit(lambda a, b: a + b, 2, 3, on_success=results.append)
+        self.runner.wait(timeout=5)
+        self.assertEqual(results, [5])
+
+    def test_errors_are_delivered_to_on_error(self):
+        """
+        Exceptions raised in the worker end up in on_error, not on_success.
+        """
+        errors, results = [], []
+
+        def boom():
+            raise ValueError("bad input")
+
+        self.runner.submit(boom, on_success=results.append, on_error=errors.append)
+        self.runner.wait(timeout=5)
+        self.assertEqual(results, [])
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_cancelled_task_skips_callbacks(self):
+        """
+        A cancelled task stops at its next checkpoint and reports nothing.
+        """
+        results = []
+
+        def slow():
+            token = current_token()
+            while not token.wait(0.01):
+                pass
+            token.raise_if_cancelled()
+            return "finished"
+
+        task = self.runner.submit(slow, on_success=results.append)
+        task.cancel()
+        self.runner.wait(timeout=5)
+        self.assertTrue(task.cancelled)
+        self.assertEqual(results, [])
+
+    def test_run_process_raises_on_failure(self):
+        """
+        run_process mirrors subprocess.run(check=True) and raises CalledProcessError.
+        """
+        errors = []
+        self.runner.submit(run_process, [sys.executable, "-c", "import sys; sys.exit(3)"], on_error=errors.append)
+        self.runner.wait(timeout=10)
+        self.assertEqual(errors[0].returncode, 3)
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    """
+    Answers Engine API requests from the `routes` table of its server.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def address_string(self):
+        return "fake-docker"
+
+    def handle_route(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.server.bodies.append(self.rfile.read(length))
+        self.server.paths.append((self.command, self.path))
+
+        status, body = self.server.routes.get((self.command, self.path.split("?")[0]), (404, {"message": "page not found"}))
+        if isinstance(body, list) and body and isinstance(body[0], bytes):
+            # Streamed response: send each chunk with chunked transfer encoding
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in body:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_DELETE = handle_route
+
+
+class FakeDockerDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Local unix socket server standing in for /var/run/docker.sock.
+    """
+    daemon_threads = True
+
+    def __init__(self, routes):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "docker.sock")
+        self.routes = routes
+        self.connections = 0
+        self.paths = []
+        self.bodies = []
+        super().__init__(self.socket_path, FakeDockerHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.tmpdir.cleanup()
+
+
+class TestDockerClient(unittest.TestCase):
+    def setUp(self):
+        self.routes = {}
+        self.daemon = FakeDockerDaemon(self.routes)
+        self.client = DockerClient(socket_path=self.daemon.socket_path)
+
+    def tearDown(self):
+        self.client.close()
+        self.daemon.stop()
+
+    def test_images_returns_structured_json_over_one_connection(self):
+        """
+        Repeated calls reuse the pooled keep-alive connection.
+        """
+        self.routes[("GET", "/images/json")] = (200, [{"Id": "sha256:abc", "RepoTags": ["alpine:3.19"]}])
+
+        for _ in range(3):
+            images = self.client.images()
+
+        self.assertEqual(images[0]["RepoTags"], ["alpine:3.19"])
+        self.assertEqual(self.daemon.connections, 1)
+
+    def test_error_status_raises_docker_api_error(self):
+        """
+        API errors surface the daemon's message and HTTP status.
+        """
+        self.routes[("POST", "/containers/nope/stop")] = (404, {"message": "No such container: nope"})
+
+        with self.assertRaises(DockerAPIError) as ctx:
+            self.client.stop_container("nope")
+        self.assertEqual(ctx.exception.status, 404)
+        self.assertIn("No such container", str(ctx.exception))
+
+    def test_stop_already_stopped_container(self):
+        """
+        304 Not Modified means the container was not running.
+        """
+        self.routes[("POST", "/containers/web/stop")] = (304, None)
+        self.assertFalse(self.client.stop_container("web"))
+
+    def test_restart_remove_and_prune(self):
+        """
+        Lifecycle calls pass the grace period and removal flags; prune returns the daemon's report.
+        """
+        self.routes[("POST", "/containers/web/restart")] = (204, None)
+        self.routes[("DELETE", "/containers/web")] = (204, None)
+        self.routes[("POST", "/containers/prune")] = (200, {"ContainersDeleted": ["a", "b"], "SpaceReclaimed": 42})
+
+        self.assertTrue(self.client.restart_container("web", timeout=5))
+        self.assertTrue(self.client.remove_container("web", force=True))
+        report = self.client.prune_containers({"label": ["tier=web"]})
+
+        self.assertEqual(report["SpaceReclaimed"], 42)
+        self.assertEqual([path for _, path in self.daemon.paths],
+                         ["/containers/web/restart?t=5", "/containers/web?force=1&v=0",
+                          "/containers/prune?filters=%7B%22label%22%3A+%5B%22tier%3Dweb%22%5D%7D"])
+        # The longer read timeout of the restart is not left on the pooled connection
+        self.assertEqual(self.client._pool.get_nowait().sock.gettimeout(), self.client.timeout)
+
+    def test_pull_streams_progress_messages(self):
+        """
+        Pull progress arrives as newline-delimited JSON and errors in the stream are raised.
+        """
+        self.routes[("POST", "/images/create")] = (200, [
+            b'{"status": "Pulling from library/alpine", "id": "3.19"}\r\n',
+            b'{"status": "Download complete", "id": "abc"}\r\n',
+        ])
+        messages = list(self.client.pull("alpine:3.19"))
+        self.assertEqual([m["status"] for m in messages], ["Pulling from library/alpine", "Download complete"])
+        self.assertIn("fromImage=alpine&tag=3.19", self.daemon.paths[-1][1])
+
+        self.routes[("POST", "/images/create")] = (200, [b'{"error": "manifest unknown"}\r\n'])
+        with self.assertRaises(DockerAPIError):
+            list(self.client.pull("alpine:missing"))
+
+    def test_split_image_ref(self):
+        """
+        Registry ports are not mistaken for tags.
+        """
+        self.assertEqual(split_image_ref("alpine"), ("alpine", "latest"))
+        self.assertEqual(split_image_ref("localhost:5000/app:v2"), ("localhost:5000/app", "v2"))
+        self.assertEqual(split_image_ref("localhost:5000/app"), ("localhost:5000/app", "latest"))
+
+    def test_build_context_applies_dockerignore(self):
+        """
+        Ignored paths stay out of the build context; "!" exceptions and the Dockerfile are still sent.
+        """
+        with tempfile.TemporaryDirectory() as context_dir:
+            for path in ["Dockerfile", "app.py", "secret.env", "node_modules/lib.js", "logs/a.log",
+                         "logs/keep.log", "src/pkg/mod.pyc", "src/pkg/mod.py"]:
+                os.makedirs(os.path.join(context_dir, os.path.dirname(path)), exist_ok=True)
+                open(os.path.join(context_dir, path), "w").close()
+            with open(os.path.join(context_dir, ".dockerignore"), "w") as f:
+                f.write("# local only\nnode_modules\n*.env\n/logs\n!logs/keep.log\n**/*.pyc\nDockerfile\n")
+
+            context = build_context(context_dir, keep=["Dockerfile"])
+            context.seek(0)
+            with tarfile.open(fileobj=context) as tar:
+                files = sorted(member.name[2:] for member in tar.getmembers() if member.isfile())
+
+        self.assertEqual(files, [".dockerignore", "Dockerfile", "app.py", "logs/keep.log", "src/pkg/mod.py"])
+
+
+class TestContainerTable(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.table = ContainerTable(self.client)
+        self.table.resync([
+            {"Id": "aaa", "State": "running", "Status": "Up 2 minutes"},
+            {"Id": "bbb", "State": "exited", "Status": "Exited (0)"},
+        ])
+
+    def test_event_for_new_container_adds_row(self):
+        """
+        A create event refetches just that container and reports it as added.
+        """
+        self.client.container.return_value = {"Id": "ccc", "State": "created", "Status": "Created"}
+
+        delta = self.table.apply_event({"Type": "container", "Action": "create", "id": "ccc"})
+
+        self.client.container.assert_called_once_with("ccc")
+        self.assertEqual(delta, ContainerDelta(["ccc"], [], []))
+        self.assertEqual(self.table.ids(), ["aaa", "bbb", "ccc"])
+
+    def test_state_change_updates_row_and_destroy_removes_it(self):
+        """
+        Changed entries are updated in place; destroy drops the row without a refetch.
+        """
+        self.client.container.return_value = {"Id": "bbb", "State": "running", "Status": "Up 1 second"}
+        delta = self.table.apply_event({"Type": "container", "Action": "start", "id": "bbb"})
+        self.assertEqual(delta, ContainerDelta([], ["bbb"], []))
+
+        delta = self.table.apply_event({"Type": "container", "Action": "destroy", "id": "aaa"})
+        self.assertEqual(delta, ContainerDelta([], [], ["aaa"]))
+        self.assertEqual(self.table.ids(), ["bbb"])
+        self.client.container.assert_called_once()
+
+    def test_unchanged_and_exec_events_produce_no_delta(self):
+        """
+        Events that leave the list entry untouched do not trigger a redraw.
+        """
+        self.client.container.return_value = {"Id": "aaa", "State": "running", "Status": "Up 2 minutes"}
+        self.assertIsNone(self.table.apply_event({"Type": "container", "Action": "rename", "id": "aaa"}))
+        self.assertIsNone(self.table.apply_event({"Type": "container", "Action": "exec_start: sh", "id": "aaa"}))
+
+    def test_resync_diffs_against_previous_snapshot(self):
+        """
+        A fresh snapshot after a dropped stream only reports the differences.
+        """
+        delta = self.table.resync([
+            {"Id": "aaa", "State": "running", "Status": "Up 2 minutes"},
+            {"Id": "ddd", "State": "running", "Status": "Up 1 second"},
+        ])
+        self.assertEqual(delta, ContainerDelta(["ddd"], [], ["bbb"]))
+
+
+def fake_stats(total_usage, system_usage, memory=100, rx=0, read=0):
+    """
+    Build an Engine API stats message with the fields the dashboard reads.
+    """
+    return {
+        "cpu_stats": {"cpu_usage": {"total_usage": total_usage}, "system_cpu_usage": system_usage, "online_cpus": 2},
+        "precpu_stats": {"cpu_usage": {"total_usage": 0}, "system_cpu_usage": 0},
+        "memory_stats": {"usage": memory + 20, "limit": 1000, "stats": {"inactive_file": 20}},
+        "networks": {"eth0": {"rx_bytes": rx, "tx_bytes": 0}},
+        "blkio_stats": {"io_service_bytes_recursive": [{"op": "read", "value": read}, {"op": "write", "value": 0}]},
+        "pids_stats": {"current": 3},
+    }
+
+
+class TestContainerStats(unittest.TestCase):
+    """
+    Tests for sampling container stats into per-container rings.
+    """
+
+    def setUp(self):
+        self.routes = {}
+        self.daemon = FakeDockerDaemon(self.routes)
+        self.stats = ContainerStats(DockerClient(socket_path=self.daemon.socket_path, pool_size=2), history=2,
+                                    interval=60, workers=2)
+
+    def tearDown(self):
+        self.stats.close()
+        self.daemon.stop()
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_parse_stats_matches_docker_cli(self):
+        """
+        CPU % is scaled by online CPUs and inactive page cache is not counted as used memory.
+        """
+        sample = parse_stats(fake_stats(50, 200, memory=100, rx=10, read=30), now=1.0)
+
+        self.assertEqual(sample.cpu_percent, 50.0)
+        self.assertEqual((sample.memory, sample.memory_limit), (100, 1000))
+        self.assertEqual((sample.net_rx, sample.block_read, sample.pids), (10, 30, 3))
+
+    def test_samples_are_bounded_and_sorted(self):
+        """
+        Each running container keeps only the newest samples and top() orders by the chosen key.
+        """
+        self.routes[("GET", "/containers/aaa/stats")] = (200, fake_stats(10, 100))
+        self.routes[("GET", "/containers/bbb/stats")] = (200, fake_stats(10, 100, memory=500))
+        self.stats.sync(["aaa", "bbb"])
+        # The first round only sets the CPU baseline
+        self.wait_for(lambda: self.daemon.paths.count(("GET", "/containers/bbb/stats?stream=0&one-shot=1")) == 1)
+        self.assertEqual(self.stats.top(), [])
+
+        self.routes[("GET", "/containers/aaa/stats")] = (200, fake_stats(20, 200, memory=50))
+        self.routes[("GET", "/containers/bbb/stats")] = (200, fake_stats(100, 200, memory=500))
+        self.assertEqual(sorted(self.stats.poll()), ["aaa", "bbb"])
+
+        self.assertEqual(self.stats.latest("bbb").cpu_percent, 180.0)
+        self.assertEqual([row[0] for row in self.stats.top(key="cpu")], ["bbb", "aaa"])
+        self.assertEqual([row[0] for row in self.stats.top(n=1, key="memory")], ["bbb"])
+        self.stats.poll()
+        self.stats.poll()
+        self.assertEqual(len(self.stats.history("aaa")), 2)
+
+        # Containers that stopped running lose their samples
+        self.stats.sync(["bbb"])
+        self.assertIsNone(self.stats.latest("aaa"))
+        self.assertEqual(self.stats.watched(), ["bbb"])
+
+
+class TestDockerHubClient(unittest.TestCase):
+    def setUp(self):
+        self.session = MagicMock()
+        self.client = DockerHubClient(session=self.session)
+        self.page = {"count": 1, "results": [{"repo_name": "alpine", "star_count": 11147}]}
+
+    def test_repeated_search_is_served_from_cache(self):
+        """
+        A second identical search does not hit the network, and the query is sent URL-encoded via params.
+        """
+        self.session.get.return_value = MagicMock(status_code=200, headers={"ETag": '"v1"'}, json=lambda: self.page)
+
+        self.assertEqual(self.client.search("alpine & co"), self.page)
+        self.assertEqual(self.client.search("alpine & co"), self.page)
+
+        self.session.get.assert_called_once()
+        self.assertEqual(self.session.get.call_args.kwargs["params"]["query"], "alpine & co")
+
+    def test_stale_entry_is_revalidated_with_etag(self):
+        """
+        After the TTL expires the cached ETag is sent and a 304 reuses the cached page.
+        """
+        self.client.cache.ttl = 0
+        self.session.get.return_value = MagicMock(status_code=200, headers={"ETag": '"v1"'}, json=lambda: self.page)
+        self.client.search("alpine")
+
+        self.session.get.return_value = MagicMock(status_code=304, headers={})
+        self.assertEqual(self.client.search("alpine"), self.page)
+        self.assertEqual(self.session.get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+
+    def test_disk_cache_survives_a_new_client(self):
+        """
+        With a cache directory, results are reused by a freshly created client.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            self.session.get.return_value = MagicMock(status_code=200, headers={}, json=lambda: self.page)
+            DockerHubClient(cache_dir=cache_dir, session=self.session).search("alpine")
+
+            other_session = MagicMock()
+            self.assertEqual(DockerHubClient(cache_dir=cache_dir, session=other_session).search("alpine"), self.page)
+            other_session.get.assert_not_called()
+
+    def test_superseded_search_is_dropped(self):
+        """
+        Cancelling a queued search stops it before any request is made.
+        """
+        runner = TaskRunner(FakeScheduler(), max_workers=1)
+        results = []
+        gate = threading.Event()
+        runner.submit(gate.wait, 5)
+        first = runner.submit(self.client.search, "alp", on_success=results.append)
+        first.cancel()
+        gate.set()
+        runner.wait(timeout=5)
+        runner.shutdown()
+
+        self.session.get.assert_not_called()
+        self.assertEqual(results, [])
+
+    def test_cancelled_search_frees_its_worker_at_once(self):
+        """
+        Cancelling a search blocked on the network returns the worker without waiting for the response.
+        """
+        arrived = threading.Event()
+        response = MagicMock(status_code=200, headers={}, json=lambda: self.page)
+
+        def slow_get(*args, **kwargs):
+            arrived.wait(5)
+            return response
+
+        self.session.get.side_effect = slow_get
+        runner = TaskRunner(FakeScheduler(), max_workers=1)
+        results = []
+        search = runner.submit(self.client.search, "alp", on_success=results.append)
+        self.wait_for(lambda: self.session.get.called)
+        self.assertTrue(self.session.get.call_args.kwargs["stream"])
+        search.cancel()
+        runner.wait(timeout=1)
+        self.assertTrue(search.done())
+        arrived.set()
+        self.wait_for(lambda: response.close.called)
+        runner.shutdown()
+        self.assertEqual(results, [])
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+
+class TestHubSearchPaging(unittest.TestCase):
+    def page(self, first, count=60, size=25, more=True):
+        return {"count": count, "next": "page" if more else None,
+                "results": [{"repo_name": f"repo{i}"} for i in range(first, min(first + size, count))]}
+
+    def test_first_page_only_then_prefetch_once_count_is_known(self):
+        """
+        The first request fetches page 1 alone; once the count is known the next page is prefetched.
+        """
+        pager = HubSearch(MagicMock(), "python", page_size=25)
+        self.assertEqual(pager.want_next(), [1])
+
+        pager.add_page(1, self.page(0))
+        self.assertEqual(len(pager.take_ready()), 25)
+        self.assertEqual(pager.pages_to_fetch(), [2])
+
+    def test_out_of_order_pages_are_buffered(self):
+        """
+        A prefetched page arriving first is held back until it is both wanted and in order.
+        """
+        pager = HubSearch(MagicMock(), "python", page_size=25, prefetch=2)
+        pager.want_next()
+        pager.add_page(1, self.page(0))
+        pager.take_ready()
+        self.assertEqual(pager.pages_to_fetch(), [2, 3])
+
+        pager.add_page(3, self.page(50, more=False))
+        self.assertEqual(pager.take_ready(), [])
+
+        pager.want_next()
+        pager.add_page(2, self.page(25))
+        self.assertEqual(len(pager.take_ready()), 25)
+
+        pager.want_next()
+        self.assertEqual(len(pager.take_ready()), 10)
+        self.assertFalse(pager.has_more)
+        self.assertEqual(pager.want_next(), [])
+
+    def test_failed_page_alone_is_requested_again(self):
+        """
+        A failed page is retried without re-requesting the later pages already in flight or buffered.
+        """
+        pager = HubSearch(MagicMock(), "python", page_size=25, prefetch=2)
+        pager.want_next()
+        pager.add_page(1, self.page(0))
+        pager.take_ready()
+        self.assertEqual(pager.pages_to_fetch(), [2, 3])
+
+        pager.add_page(3, self.page(50, more=False))
+        pager.page_failed(2)
+        self.assertEqual(pager.want_next(), [2])
+        self.assertEqual(pager.pages_to_fetch(), [])
+        pager.add_page(2, self.page(25))
+        self.assertEqual(len(pager.take_ready()), 25)
+
+
+class TestProgressStream(unittest.TestCase):
+    def test_ring_buffer_reports_dropped_lines(self):
+        """
+        Lines that overflow the buffer before being read are counted, not kept.
+        """
+        buffer = RingBuffer(maxlen=3)
+        buffer.extend(["a", "b"])
+        self.assertEqual(buffer.since(0), (["a", "b"], 0))
+
+        buffer.extend(["c", "d", "e", "f"])
+        self.assertEqual(buffer.since(2), (["d", "e", "f"], 1))
+        self.assertEqual(len(buffer), 3)
+
+    def test_pull_progress_tracks_layers(self):
+        """
+        Byte counters update the layer table without flooding the log.
+        """
+        progress = PullProgress()
+        log = []
+        log += progress.update({"status": "Pulling from library/alpine", "id": "3.19"})
+        log += progress.update({"status": "Downloading", "id": "l1", "progressDetail": {"current": 10, "total": 100}})
+        log += progress.update({"status": "Downloading", "id": "l1", "progressDetail": {"current": 50, "total": 100}})
+        log += progress.update({"status": "Downloading", "id": "l2", "progressDetail": {"current": 0, "total": 100}})
+
+        self.assertEqual(log, ["Pulling from library/alpine 3.19", "l1: Downloading", "l2: Downloading"])
+        self.assertAlmostEqual(progress.fraction, 0.25)
+
+        progress.update({"status": "Pull complete", "id": "l1", "progressDetail": {}})
+        self.assertAlmostEqual(progress.fraction, 0.5)
+
+    def test_build_progress_parses_steps_across_chunks(self):
+        """
+        Step headers split over two stream messages are still recognised.
+        """
+        progress = BuildProgress()
+        progress.update({"stream": "Step 2/4 : RUN apk "})
+        lines = progress.update({"stream": "add curl\n ---> Running in abc\n"})
+
+        self.assertEqual(lines, ["Step 2/4 : RUN apk add curl", " ---> Running in abc"])
+        self.assertEqual(progress.fraction, 0.5)
+        self.assertEqual(progress.summary(), ["Step 2/4: RUN apk add curl"])
+
+    def test_publishing_is_throttled(self):
+        """
+        A burst of messages produces one intermediate snapshot and a final one.
+        """
+        snapshots = []
+        stream = ProgressStream(BuildProgress(), snapshots.append, interval=60)
+        for i in range(100):
+            stream.feed({"stream": f"line {i}\n"})
+        stream.close()
+
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual(len(snapshots[0].lines) + len(snapshots[1].lines), 100)
+        self.assertTrue(snapshots[-1].done)
+        self.assertEqual(snapshots[-1].outcome, "finished")
+
+    def test_close_reports_how_the_stream_ended(self):
+        """
+        A failed or cancelled stream says so in its final snapshot instead of "finished".
+        """
+        snapshots = []
+        stream = ProgressStream(PullProgress(), snapshots.append)
+        stream.feed({"status": "Downloading", "id": "layer"})
+        self.assertIsNone(snapshots[-1].outcome)
+        stream.close("cancelled")
+        self.assertEqual((snapshots[-1].done, snapshots[-1].outcome), (True, "cancelled"))
+
+
+class FakePullClient:
+    """
+    Pretends to pull images, failing each ref a scripted number of times first.
+    """
+    def __init__(self, failures=None, delay=0.0):
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def pull(self, ref, token=None):
+        with self.lock:
+            self.calls.append(ref)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            error = self.failures.get(ref)
+            if error and error[1] > 0:
+                self.failures[ref] = (error[0], error[1] - 1)
+                raise error[0]
+            yield {"status": "Downloading", "id": "layer", "progressDetail": {"current": 100, "total": 100}}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def fork(self, pool_size):
+        self.forked = pool_size
+        return self
+
+    def close(self):
+        pass
+
+
+class TestPullQueue(unittest.TestCase):
+    def test_refs_are_normalized_and_deduplicated(self):
+        """
+        Different spellings of the same image are pulled once.
+        """
+        self.assertEqual(normalize_ref("alpine"), "docker.io/library/alpine:latest")
+        self.assertEqual(normalize_ref("localhost:5000/app"), "localhost:5000/app:latest")
+        refs = parse_refs("alpine\n# comment\ndocker.io/library/alpine:latest, nginx:1.25\n\nalpine:latest")
+        self.assertEqual(dedupe_refs(refs), ["alpine", "nginx:1.25"])
+
+    def test_concurrency_limit_is_respected(self):
+        """
+        No more than `concurrency` pulls run at the same time.
+        """
+        client = FakePullClient(delay=0.05)
+        report = PullQueue(client, concurrency=2).run([f"image{i}" for i in range(6)])
+
+        self.assertEqual(client.peak, 2)
+        self.assertEqual(len(report.results), 6)
+        self.assertEqual(report.total_bytes, 600)
+        self.assertGreater(report.throughput, 0)
+
+    def test_transient_failures_are_retried(self):
+        """
+        A server error is retried; a missing manifest fails straight away.
+        """
+        client = FakePullClient(failures={
+            "flaky": (DockerAPIError("Service Unavailable", status=503), 1),
+            "missing": (DockerAPIError("manifest unknown", status=404), 5),
+        })
+        report = PullQueue(client, retries=2, backoff=0).run(["flaky", "missing"])
+
+        flaky, missing = report.results
+        self.assertTrue(flaky.ok)
+        self.assertEqual(flaky.attempts, 2)
+        self.assertFalse(missing.ok)
+        self.assertEqual(missing.attempts, 1)
+        self.assertEqual(report.failed, [missing])
+
+
+class TestImageInventory(unittest.TestCase):
+    def setUp(self):
+        self.inventory = ImageInventory(MagicMock())
+        self.inventory.update([
+            {"Id": "sha256:aaa111", "RepoTags": ["alpine:3.19", "alpine:latest"],
+             "RepoDigests": ["alpine@sha256:d1"], "Size": 7, "Created": 2},
+            {"Id": "sha256:bbb222", "RepoTags": ["python:3.12-slim"], "RepoDigests": [], "Size": 50, "Created": 1},
+            {"Id": "sha256:ccc333", "RepoTags": ["<none>:<none>"], "Size": 1, "Created": 0},
+        ])
+
+    def names(self, records):
+        return sorted(name for record in records for name in record.names)
+
+    def test_lookup_by_reference_prefix_id_and_digest(self):
+        """
+        Every index answers without calling the daemon.
+        """
+        self.assertEqual(self.names(self.inventory.search("alpine")), ["alpine:3.19", "alpine:latest"])
+        self.assertEqual(self.names(self.inventory.search("pyth")), ["python:3.12-slim"])
+        self.assertEqual(self.names(self.inventory.search("bbb")), ["python:3.12-slim"])
+        self.assertEqual(self.inventory.by_digest("sha256:d1").id, "sha256:aaa111")
+        self.assertEqual(len(self.inventory.by_tag("latest")), 1)
+        # An empty ID prefix matches nothing rather than every image
+        self.assertEqual(self.inventory.by_id_prefix("sha256:"), [])
+        self.assertEqual(self.inventory.search("sha256:"), [])
+        self.assertEqual(self.inventory._names, sorted(self.inventory._names))
+        self.inventory.client.images.assert_not_called()
+
+    def test_fuzzy_search_tolerates_typos(self):
+        """
+        A misspelt name still finds the closest image.
+        """
+        self.assertEqual(self.names(self.inventory.search("pyhton")), ["python:3.12-slim"])
+
+    def test_refresh_only_reports_changes(self):
+        """
+        Refreshing applies only the added, removed and retagged images.
+        """
+        self.inventory.client.images.return_value = [
+            {"Id": "sha256:aaa111", "RepoTags": ["alpine:3.19"], "RepoDigests": ["alpine@sha256:d1"],
+             "Size": 7, "Created": 2},
+            {"Id": "sha256:bbb222", "RepoTags": ["python:3.12-slim"], "RepoDigests": [], "Size": 50, "Created": 1},
+            {"Id": "sha256:ddd444", "RepoTags": ["nginx:1.25"], "Size": 20, "Created": 3},
+        ]
+
+        added, removed, changed = self.inventory.refresh()
+
+        self.assertEqual((added, removed, changed), (["sha256:ddd444"], ["sha256:ccc333"], ["sha256:aaa111"]))
+        self.assertEqual(self.inventory.by_tag("latest"), [])
+        self.assertEqual(self.names(self.inventory.search("nginx")), ["nginx:1.25"])
+
+
+    def test_incremental_updates_match_a_fresh_index(self):
+        """
+        Retagging images over many updates leaves the same index as building it from scratch.
+        """
+        rng = random.Random(7)
+        for _ in range(200):
+            images = [{"Id": f"sha256:{i:03x}", "RepoTags": [f"r{rng.randrange(5)}:t{rng.randrange(5)}"
+                                                             for _ in range(rng.randrange(3))],
+                       "Size": 1, "Created": i} for i in rng.sample(range(12), rng.randrange(1, 12))]
+            self.inventory.update(images)
+            fresh = ImageInventory(MagicMock())
+            fresh.update(images)
+            self.assertEqual(self.inventory._names, fresh._names)
+            self.assertEqual(self.inventory._ids, fresh._ids)
+
+
+class TestVMProfiles(unittest.TestCase):
+    def test_max_throughput_with_kvm(self):
+        """
+        With KVM the profile uses the host CPU, virtio-blk on an iothread and io_uring.
+        """
+        host = HostCapabilities(kvm=True, io_uring=True, cpu_count=16)
+        cmd, notes = build_qemu_command("Max throughput", 4, 2048, "/vm/disk.qcow2", host=host)
+
+        self.assertEqual(notes, [])
+        self.assertIn("-enable-kvm", cmd)
+        self.assertEqual(cmd[cmd.index("-cpu") + 1], "host")
+        self.assertIn("file=/vm/disk.qcow2,format=qcow2,if=none,id=disk0,cache=none,aio=io_uring,discard=unmap", cmd)
+        self.assertIn("virtio-blk-pci,drive=disk0,iothread=iothread0,num-queues=4", cmd)
+        self.assertIn("virtio-net-pci,netdev=net0", cmd)
+
+    def test_fallback_without_kvm_or_io_uring(self):
+        """
+        Missing acceleration falls back to TCG and native AIO, and says so.
+        """
+        host = HostCapabilities(kvm=False, io_uring=False, cpu_count=2)
+        cmd, notes = build_qemu_command("Max throughput", 4, 2048, "/vm/disk.img", host=host)
+
+        self.assertNotIn("-enable-kvm", cmd)
+        self.assertIn("q35,accel=tcg", cmd)
+        self.assertTrue(any("aio=native" in arg for arg in cmd))
+        self.assertIn("virtio-blk-pci,drive=disk0,iothread=iothread0,num-queues=2", cmd)
+        self.assertEqual(len(notes), 2)
+
+    def test_compatibility_profile_keeps_legacy_devices(self):
+        """
+        The compatibility profile launches exactly the classic emulated machine.
+        """
+        host = HostCapabilities(kvm=True, io_uring=True, cpu_count=8)
+        cmd, _ = build_qemu_command("Compatibility", 1, 1024, "/vm/disk.img", host=host)
+        self.assertEqual(cmd, ["qemu-system-x86_64", "-smp", "1", "-m", "1024", "-drive", "file=/vm/disk.img,format=raw",
+                               "-vga", "virtio", "-net", "nic", "-net", "user"])
+
+
+class TestCloneManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.base = os.path.join(self.tmpdir.name, "ubuntu.qcow2")
+        open(self.base, "wb").close()
+        self.manager = CloneManager(os.path.join(self.tmpdir.name, "clones"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    @patch("vm_clones.run_process")
+    def test_create_clone_makes_backed_overlay(self, mock_run):
+        """
+        A clone is a qcow2 overlay in the clone directory backed by the base image.
+        """
+        overlay = self.manager.create_clone(self.base)
+
+        cmd = mock_run.call_args[0][0]
+        self.assertEqual(cmd[:5], ["qemu-img", "create", "-q", "-f", "qcow2"])
+        self.assertEqual(cmd[cmd.index("-b") + 1], self.base)
+        self.assertEqual(cmd[cmd.index("-F") + 1], "qcow2")
+        self.assertEqual(cmd[-1], overlay)
+        self.assertTrue(self.manager.is_clone(overlay))
+        self.assertNotEqual(overlay, self.manager.create_clone(self.base))
+
+    @patch("vm_clones.run_process")
+    def test_missing_base_is_rejected(self, mock_run):
+        """
+        No qemu-img call is made for a base image that does not exist.
+        """
+        with self.assertRaises(FileNotFoundError):
+            self.manager.create_clone(os.path.join(self.tmpdir.name, "missing.img"))
+        mock_run.assert_not_called()
+
+    @patch("vm_clones.run_process")
+    def test_flatten_rebases_onto_nothing(self, mock_run):
+        """
+        Flattening pulls all backing data into the overlay.
+        """
+        self.manager.flatten("/clones/vm.qcow2")
+        mock_run.assert_called_once_with(["qemu-img", "rebase", "-f", "qcow2", "-b", "", "/clones/vm.qcow2"])
+
+
+class TestVMRegistry(unittest.TestCase):
+    """
+    Tests for tracking launched VMs and adopting running QEMU processes.
+    """
+
+    def setUp(self):
+        self.exited = []
+        self.exit_event = threading.Event()
+        self.registry = VMRegistry(on_exit=self.on_exit, poll_interval=0.05)
+
+    def tearDown(self):
+        self.registry.close()
+
+    def on_exit(self, record):
+        self.exited.append(record)
+        self.exit_event.set()
+
+    def write_proc(self, root, pid, comm, cmdline):
+        os.makedirs(os.path.join(root, str(pid)))
+        with open(os.path.join(root, str(pid), "comm"), "w") as f:
+            f.write(comm + "\n")
+        with open(os.path.join(root, str(pid), "cmdline"), "wb") as f:
+            f.write(b"\0".join(arg.encode() for arg in cmdline) + b"\0")
+
+    def test_exit_is_detected_without_scanning(self):
+        """
+        A registered process is reported as soon as it exits.
+        """
+        process = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        record = self.registry.register(process, "vm1", "/disks/vm1.qcow2", ["qemu"])
+
+        self.assertTrue(self.exit_event.wait(5))
+        self.assertEqual(self.exited, [record])
+        self.assertEqual(record.exit_code, 3)
+        self.assertEqual(self.registry.running(), [])
+
+    def test_reconcile_reads_cmdline_of_qemu_processes_only(self):
+        """
+        Only processes whose comm is QEMU are adopted, with name and disk from their cmdline.
+        """
+        with tempfile.TemporaryDirectory() as root:
+            self.write_proc(root, os.getpid(), "qemu-system-x86", [
+                "qemu-system-x86_64", "-m", "1024", "-drive", "file=/disks/web.qcow2,format=qcow2", "-name", "web"])
+            self.write_proc(root, 2, "bash", ["bash"])
+            os.makedirs(os.path.join(root, "self"))
+
+            adopted = self.registry.reconcile(proc_root=root)
+
+            self.assertEqual([(r.pid, r.name, r.disk) for r in adopted], [(os.getpid(), "web", "/disks/web.qcow2")])
+            self.assertTrue(adopted[0].adopted)
+            # Already tracked processes are not adopted twice
+            self.assertEqual(self.registry.reconcile(proc_root=root), [])
+
+    def test_parse_vm_cmdline(self):
+        """
+        Names given as guest=... and drives with extra options are understood.
+        """
+        cmdline = ["qemu-system-x86_64", "-name", "guest=db,debug-threads=on",
+                   "-drive", "if=none,file=/d/db.img,format=raw"]
+        self.assertEqual(parse_vm_cmdline(cmdline), ("db", "/d/db.img"))
+        self.assertEqual(parse_vm_cmdline(["qemu-system-x86_64"]), (None, None))
+
+
+class FakeQMPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough QMP: greeting, capabilities negotiation and canned replies."""
+
+    def handle(self):
+        self.server.clients.append(self)
+        self.send({"QMP": {"version": {"qemu": {"major": 8, "minor": 2, "micro": 0}}, "capabilities": []}})
+        for line in self.rfile:
+            request = json.loads(line)
+            command = request["execute"]
+            self.server.commands.append(command)
+            reply = self.server.replies.get(command, {})
+            if reply is None:
+                continue  # Never answered, like a hung QEMU
+            if isinstance(reply, QMPError):
+                self.send({"error": {"class": reply.error_class, "desc": reply.desc}, "id": request.get("id")})
+            else:
+                if command in self.server.events:
+                    self.send({"event": self.server.events[command], "timestamp": {"seconds": 0, "microseconds": 0}})
+                self.send({"return": reply, "id": request.get("id")})
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+
+class FakeQMPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, replies=None, events=None):
+        self.replies = replies or {}
+        self.events = events or {}
+        self.commands = []
+        self.clients = []
+        super().__init__(path, FakeQMPHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TestQMPMonitor(unittest.TestCase):
+    """
+    Tests for the multiplexed QMP client against fake QMP servers.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.events = []
+        self.monitor = QMPMonitor(on_event=lambda vm_id, event: self.events.append((vm_id, event["event"])))
+        self.servers = {}
+
+    def tearDown(self):
+        self.monitor.close()
+        for server in self.servers.values():
+            server.stop()
+        self.tmpdir.cleanup()
+
+    def start_vm(self, vm_id, **kwargs):
+        path = os.path.join(self.tmpdir.name, f"{vm_id}.qmp")
+        self.servers[vm_id] = FakeQMPServer(path, **kwargs)
+        self.monitor.connect(vm_id, path).result(5)
+        return self.servers[vm_id]
+
+    def test_commands_are_negotiated_and_answered(self):
+        """
+        The client negotiates capabilities and returns command replies.
+        """
+        server = self.start_vm("a", replies={"query-status": {"status": "running", "running": True},
+                                             "query-balloon": {"actual": 1073741824}})
+
+        self.assertEqual(self.monitor.status("a"), "running")
+        self.assertEqual(self.monitor.balloon("a"), 1073741824)
+        self.assertEqual(server.commands, ["qmp_capabilities", "query-status", "query-balloon"])
+
+    def test_query_all_fans_out_to_every_vm(self):
+        """
+        One call queries all VMs; errors are returned per VM instead of raised.
+        """
+        self.start_vm("a", replies={"query-status": {"status": "running"}})
+        self.start_vm("b", replies={"query-status": QMPError("GenericError", "boom")})
+
+        results = self.monitor.query_all("query-status")
+
+        self.assertEqual(results["a"], {"status": "running"})
+        self.assertIsInstance(results["b"], QMPError)
+        self.assertEqual(sorted(self.monitor.connected()), ["a", "b"])
+
+    def test_pause_powerdown_and_events(self):
+        """
+        Control commands are sent and asynchronous events are reported with their VM.
+        """
+        server = self.start_vm("a", events={"stop": "STOP", "system_powerdown": "POWERDOWN"})
+
+        self.monitor.pause("a")
+        self.monitor.resume("a")
+        self.monitor.powerdown("a")
+
+        self.assertEqual(server.commands[1:], ["stop", "cont", "system_powerdown"])
+        self.assertEqual(self.events, [("a", "STOP"), ("a", "POWERDOWN")])
+
+    def test_counters_sum_block_devices(self):
+        """
+        Block I/O counters are summed over every device of the VM.
+        """
+        self.start_vm("a", replies={
+            "query-cpus-fast": [{"cpu-index": 0}, {"cpu-index": 1}],
+            "query-blockstats": [
+                {"device": "disk0", "stats": {"rd_bytes": 100, "wr_bytes": 10, "rd_operations": 2, "wr_operations": 1}},
+                {"device": "disk1", "stats": {"rd_bytes": 50, "wr_bytes": 5, "rd_operations": 1, "wr_operations": 1}},
+            ]})
+
+        counters = self.monitor.counters("a")
+
+        self.assertEqual(counters["vcpus"], 2)
+        self.assertEqual((counters["rd_bytes"], counters["wr_bytes"]), (150, 15))
+        self.assertEqual((counters["rd_operations"], counters["wr_operations"]), (3, 2))
+
+    def test_unknown_vm_and_socket_args(self):
+        """
+        Commands to unknown VMs fail fast, and the launch flags round-trip.
+        """
+        with self.assertRaises(ConnectionError):
+            self.monitor.status("missing")
+        self.assertEqual(parse_qmp_socket(["qemu"] + qmp_args("/run/vm.qmp")), "/run/vm.qmp")
+
+    def test_timed_out_command_is_cancelled(self):
+        """
+        A command the VM never answers times out and leaves no pending reply behind.
+        """
+        self.start_vm("a", replies={"query-status": None})
+        connection = self.monitor._connections["a"]
+
+        with self.assertRaises(TimeoutError):
+            self.monitor.status("a", timeout=0.2)
+
+        deadline = time.monotonic() + 5
+        while connection._pending:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+
+class FakeQMPStats:
+    """Stands in for QMPMonitor with fixed block counters."""
+
+    def __init__(self, vm_id):
+        self.vm_id = vm_id
+        self.rd_bytes = 0
+
+    def connected(self):
+        return [self.vm_id]
+
+    def query_all(self, command):
+        return {self.vm_id: [{"device": "disk0", "stats": {"rd_bytes": self.rd_bytes, "wr_bytes": 0}}]}
+
+
+class TestResourceMonitor(unittest.TestCase):
+    """
+    Tests for the ring-buffer time series and the VM resource sampler.
+    """
+
+    def test_time_series_wraps_and_downsamples(self):
+        """
+        Old samples are overwritten in place and downsampling averages runs of samples.
+        """
+        series = TimeSeries(4)
+        for i in range(6):
+            series.append(i, i * 10)
+
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.samples(), [(2, 20), (3, 30), (4, 40), (5, 50)])
+        self.assertEqual(series.samples(since=4), [(4, 40), (5, 50)])
+        self.assertEqual(series.latest(), 50)
+        self.assertEqual(series.downsample(2), [(3, 25), (5, 45)])
+
+    def test_history_rolls_up_older_samples(self):
+        """
+        Long ranges come from the rollup once the recent buffer no longer covers them.
+        """
+        history = MetricHistory(capacity=5, rollup=5, rollup_capacity=10)
+        for i in range(20):
+            history.append(i, i)
+
+        self.assertEqual(history.series(seconds=3), [(16, 16), (17, 17), (18, 18), (19, 19)])
+        self.assertEqual(history.series(seconds=15), [(4, 2.0), (9, 7.0), (14, 12.0), (19, 17.0)])
+
+    def test_sample_records_rates_for_running_vms(self):
+        """
+        The first pass sets a baseline; the next records CPU, memory and per-second disk rates.
+        """
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        registry = VMRegistry()
+        self.addCleanup(registry.close)
+        record = registry.register(process, "vm1", "/disks/vm1.qcow2", ["qemu"])
+        qmp = FakeQMPStats(record.vm_id)
+        monitor = ResourceMonitor(registry, qmp)
+
+        self.assertEqual(monitor.sample(now=100.0), [])
+        qmp.rd_bytes = 4096
+        self.assertEqual(monitor.sample(now=102.0), [record.vm_id])
+
+        latest = monitor.latest(record.vm_id)
+        self.assertEqual(latest["disk_read"], 2048)
+        self.assertGreater(latest["rss"], 0)
+        self.assertEqual(len(monitor.history(record.vm_id, "cpu").recent), 1)
+
+        process.kill()
+        process.wait()
+        record.ended = time.time()
+        monitor.sample(now=104.0)
+        self.assertIsNone(monitor.history(record.vm_id, "cpu"))
+
+    def test_network_is_read_from_the_tap_interfaces(self):
+        """
+        Tap ifnames come from the command line and the guest's rx is the host interface's tx.
+        """
+        cmdline = ["qemu", "-netdev", "tap,id=net0,ifname=tap7,script=no", "-netdev", "user,id=net1"]
+        self.assertEqual(tap_interfaces(os.getpid(), cmdline), ["tap7"])
+
+        with tempfile.TemporaryDirectory() as net_dir:
+            os.makedirs(os.path.join(net_dir, "tap7", "statistics"))
+            for counter, value in (("rx_bytes", "300\n"), ("tx_bytes", "5000\n")):
+                with open(os.path.join(net_dir, "tap7", "statistics", counter), "w") as f:
+                    f.write(value)
+            self.assertEqual(interface_bytes(["tap7", "gone0"], net_dir), (5000, 300))
+
+
+class FakeSnapshotQMP:
+    """Records QMP commands and writes the state file a real migration would produce."""
+
+    def __init__(self):
+        self.commands = []
+        self.statuses = ["inmigrate", "inmigrate", "paused"]
+
+    def execute(self, vm_id, command, arguments=None, timeout=None):
+        self.commands.append(command)
+        if command == "query-block":
+            return [{"device": "disk0", "inserted": {"file": "/disks/base.qcow2"}}]
+        if command == "migrate":
+            path = arguments["uri"].split("> ", 1)[1].strip("'")
+            with open(path, "wb") as f:
+                f.write(b"ram" * 10)
+        if command == "query-migrate":
+            return {"status": "completed"}
+        if command == "human-monitor-command":
+            return ""
+        return {}
+
+    def pause(self, vm_id):
+        self.commands.append("stop")
+
+    def resume(self, vm_id):
+        self.commands.append("cont")
+
+    def status(self, vm_id):
+        return self.statuses.pop(0)
+
+
+class TestSnapshotManager(unittest.TestCase):
+    """
+    Tests for saving VM state and preparing fast restores.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.qmp = FakeSnapshotQMP()
+        self.clones = CloneManager(os.path.join(self.tmpdir.name, "clones"))
+        self.manager = SnapshotManager(self.qmp, self.clones, os.path.join(self.tmpdir.name, "snapshots"))
+        cmdline = ["qemu-system-x86_64", "-m", "1024", "-drive", "file=/disks/base.qcow2,format=raw,if=none,id=disk0",
+                   "-name", "vm1", "-qmp", "unix:/run/vm1.qmp,server=on,wait=off"]
+        self.record = VMRecord("abc", "vm1", "/disks/base.qcow2", 1, cmdline=cmdline)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_save_state_freezes_disk_and_saves_ram(self):
+        """
+        The VM is paused, moved to an overlay, migrated to a file and resumed.
+        """
+        snapshot = self.manager.save_state(self.record, "ready")
+
+        self.assertEqual(self.qmp.commands, ["stop", "query-block", "blockdev-snapshot-sync",
+                                             "migrate-set-parameters", "migrate", "query-migrate", "cont"])
+        self.assertEqual(snapshot.disk, "/disks/base.qcow2")
+        self.assertEqual(snapshot.size, 30)
+        self.assertNotIn("-qmp", snapshot.cmdline)
+        self.assertTrue(self.clones.is_clone(self.record.disk))
+        self.assertTrue(any(f"file={self.record.disk}," in arg for arg in self.record.cmdline))
+        self.assertEqual(self.manager.list("/disks/base.qcow2"), [snapshot])
+
+    @patch("vm_clones.run_process")
+    def test_prepare_restore_boots_a_clone_with_incoming(self, mock_run):
+        """
+        Restoring clones the frozen disk and loads RAM with -incoming, then starts the guest.
+        """
+        snapshot = self.manager.save_state(self.record, "ready")
+        with patch("os.path.exists", return_value=True):
+            cmdline, disk = self.manager.prepare_restore(snapshot)
+
+        self.assertTrue(self.clones.is_clone(disk))
+        self.assertIn(f"file={disk},format=qcow2,if=none,id=disk0", cmdline)
+        self.assertEqual(cmdline[-2], "-incoming")
+        self.assertIn(snapshot.path, cmdline[-1])
+
+        self.qmp.commands.clear()
+        self.manager.finish_restore("new")
+        self.assertEqual(self.qmp.commands, ["cont"])
+
+    def test_command_line_helpers(self):
+        """
+        Per-launch flags are stripped and only the matching drive is repointed.
+        """
+        self.assertEqual(strip_launch_flags(["qemu", "-name", "a", "-loadvm", "s", "-m", "1"]), ["qemu", "-m", "1"])
+        self.assertEqual(replace_drive_file(["file=/a.img,format=raw", "file=/b.img,format=raw"], "/a.img", "/c.qcow2"),
+                         ["file=/c.qcow2,format=qcow2", "file=/b.img,format=raw"])
+
+
+class TestVMScheduler(unittest.TestCase):
+    """
+    Tests for admission control and core placement.
+    """
+
+    def setUp(self):
+        # Two NUMA nodes with 4 cores each and 16 GB of RAM
+        self.scheduler = VMScheduler(nodes={0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}, total_memory=16384, reserve_memory=0,
+                                     memory_overcommit=1.5)
+
+    def test_admits_until_capacity_then_queues_and_rejects(self):
+        """
+        Launches beyond the free capacity queue; launches larger than the host are rejected.
+        """
+        self.assertEqual(self.scheduler.admit("a", 6, 2048).decision, "admit")
+        queued = self.scheduler.admit("b", 4, 2048)
+        self.assertEqual(queued.decision, "queue")
+        self.assertEqual(self.scheduler.admit("c", 9, 1024).decision, "reject")
+        self.assertEqual(self.scheduler.admit("d", 1, 30000).decision, "reject")
+        self.assertEqual(self.scheduler.committed(), (6, 2048))
+
+    def test_release_starts_queued_launches_in_order(self):
+        """
+        Freed capacity goes to queued launches first in, first out.
+        """
+        self.scheduler.admit("a", 8, 1024)
+        started = []
+        self.scheduler.enqueue(6, 1024, lambda: started.append("big"))
+        self.scheduler.enqueue(1, 1024, lambda: started.append("small"))
+
+        for launch in self.scheduler.release("a"):
+            launch()
+
+        self.assertEqual(started, ["big", "small"])
+        self.assertEqual(self.scheduler.queued(), 0)
+
+    def test_short_free_memory_waits_only_behind_running_vms(self):
+        """
+        Without overcommit, a lack of free host memory queues a launch only while a tracked VM can free some.
+        """
+        scheduler = VMScheduler(nodes={0: [0, 1, 2, 3]}, total_memory=16384, reserve_memory=0)
+        with patch.object(VMScheduler, "_free_memory", return_value=1024):
+            self.assertEqual(scheduler.admit("a", 1, 2048).decision, "reject")
+            self.assertEqual(scheduler.admit("a", 1, 512).decision, "admit")
+            self.assertEqual(scheduler.admit("b", 1, 2048).decision, "queue")
+            scheduler.enqueue(1, 2048, "first")
+            scheduler.enqueue(1, 512, "second")
+            scheduler.track("c", 1, 512)
+            # Still too little free memory for the head of the queue: nothing starts yet
+            self.assertEqual(scheduler.release("c"), [])
+            self.assertEqual(scheduler.enqueue(1, 4096, "retry", front=True), 1)
+        with patch.object(VMScheduler, "_free_memory", return_value=8192):
+            self.assertEqual(scheduler.release("a"), ["retry", "first", "second"])
+
+    def test_vcpus_get_dedicated_cores_on_one_node(self):
+        """
+        Pinned VMs never share cores and stay on one NUMA node when they fit.
+        """
+        first = self.scheduler.admit("a", 3, 1024)
+        second = self.scheduler.admit("b", 2, 1024)
+
+        self.assertEqual((first.cores, first.node), ((0, 1, 2), 0))
+        self.assertEqual((second.cores, second.node), ((4, 5), 1))
+        self.assertEqual(self.scheduler.numa_node(second), 1)
+
+        self.scheduler.cpu_overcommit = 2.0
+        self.assertEqual(self.scheduler.admit("c", 4, 1024).cores, ())
+
+    def test_parsers(self):
+        """
+        Kernel cpulists and QEMU -smp/-m flags are understood.
+        """
+        self.assertEqual(parse_cpulist("0-2,5,7-8\n"), [0, 1, 2, 5, 7, 8])
+        self.assertEqual(command_resources(["qemu", "-smp", "4", "-m", "2048"]), (4, 2048))
+        self.assertEqual(command_resources(["qemu", "-smp", "cpus=2,maxcpus=4", "-m", "2G"]), (2, 2048))
+        self.assertEqual(command_resources(["qemu", "-smp", "sockets=1,cores=2,threads=2",
+                                            "-m", "size=4194304k,maxmem=8G"]), (4, 4096))
+        self.assertEqual(command_resources(["qemu", "-smp", "sockets=2,cores=2", "-m", "1T"]), (4, 1024 ** 2))
+        self.assertEqual(command_resources(["qemu", "-smp", "bogus=x", "-m", "lots"]), (1, 128))
+
+
+class FakeBalloonQMP:
+    """QMP stand-in reporting fixed balloon sizes and recording resize requests"""
+
+    def __init__(self, actual):
+        self.actual = actual
+        self.resized = []
+
+    def connected(self):
+        return list(self.actual)
+
+    def query_all(self, command):
+        return {vm_id: {"actual": actual} for vm_id, actual in self.actual.items()}
+
+    def execute(self, vm_id, command, arguments=None, timeout=None):
+        self.resized.append((vm_id, command, arguments["value"]))
+
+
+class TestVMMemory(unittest.TestCase):
+    """
+    Tests for guest RAM backing flags and the balloon policy.
+    """
+
+    MB = 2 ** 20
+
+    def setUp(self):
+        cmdline = ["qemu-system-x86_64", "-m", "1024", "-device", "virtio-balloon-pci,id=balloon0"]
+        self.registry = MagicMock()
+        self.registry.running.return_value = [VMRecord("a", "vm-a", "/disk.qcow2", 1, cmdline=cmdline),
+                                              VMRecord("b", "vm-b", "/disk.qcow2", 2, cmdline=cmdline[:3])]
+
+    def test_memory_args(self):
+        """
+        Hugepages fall back to normal pages without a hugetlbfs mount; a NUMA node binds guest RAM.
+        """
+        with patch("vm_memory.hugetlbfs_mount", return_value=None), patch("vm_memory.ksm_running", return_value=True):
+            args, notes = memory_args(1024, hugepages=True, balloon=True)
+            self.assertEqual(args, ["-device", "virtio-balloon-pci,id=balloon0,deflate-on-oom=on,free-page-reporting=on"])
+            self.assertIn("hugetlbfs", notes[0])
+
+            args, _ = memory_args(1024, node=1, merge=False)
+            self.assertEqual(args, ["-object", "memory-backend-ram,id=mem0,size=1024M,merge=off,host-nodes=1,policy=bind",
+                                    "-numa", "node,memdev=mem0"])
+            self.assertEqual(memory_args(1024, merge=False)[0], ["-machine", "mem-merge=off"])
+
+        with patch("vm_memory.hugetlbfs_mount", return_value="/dev/hugepages"), \
+                patch("vm_memory.free_hugepages_mb", return_value=2048):
+            args, notes = memory_args(1024, hugepages=True)
+            self.assertEqual(args, ["-object", "memory-backend-file,id=mem0,size=1024M,mem-path=/dev/hugepages,prealloc=on",
+                                    "-machine", "memory-backend=mem0"])
+            self.assertEqual(notes, [])
+
+    def test_balloon_shrinks_under_pressure_down_to_floor(self):
+        """
+        Ballooned VMs give memory back in steps while the host is short, never below the floor.
+        """
+        qmp = FakeBalloonQMP({"a": 600 * self.MB, "b": 1024 * self.MB})
+        controller = BalloonController(self.registry, qmp, step=0.1, floor=0.5)
+
+        targets = controller.step(available=0.05, pressure=0.0)
+
+        # VM b has no balloon device and is left alone
+        self.assertEqual(targets, {"a": 512 * self.MB})
+        self.assertEqual(qmp.resized, [("a", "balloon", 512 * self.MB)])
+        self.assertEqual(controller.reclaimed("a"), 424 * self.MB)
+
+    def test_balloon_grows_back_and_holds_steady(self):
+        """
+        Balloons deflate once memory is plentiful again and stay put in between the thresholds.
+        """
+        qmp = FakeBalloonQMP({"a": 1000 * self.MB})
+        controller = BalloonController(self.registry, qmp)
+
+        self.assertEqual(controller.step(available=0.15, pressure=0.0), {})
+        self.assertEqual(controller.step(available=0.5, pressure=0.0), {"a": 1024 * self.MB})
+        # Memory stalls inflate the balloon even when plenty of memory looks available
+        self.assertEqual(controller.step(available=0.5, pressure=20.0), {"a": 1000 * self.MB - int(1024 * self.MB * 0.1)})
+
+    def test_memory_pressure(self):
+        """
+        The PSI "some avg10" value is read, and a missing file means no data.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".psi", delete=False) as f:
+            f.write("some avg10=12.50 avg60=3.00 avg300=1.00 total=1234\n"
+                    "full avg10=1.00 avg60=0.00 avg300=0.00 total=12\n")
+        try:
+            self.assertEqual(memory_pressure(f.name), 12.5)
+        finally:
+            os.remove(f.name)
+        self.assertIsNone(memory_pressure("/nonexistent/pressure"))
+
+
+class FakeProvisionClones:
+    """CloneManager stand-in writing empty overlay files into a temp dir"""
+
+    def __init__(self, clone_dir):
+        self.clone_dir = clone_dir
+
+    def create_clone(self, base, name=None):
+        path = os.path.join(self.clone_dir, f"{name}.qcow2")
+        open(path, "w").close()
+        return path
+
+
+class TestVMManifest(unittest.TestCase):
+    """
+    Tests for manifest parsing and bounded parallel provisioning.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_parse_expands_defaults_and_counts(self):
+        """
+        Defaults apply to every VM, counts expand to numbered VMs and paths resolve against the manifest.
+        """
+        specs = parse_manifest({
+            "defaults": {"image": "base.qcow2", "memory": 2048},
+            "vms": [{"name": "web", "count": 2, "vcpus": 2, "ssh_port": 2222},
+                    {"name": "db", "network": "bridge:br0", "user_data": "#cloud-config\n"}],
+        }, "/lab")
+
+        self.assertEqual([spec.name for spec in specs], ["web-1", "web-2", "db"])
+        self.assertEqual([spec.ssh_port for spec in specs], [2222, 2223, None])
+        self.assertEqual(specs[0], VMSpec("web-1", 2, 2048, "/lab/base.qcow2", "user", None, 2222, None))
+        self.assertEqual((specs[2].network, specs[2].user_data), ("bridge:br0", "#cloud-config\n"))
+
+    def test_parse_rejects_invalid_manifests(self):
+        """
+        Unknown fields and profiles, missing images and duplicate names are reported.
+        """
+        for manifest in ([], [{"name": "a"}], [{"name": "a", "image": "x", "cpus": 2}],
+                         [{"name": "a", "image": "x", "profile": "xyz"}],
+                         [{"name": "a", "image": "x"}, {"name": "a", "image": "y"}]):
+            with self.assertRaises(ValueError):
+                parse_manifest(manifest)
+
+    def test_load_json_and_yaml(self):
+        """
+        Both manifest formats load into the same specs.
+        """
+        json_path = os.path.join(self.tmp.name, "lab.json")
+        with open(json_path, "w") as f:
+            json.dump([{"name": "a", "image": "/img/base.qcow2"}], f)
+        yaml_path = os.path.join(self.tmp.name, "lab.yaml")
+        with open(yaml_path, "w") as f:
+            f.write("vms:\n  - name: a\n    image: /img/base.qcow2\n")
+
+        self.assertEqual(load_manifest(json_path)[0].image, "/img/base.qcow2")
+        try:
+            self.assertEqual(load_manifest(yaml_path), load_manifest(json_path))
+        except ValueError as e:
+            self.assertIn("PyYAML", str(e))
+
+    def test_network_flags(self):
+        """
+        The manifest network and SSH forward end up on the virtio NIC backend.
+        """
+        host = HostCapabilities(kvm=True, io_uring=True, cpu_count=4)
+        cmd, _ = build_qemu_command("Dense", 1, 1024, "/vm/a.qcow2", host=host, forwards=[(2222, 22)])
+        self.assertIn("user,id=net0,hostfwd=tcp:127.0.0.1:2222-:22", cmd)
+        cmd, _ = build_qemu_command("Dense", 1, 1024, "/vm/a.qcow2", host=host, forwards=[(2222, 22)], listen="")
+        self.assertIn("user,id=net0,hostfwd=tcp::2222-:22", cmd)
+        cmd, _ = build_qemu_command("Dense", 1, 1024, "/vm/a.qcow2", host=host, network="bridge:br1")
+        self.assertIn("bridge,id=net0,br=br1", cmd)
+        cmd, _ = build_qemu_command("Dense", 1, 1024, "/vm/a.qcow2", host=host, network="none")
+        self.assertEqual(cmd[-4:-2], ["-nic", "none"])
+
+    def test_provisioner_bounds_boots_and_reports_failures(self):
+        """
+        No more than `concurrency` VMs boot at once; failed launches are reported and their overlays removed.
+        """
+        lock = threading.Lock()
+        booting, peak = [0], [0]
+        qmp = MagicMock()
+        qmp.status.return_value = "running"
+
+        def launch(spec, disk, seed):
+            if spec.name == "bad":
+                raise RuntimeError("not admitted")
+            with lock:
+                booting[0] += 1
+                peak[0] = max(peak[0], booting[0])
+            time.sleep(0.05)
+            with lock:
+                booting[0] -= 1
+            return f"id-{spec.name}"
+
+        specs = [VMSpec(f"vm{i}", 1, 512, "/img/base.qcow2", "user", None, None, None) for i in range(6)]
+        specs.append(VMSpec("bad", 1, 512, "/img/base.qcow2", "user", None, None, None))
+        provisioner = BatchProvisioner(FakeProvisionClones(self.tmp.name), qmp, launch, concurrency=2)
+        states = []
+        report = provisioner.run(specs, lambda name, state, result: states.append((name, state)))
+
+        self.assertEqual(len(report.ready), 6)
+        self.assertEqual([(result.name, result.error) for result in report.failed], [("bad", "not admitted")])
+        self.assertLessEqual(peak[0], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "bad.qcow2")))
+        self.assertIn(("vm0", "ready"), states)
+        self.assertEqual(report.results[0].vm_id, "id-vm0")
+
+
+class TestDiskImages(unittest.TestCase):
+    """
+    Tests for image format probing, the probe cache and layout advice.
+    """
+
+    GB = 2 ** 30
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.image = os.path.join(self.tmp.name, "misnamed.img")
+        with open(self.image, "wb") as f:
+            f.write(b"QFI\xfb" + b"\0" * 100)
+
+    def test_detect_format_from_header(self):
+        """
+        The header decides the format, not the extension; unreadable files give None.
+        """
+        raw = os.path.join(self.tmp.name, "disk.qcow2")
+        with open(raw, "wb") as f:
+            f.write(b"\0" * 512)
+
+        self.assertEqual(detect_format(self.image), "qcow2")
+        self.assertEqual(detect_format(raw), "raw")
+        self.assertIsNone(detect_format(os.path.join(self.tmp.name, "missing.qcow2")))
+        cmd, _ = build_qemu_command("Dense", 1, 512, self.image, host=HostCapabilities(True, True, 2))
+        self.assertIn("format=qcow2", cmd[cmd.index("-drive") + 1].split(","))
+
+    def test_probe_is_cached_until_the_file_changes(self):
+        """
+        qemu-img runs once per file version.
+        """
+        output = json.dumps({"format": "qcow2", "virtual-size": 10 * self.GB, "actual-size": 2 ** 20,
+                             "cluster-size": 65536, "format-specific": {"type": "qcow2", "data": {}}})
+        images = DiskImages()
+        with patch("disk_images.run_process", return_value=subprocess.CompletedProcess([], 0, output, "")) as run:
+            info = images.info(self.image)
+            self.assertEqual(images.info(self.image), info)
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(images.cached(self.image).virtual_size, 10 * self.GB)
+
+            os.utime(self.image, ns=(0, 0))
+            self.assertIsNone(images.cached(self.image))
+            images.info(self.image)
+            self.assertEqual(run.call_count, 2)
+
+    def test_recommend_layout(self):
+        """
+        Sparse images get preallocation, overlays get subclusters and huge images a bigger L2 cache.
+        """
+        raw = recommend_layout(ImageInfo("/a.img", "raw", 10 * self.GB, self.GB, None, None, False, False))
+        self.assertEqual((raw.format, raw.preallocation), ("raw", "falloc"))
+
+        overlay = recommend_layout(ImageInfo("/o.qcow2", "qcow2", 10 * self.GB, 2 ** 20, 65536, "/base.qcow2",
+                                             False, False))
+        self.assertEqual((overlay.cluster_size, overlay.extended_l2, overlay.preallocation), (131072, True, None))
+
+        big = recommend_layout(ImageInfo("/b.qcow2", "qcow2", 1024 * self.GB, 1024 * self.GB, 65536, None,
+                                         False, False))
+        self.assertEqual(big.l2_cache_size, 128 * 2 ** 20)
+        self.assertIsNone(big.preallocation)
+
+    def test_convert_command(self):
+        """
+        Options map onto qemu-img flags and impossible combinations are refused.
+        """
+        self.assertEqual(convert_command("a.img", "b.qcow2", "qcow2", "raw", preallocation="metadata",
+                                         cluster_size=131072),
+                         ["qemu-img", "convert", "-f", "raw", "-O", "qcow2", "-o",
+                          "preallocation=metadata,cluster_size=131072", "a.img", "b.qcow2"])
+        self.assertIn("-c", convert_command("a.img", "b.qcow2", "qcow2", compress=True))
+        for kwargs in ({"fmt": "raw", "preallocation": "metadata"}, {"fmt": "raw", "compress": True},
+                       {"fmt": "qcow2", "compress": True, "preallocation": "falloc"},
+                       {"fmt": "qcow2", "cluster_size": 3000}, {"fmt": "vmdk"}):
+            with self.assertRaises(ValueError):
+                convert_command("a.img", "b", **kwargs)
+
+
+class TestStateStore(unittest.TestCase):
+    """
+    Tests for the SQLite state store and its reconciler.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = StateStore(os.path.join(self.tmp.name, "state", "state.db"))
+        self.addCleanup(self.store.close)
+
+    def updated(self):
+        return dict(self.store._connection().execute("SELECT key, updated FROM items WHERE kind = 'image'"))
+
+    def test_sync_writes_only_changed_rows(self):
+        """
+        Unchanged items keep their stored row; added, changed and removed ones are reported.
+        """
+        self.assertEqual(self.store.sync("image", {"a": {"Size": 1}, "b": {"Size": 2}}),
+                         StoreDelta(["a", "b"], [], []))
+        before = self.updated()
+        time.sleep(0.01)
+
+        delta = self.store.sync("image", {"a": {"Size": 1}, "b": {"Size": 3}, "c": {"Size": 4}})
+
+        self.assertEqual(delta, StoreDelta(["c"], ["b"], []))
+        self.assertEqual(self.updated()["a"], before["a"])
+        self.assertNotEqual(self.updated()["b"], before["b"])
+        self.assertEqual(self.store.sync("image", {"c": {"Size": 4}}), StoreDelta([], [], ["a", "b"]))
+        self.assertEqual(self.store.load("image"), {"c": {"Size": 4}})
+        self.assertEqual(self.store.load("container"), {})
+
+    def test_readers_are_not_blocked_by_a_writer(self):
+        """
+        In WAL mode the last committed state stays readable while another thread holds a write transaction.
+        """
+        self.store.sync("vm", {"web": {"pid": 1}})
+        self.assertEqual(self.store._connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        writing, release = threading.Event(), threading.Event()
+
+        def write():
+            conn = self.store._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM items")
+            writing.set()
+            release.wait(5)
+            conn.rollback()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writing.wait(5)
+        try:
+            started = time.monotonic()
+            self.assertEqual(self.store.load("vm"), {"web": {"pid": 1}})
+            self.assertLess(time.monotonic() - started, 1.0)
+        finally:
+            release.set()
+            writer.join()
+
+    def test_older_snapshot_does_not_overwrite_a_newer_one(self):
+        """
+        A sync of a snapshot taken before the last synced one is dropped instead of restoring removed rows.
+        """
+        self.store.sync("container", {"c2": {"State": "running"}}, as_of=2.0)
+        self.assertEqual(self.store.sync("container", {"c1": {"State": "running"}}, as_of=1.0),
+                         StoreDelta([], [], []))
+        self.assertEqual(self.store.load("container"), {"c2": {"State": "running"}})
+
+    def test_reconciler_syncs_sources(self):
+        """
+        A reconcile fetches the live items and returns them with what changed in the store.
+        """
+        live = {"c1": {"State": "running"}}
+        reconciler = StateReconciler(self.store)
+        reconciler.add_source("container", lambda: dict(live))
+
+        self.assertEqual(reconciler.reconcile("container"), (live, StoreDelta(["c1"], [], [])))
+        live["c1"] = {"State": "exited"}
+        self.assertEqual(reconciler.reconcile("container")[1], StoreDelta([], ["c1"], []))
+
+        reopened = StateStore(self.store.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.load("container"), live)
+
+
+class FakeFrame:
+    """Records how the router packs, hides and destroys a section frame"""
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+        self.alive = True
+
+    def pack(self, **options):
+        self.log.append(("pack", self.name))
+
+    def pack_forget(self):
+        self.log.append(("hide", self.name))
+
+    def destroy(self):
+        self.alive = False
+        self.log.append(("destroy", self.name))
+
+    def winfo_exists(self):
+        return self.alive
+
+
+class TestViewRouter(unittest.TestCase):
+    """
+    Tests for lazy section construction, caching and LRU eviction.
+    """
+
+    def setUp(self):
+        self.log = []
+        self.builds = []
+        self.router = ViewRouter(capacity=3)
+        for name in ("home", "vm", "hub", "containers"):
+            self.router.register(name, lambda name=name: self.build(name), pinned=name == "home",
+                                 on_show=lambda name=name: self.log.append(("shown", name)),
+                                 on_evict=lambda name=name: self.log.append(("evicting", name)))
+
+    def build(self, name):
+        self.builds.append(name)
+        return FakeFrame(name, self.log)
+
+    def test_sections_are_built_once_and_reshown(self):
+        """
+        Revisiting a section re-packs its cached frame instead of building a new one.
+        """
+        self.router.show("home")
+        self.router.show("vm")
+        self.router.show("home")
+        self.router.show("vm")
+
+        self.assertEqual(self.builds, ["home", "vm"])
+        self.assertEqual(self.log[-3:], [("hide", "home"), ("pack", "vm"), ("shown", "vm")])
+        self.assertEqual(self.router.current, "vm")
+
+    def test_least_recently_used_section_is_destroyed(self):
+        """
+        Beyond the cap the oldest unpinned section is destroyed and rebuilt on its next visit.
+        """
+        for name in ("home", "vm", "hub", "home", "containers"):
+            self.router.show(name)
+
+        self.assertEqual(self.router.cached(), ["hub", "home", "containers"])
+        self.assertIn(("evicting", "vm"), self.log)
+        self.assertLess(self.log.index(("evicting", "vm")), self.log.index(("destroy", "vm")))
+
+        self.router.show("vm")
+        self.assertEqual(self.builds.count("vm"), 2)
+        # The pinned homepage survives even as the least recently used section
+        self.assertEqual(self.router.cached(), ["home", "containers", "vm"])
+
+
+class TestTableModel(unittest.TestCase):
+    """
+    Tests for the sorted, filtered row model behind the virtualized tables.
+    """
+
+    def setUp(self):
+        self.model = TableModel([Column("NAME", 10), Column("SIZE", 6, "e", lambda size: f"{size} B")])
+        self.model.set_rows([("a", ("alpine", 5)), ("b", ("busybox", 300)), ("c", ("nginx", 40))])
+
+    def test_sort_by_raw_values_and_toggle(self):
+        """
+        Sorting compares cell values, not their text, and sorting again reverses it.
+        """
+        self.model.sort_by(1)
+        self.assertEqual(self.model.view(), ["a", "c", "b"])
+        self.model.sort_by(1)
+        self.assertEqual(self.model.view(), ["b", "c", "a"])
+        self.assertEqual(self.model.line("b"), "busybox     300 B")
+
+    def test_filter_matches_every_term(self):
+        """
+        The filter keeps rows whose displayed cells contain every term, ignoring case.
+        """
+        self.model.set_filter("NGINX")
+        self.assertEqual(self.model.view(), ["c"])
+        self.model.set_filter("b 300")
+        self.assertEqual(self.model.view(), ["b"])
+        self.assertEqual(self.model.total(), 3)
+
+    def test_batched_updates(self):
+        """
+        One batch adds, changes and removes rows; unchanged rows do not count as a change.
+        """
+        self.model.sort_by(1, reverse=True)
+        self.assertTrue(self.model.apply([("d", ("redis", 100)), ("a", ("alpine", 500))], removals=["b"]))
+        self.assertEqual(self.model.view(), ["a", "d", "c"])
+        self.assertFalse(self.model.apply([("c", ("nginx", 40))], removals=["missing"]))
+
+    def test_unsorted_view_keeps_insertion_order(self):
+        """
+        Without a sort column new rows are appended in the order they arrive.
+        """
+        self.model.view()
+        self.model.apply([("e", ("etcd", 1)), ("d", ("debian", 2))])
+        self.assertEqual(self.model.view(), ["a", "b", "c", "e", "d"])
+        self.assertEqual(self.model.index("e"), 3)
+        self.assertIsNone(self.model.index("missing"))
+
+
+class FakeTimers:
+    """
+    Stand-in for a Tk widget that keeps pending after() timers so tests can fire them.
+    """
+    def __init__(self):
+        self.timers = {}
+        self._next_id = 0
+
+    def after(self, delay, callback):
+        self._next_id += 1
+        self.timers[self._next_id] = (delay, callback)
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.timers.pop(after_id, None)
+
+    def delays(self):
+        return [delay for delay, callback in self.timers.values()]
+
+    def fire(self):
+        timers, self.timers = self.timers, {}
+        for delay, callback in timers.values():
+            callback()
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    """
+    Tests for adaptive, visibility-aware list polling.
+    """
+
+    def setUp(self):
+        self.tasks = TaskRunner(FakeScheduler(), max_workers=2)
+        self.timers = FakeTimers()
+        self.refresh = RefreshScheduler(self.timers, self.tasks)
+        self.diffs = []
+        self.applied = []
+        self.fetches = 0
+        self.refresh.register("containers", self.fetch, self.applied.append, interval=4.0, min_interval=1.0,
+                              max_interval=10.0)
+
+    def tearDown(self):
+        self.tasks.shutdown()
+
+    def fetch(self):
+        self.fetches += 1
+        return self.diffs.pop(0) if self.diffs else ([], [], [])
+
+    def test_interval_adapts_to_change_rate(self):
+        """
+        Polls that find changes shorten the interval; quiet polls stretch it up to the maximum.
+        """
+        self.diffs = [(["a"], [], []), (["b"], [], [])]
+        self.refresh.resume("containers")
+        self.tasks.wait(timeout=5)
+        self.assertEqual(self.timers.delays(), [2000])
+        self.timers.fire()
+        self.tasks.wait(timeout=5)
+        self.assertEqual(self.refresh.interval("containers"), 1.0)
+        for _ in range(6):
+            self.timers.fire()
+            self.tasks.wait(timeout=5)
+        self.assertEqual(self.refresh.interval("containers"), 10.0)
+        self.assertEqual(self.applied[:2], [(["a"], [], []), (["b"], [], [])])
+
+    def test_paused_source_stops_polling(self):
+        """
+        Hiding the section cancels the timer; a fetch in flight is applied but not rescheduled.
+        """
+        self.refresh.resume("containers")
+        self.refresh.pause("containers")
+        self.tasks.wait(timeout=5)
+        self.assertEqual(len(self.applied), 1)
+        self.assertEqual(self.timers.timers, {})
+        self.assertFalse(self.refresh.active("containers"))
+
+    def test_overlapping_requests_are_coalesced(self):
+        """
+        Requests made while a fetch runs fold into a single follow-up fetch.
+        """
+        release = threading.Event()
+        self.refresh.register("slow", lambda: release.wait(5) and None or [], self.applied.append)
+        self.refresh.request("slow")
+        for _ in range(5):
+            self.refresh.request("slow")
+        release.set()
+        self.tasks.wait(timeout=5)
+        self.tasks.wait(timeout=5)
+        self.assertEqual(len(self.applied), 2)
+
+    def test_cancelled_fetch_does_not_block_later_requests(self):
+        """
+        Cancelling a refresh in flight (Cancel Running Operations) still lets the next request fetch.
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return []
+
+        self.refresh.register("images", slow, self.applied.append)
+        self.refresh.request("images")
+        self.assertTrue(started.wait(5))
+        self.tasks.cancel_all()
+        release.set()
+        self.tasks.wait(timeout=5)
+        self.tasks.wait(timeout=5)
+        self.assertEqual(self.applied, [])
+
+        self.refresh.request("images")
+        self.tasks.wait(timeout=5)
+        self.assertEqual(self.applied, [[]])
+
+    def test_errors_reach_the_requester_and_back_off(self):
+        """
+        A failed refresh reports to whoever asked for it and waits the maximum interval to retry.
+        """
+        errors = []
+
+        def boom():
+            raise OSError("daemon unreachable")
+
+        self.refresh.register("images", boom, self.applied.append, interval=4.0, max_interval=30.0)
+        self.refresh.resume("images")
+        self.refresh.pause("images")
+        self.refresh.request("images", on_error=errors.append)
+        self.tasks.wait(timeout=5)
+        self.tasks.wait(timeout=5)
+        self.assertIsInstance(errors[0], OSError)
+        self.assertEqual(self.refresh.interval("images"), 30.0)
+        self.assertEqual(self.applied, [])
+
+
+class FakeBulkClient:
+    """
+    Pretends to stop, restart and remove containers, failing the ids in `missing`.
+    """
+    def __init__(self, containers=(), missing=(), delay=0.0):
+        self.listed = list(containers)
+        self.missing = set(missing)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def containers(self, all=True, filters=None):
+        return [c for c in self.listed if all or c.get("State") == "running"]
+
+    def _act(self, action, container_id, **options):
+        with self.lock:
+            self.calls.append((action, container_id, options))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if container_id in self.missing:
+                raise DockerAPIError(f"No such container: {container_id}", status=404)
+            return True
+        finally:
+            with self.lock:
+                self.active -= 1
+
+    def stop_container(self, container_id, timeout=None):
+        return self._act("stop", container_id, timeout=timeout)
+
+    def restart_container(self, container_id, timeout=None):
+        return self._act("restart", container_id, timeout=timeout)
+
+    def remove_container(self, container_id, force=False, volumes=False):
+        return self._act("remove", container_id, force=force, volumes=volumes)
+
+    def fork(self, pool_size):
+        self.forked = pool_size
+        return self
+
+    def close(self):
+        pass
+
+
+def fake_container(container_id, name, state="running", **labels):
+    return {"Id": container_id, "Names": [f"/{name}"], "State": state, "Labels": labels}
+
+
+class TestContainerBulk(unittest.TestCase):
+    """
+    Tests for parallel bulk stop/restart/remove and container filters.
+    """
+
+    def setUp(self):
+        self.containers = [fake_container("aaa111", "web-1", tier="web"),
+                           fake_container("bbb222", "web-2", "exited", tier="web"),
+                           fake_container("ccc333", "db-1", tier="db", backup="nightly")]
+
+    def test_filters_match_labels_names_and_status(self):
+        """
+        Every given filter must match; names take shell-style patterns and ids match by prefix.
+        """
+        ids = lambda matches: [c["Id"] for c in matches]
+        self.assertEqual(ids(match_containers(self.containers, labels=["tier=web"])), ["aaa111", "bbb222"])
+        self.assertEqual(ids(match_containers(self.containers, labels=["backup"])), ["ccc333"])
+        self.assertEqual(ids(match_containers(self.containers, name="web-*", status=["running"])), ["aaa111"])
+        self.assertEqual(ids(match_containers(self.containers, name="ccc")), ["ccc333"])
+        self.assertEqual(match_containers(self.containers, labels=["tier=cache"]), [])
+
+    def test_operations_run_in_parallel_with_the_grace_timeout(self):
+        """
+        No more than `concurrency` operations run at once and each gets the per-operation timeout.
+        """
+        client = FakeBulkClient(delay=0.05)
+        report = ContainerBulk(client, concurrency=3, timeout=2).run("restart", [f"c{i}" for i in range(9)])
+
+        self.assertEqual(client.peak, 3)
+        self.assertEqual(len(report.changed), 9)
+        self.assertTrue(all(options == {"timeout": 2} for _, _, options in client.calls))
+        self.assertLess(report.seconds, 9 * 0.05)
+
+    def test_failures_are_reported_per_container(self):
+        """
+        One failing container does not stop the others; results keep the container names.
+        """
+        client = FakeBulkClient(missing={"bbb222"})
+        updates = []
+        report = ContainerBulk(client, force=True).run("remove", self.containers + ["aaa111"],
+                                                       on_update=lambda *update: updates.append(update[:2]))
+
+        self.assertEqual(len(report.results), 3)
+        self.assertEqual([(result.name, result.error) for result in report.failed],
+                         [("web-2", "No such container: bbb222")])
+        self.assertIn(("bbb222", "failed"), updates)
+        self.assertEqual(client.calls[0][2], {"force": True, "volumes": False})
+        with self.assertRaises(ValueError):
+            ContainerBulk(client).run("kill", ["aaa111"])
+
+
+class TestCloudCore(unittest.TestCase):
+    """
+    Tests for the headless engine shared by the GUI and cloudctl.
+    """
+
+    def setUp(self):
+        self.core = CloudCore(docker=FakePullClient())
+        self.core.vm_scheduler = VMScheduler(nodes={0: [0, 1, 2, 3]}, total_memory=8192, reserve_memory=0)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.disk = os.path.join(self.tmp.name, "base.qcow2")
+        with open(self.disk, "wb") as f:
+            f.write(b"QFI\xfb" + b"\0" * 508)
+
+    def tearDown(self):
+        self.core.close()
+        self.tmp.cleanup()
+
+    def test_launch_starts_one_qemu_process(self):
+        """
+        A launch builds the command, reserves cores and starts QEMU once with a QMP socket.
+        """
+        with patch("subprocess.Popen") as popen:
+            popen.return_value.pid = os.getpid()
+            popen.return_value.poll.return_value = None
+            launch = self.core.launch_vm(2, 1024, self.disk, memory_options={"merge": False}, name="web")
+
+        popen.assert_called_once()
+        cmd = popen.call_args[0][0]
+        self.assertIn("-smp", cmd)
+        self.assertIn("-qmp", cmd)
+        self.assertEqual(cmd[cmd.index("-name") + 1], "web")
+        self.assertEqual(launch.name, "web")
+        self.assertEqual(len(launch.cores), 2)
+        self.assertEqual(self.core.vm_scheduler.committed(), (2, 1024))
+        self.assertEqual(self.core.vm_registry.get(launch.vm_id).disk, self.disk)
+
+    def test_launch_beyond_capacity_raises_admission_error(self):
+        """
+        A VM the host cannot take now is refused without starting QEMU or reserving anything.
+        """
+        with patch("subprocess.Popen") as popen:
+            with self.assertRaises(AdmissionError) as raised:
+                self.core.launch_vm(1, 16384, self.disk, memory_options={"merge": False})
+            with self.assertRaises(FileNotFoundError):
+                self.core.launch_vm(1, 512, os.path.join(self.tmp.name, "missing.qcow2"))
+
+        popen.assert_not_called()
+        self.assertEqual(raised.exception.admission.decision, "reject")
+        self.assertEqual(self.core.vm_scheduler.committed(), (0, 0))
+
+    def test_host_ksm_is_only_started_on_request(self):
+        """
+        Guest pages are marked mergeable by default, but the host-wide KSM daemon is left alone.
+        """
+        admission = self.core.vm_scheduler.admit("vm", 1, 512)
+        with patch("cloud_core.enable_ksm") as enable_ksm:
+            args, _ = self.core.memory_backing(512, admission)
+            enable_ksm.assert_not_called()
+            self.core.memory_backing(512, admission, start_ksm=True)
+            enable_ksm.assert_called_once()
+        self.assertNotIn("mem-merge=off", args)
+
+
+class TestCloudCtl(unittest.TestCase):
+    """
+    Tests for the JSON command-line client.
+    """
+
+    def setUp(self):
+        self.core = CloudCore(docker=FakePullClient())
+
+    def tearDown(self):
+        self.core.close()
+
+    def run_cli(self, *argv):
+        out = StringIO()
+        status = cloudctl_main(["--compact", *argv], core=self.core, out=out)
+        return status, json.loads(out.getvalue())
+
+    def test_plan_prints_the_qemu_command(self):
+        """
+        `vm plan` prints the command a launch would run, without starting anything.
+        """
+        with tempfile.NamedTemporaryFile(suffix=".qcow2") as disk:
+            status, result = self.run_cli("vm", "plan", "--disk", disk.name, "--cpus", "2", "--memory", "2048")
+
+        self.assertEqual(status, 0)
+        self.assertIn("2048", result["command"])
+        self.assertIsInstance(result["notes"], list)
+
+    def test_pull_reports_every_image_and_exit_status(self):
+        """
+        `images pull` pulls every reference once and exits 1 only when a pull failed.
+        """
+        status, result = self.run_cli("images", "pull", "alpine", "nginx", "alpine:latest", "--parallel", "2")
+        self.assertEqual(status, 0)
+        self.assertEqual(result["failed"], 0)
+        self.assertEqual(len(result["results"]), 2)
+        self.assertEqual(self.core.docker.forked, 2)
+
+        self.core.docker.failures["broken"] = (DockerAPIError("manifest unknown", status=404), 1)
+        status, result = self.run_cli("images", "pull", "broken")
+        self.assertEqual(status, 1)
+        self.assertEqual(result["failed"], 1)
+
+    def test_bulk_restart_selects_containers_by_filter(self):
+        """
+        `containers restart` acts on the named and the matching containers and reports each of them.
+        """
+        self.core.docker = FakeBulkClient([fake_container("aaa111", "web-1", tier="web"),
+                                           fake_container("bbb222", "db-1", tier="db")])
+        status, result = self.run_cli("containers", "restart", "--label", "tier=web", "ccc333", "--timeout", "3")
+
+        self.assertEqual(status, 0)
+        self.assertEqual(result["changed"], 2)
+        self.assertEqual(self.core.docker.forked, 8)
+        self.assertCountEqual([call[:2] for call in self.core.docker.calls],
+                              [("restart", "ccc333"), ("restart", "aaa111")])
+        status, result = self.run_cli("containers", "stop")
+        self.assertEqual((status, result["type"]), (2, "UsageError"))
+
+    def test_errors_are_printed_as_json(self):
+        """
+        A failing command prints its error as JSON instead of a traceback.
+        """
+        status, result = self.run_cli("vm", "pause", "nonexistent")
+        self.assertEqual(status, 1)
+        self.assertFalse(result[0]["ok"])
+        status, result = self.run_cli("images", "pull")
+        self.assertEqual((status, result["type"]), (2, "UsageError"))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,72 @@
+from collections import OrderedDict, namedtuple
+
+# A registered section: build() creates its (unpacked) frame, pack holds the pack() options;
+# hooks run after it is shown, after it is hidden, and just before its widgets are destroyed
+View = namedtuple("View", "build pack on_show on_hide on_evict pinned")
+
+
+class ViewRouter:
+    """Shows one section at a time, building each lazily and keeping recent ones alive.
+
+    A hidden section keeps its widgets and is re-packed on its next visit. Beyond
+    `capacity` cached sections, the least recently shown one that is not pinned is
+    destroyed and rebuilt on demand, so the widget count stays flat however long
+    the application runs.
+    """
+
+    def __init__(self, capacity=4):
+        self.capacity = capacity
+        self.current = None
+        self._views = {}
+        self._frames = OrderedDict()
+
+    def register(self, name, build, pack=None, on_show=None, on_hide=None, on_evict=None, pinned=False):
+        self._views[name] = View(build, pack or {}, on_show, on_hide, on_evict, pinned)
+
+    def cached(self):
+        """Names of the sections with live widgets, least recently shown first"""
+        return list(self._frames)
+
+    def frame(self, name):
+        return self._frames.get(name)
+
+    def show(self, name):
+        """Hide the current section and show `name`, building it on its first visit"""
+        view = self._views[name]
+        if self.current is not None and self.current != name:
+            previous = self._views[self.current]
+            frame = self._frames.get(self.current)
+            if frame is not None and frame.winfo_exists():
+                frame.pack_forget()
+            if previous.on_hide:
+                previous.on_hide()
+
+        frame = self._frames.get(name)
+        if frame is None or not frame.winfo_exists():
+            frame = self._frames[name] = view.build()
+        self._frames.move_to_end(name)
+        if self.current != name:
+            frame.pack(**view.pack)
+        self.current = name
+        if view.on_show:
+            view.on_show()
+        self._evict()
+        return frame
+
+    def evict(self, name):
+        """Destroy a cached section; it is rebuilt the next time it is shown"""
+        frame = self._frames.pop(name, None)
+        if frame is None:
+            return
+        if name == self.current:
+            self.current = None
+        view = self._views[name]
+        if view.on_evict:
+            view.on_evict()
+        if frame.winfo_exists():
+            frame.destroy()
+
+    def _evict(self):
+        candidates = [name for name in self._frames if name != self.current and not self._views[name].pinned]
+        while len(self._frames) > self.capacity and candidates:
+            self.evict(candidates.pop(0))
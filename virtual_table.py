@@ -0,0 +1,407 @@
+import tkinter as tk
+import tkinter.font as tkfont
+from collections import namedtuple
+
+import customtkinter as ctk
+
+# One table column: its title, width in characters, text alignment ("w" or "e") and how a
+# cell value is displayed (str by default). Rows hold raw values so sorting is by value.
+Column = namedtuple("Column", "title width anchor format", defaults=("w", None))
+
+
+def _sort_key(value):
+    # None sorts first and mixed types do not compare across each other
+    return (value is not None, type(value).__name__ if not isinstance(value, (int, float)) else "", value)
+
+
+class TableModel:
+    """Rows keyed by id, with a sorted and filtered view that is only recomputed when needed.
+
+    Without a sort column the view keeps insertion order, so plain appends and cell
+    changes never re-sort.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.sort_column = None
+        self.sort_reverse = False
+        self.filter_text = ""
+        self._rows = {}
+        self._view = []
+        self._stale = False
+
+    def __len__(self):
+        return len(self.view())
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def total(self):
+        """Rows in the model, including those the filter hides"""
+        return len(self._rows)
+
+    def row(self, key):
+        return self._rows.get(key)
+
+    def cell_text(self, column, value):
+        formatter = self.columns[column].format
+        if value is None:
+            return ""
+        return formatter(value) if formatter else str(value)
+
+    def texts(self, key):
+        return [self.cell_text(column, value) for column, value in enumerate(self._rows[key])]
+
+    def set_rows(self, rows):
+        """Replace every row with `rows`, an iterable of (key, cells)"""
+        self._rows = {key: tuple(cells) for key, cells in rows}
+        self._stale = True
+
+    def apply(self, upserts=(), removals=()):
+        """Add or change (key, cells) rows and drop `removals` keys; True if the table changed"""
+        ordered = self.sort_column is None and not self.filter_text
+        changed = False
+        for key in removals:
+            if self._rows.pop(key, None) is not None:
+                changed = True
+                self._stale = True
+        for key, cells in upserts:
+            cells = tuple(cells)
+            old = self._rows.get(key)
+            if old == cells:
+                continue
+            self._rows[key] = cells
+            changed = True
+            if old is None and ordered and not self._stale:
+                self._view.append(key)
+            elif old is None or not ordered:
+                self._stale = True
+        return changed
+
+    def sync(self, rows):
+        """Make the rows equal `rows`, an iterable of (key, cells), touching only the ones that differ"""
+        rows = [(key, tuple(cells)) for key, cells in rows]
+        keys = {key for key, cells in rows}
+        return self.apply(rows, [key for key in self._rows if key not in keys])
+
+    def sort_by(self, column, reverse=None):
+        """Sort by `column`; without `reverse`, sorting the same column again flips the order"""
+        if reverse is None:
+            reverse = not self.sort_reverse if column == self.sort_column else False
+        self.sort_column, self.sort_reverse = column, reverse
+        self._stale = True
+
+    def set_filter(self, text):
+        """Only show rows whose cells contain every whitespace-separated term (case-insensitive)"""
+        self.filter_text = text.strip().lower()
+        self._stale = True
+
+    def _matches(self, key, terms):
+        text = "\t".join(self.texts(key)).lower()
+        return all(term in text for term in terms)
+
+    def view(self):
+        """Keys of the shown rows, in display order"""
+        if self._stale:
+            keys = list(self._rows)
+            if self.filter_text:
+                terms = self.filter_text.split()
+                keys = [key for key in keys if self._matches(key, terms)]
+            if self.sort_column is not None:
+                column = self.sort_column
+                keys.sort(key=lambda key: _sort_key(self._rows[key][column]), reverse=self.sort_reverse)
+            self._view = keys
+            self._stale = False
+        return self._view
+
+    def key(self, index):
+        return self.view()[index]
+
+    def index(self, key):
+        """Display index of `key`, or None if it is not shown"""
+        try:
+            return self.view().index(key)
+        except ValueError:
+            return None
+
+    def line(self, key):
+        """A row as one fixed-width line, the way the table lays it out"""
+        parts = []
+        for column, text in zip(self.columns, self.texts(key)):
+            text = _fit(text, column.width)
+            parts.append(text.rjust(column.width) if column.anchor == "e" else text.ljust(column.width))
+        return " ".join(parts).rstrip()
+
+
+def _fit(text, width):
+    return text if len(text) <= width else text[:max(width - 1, 0)] + "…"
+
+
+class VirtualTable(ctk.CTkFrame):
+    """A scrollable, sortable table that only creates canvas items for the rows on screen.
+
+    Rows live in a TableModel; set_rows() and apply() change it and schedule a single
+    redraw for the next idle moment, however many rows changed. Click a header to sort,
+    click rows to select them (Shift extends, Control toggles). The selection is kept by
+    key, so it survives sorting, filtering and updates. curselection(), get() and size()
+    behave like a tk.Listbox's.
+    """
+
+    def __init__(self, master, columns, width=400, height=200, placeholder="", font=("Courier", 12),
+                 selectmode="extended", on_select=None, on_scroll=None, **kwargs):
+        super().__init__(master, bg_color='#121212', fg_color='#1D1E1E', **kwargs)
+        self.model = TableModel(columns)
+        self.placeholder = placeholder
+        self.selectmode = selectmode
+        self.on_select = on_select
+        self.on_scroll = on_scroll
+        self._font = tkfont.Font(font=font)
+        self._char = self._font.measure("0")
+        self._row_height = self._font.metrics("linespace") + 6
+        self._top = 0
+        self._selection = set()
+        self._anchor = None
+        self._items = []  # (background, [cell text items]) for every row slot on screen
+        self._redraw_after = None
+
+        self.header = tk.Canvas(self, height=self._row_height, bg='#2B2B2B', highlightthickness=0)
+        self.header.grid(row=0, column=0, sticky='ew')
+        self.body = tk.Canvas(self, width=width, height=height, bg='#1D1E1E', highlightthickness=0,
+                              takefocus=True)
+        self.body.grid(row=1, column=0, sticky='nsew')
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._scroll_command)
+        self.scrollbar.grid(row=1, column=1, sticky='ns')
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self._placeholder_item = self.body.create_text(8, 4, anchor="nw", font=self._font, fill='#9E9E9E')
+
+        self.header.bind("<Button-1>", self._header_clicked)
+        self.body.bind("<Configure>", lambda event: self._redraw())
+        self.body.bind("<Button-1>", lambda event: self._clicked(event, "set"))
+        self.body.bind("<Shift-Button-1>", lambda event: self._clicked(event, "range"))
+        self.body.bind("<Control-Button-1>", lambda event: self._clicked(event, "toggle"))
+        self.body.bind("<Up>", lambda event: self._step(-1))
+        self.body.bind("<Down>", lambda event: self._step(1))
+        self.body.bind("<Prior>", lambda event: self.yview_scroll(-1, "pages"))
+        self.body.bind("<Next>", lambda event: self.yview_scroll(1, "pages"))
+        self.body.bind("<MouseWheel>", lambda event: self.yview_scroll(-3 if event.delta > 0 else 3, "units"))
+        self.body.bind("<Button-4>", lambda event: self.yview_scroll(-3, "units"))
+        self.body.bind("<Button-5>", lambda event: self.yview_scroll(3, "units"))
+        self._draw_header()
+
+    def destroy(self):
+        if self._redraw_after is not None:
+            self.after_cancel(self._redraw_after)
+            self._redraw_after = None
+        super().destroy()
+
+    # Model updates -- all of them redraw once, when Tk is next idle
+
+    def set_rows(self, rows):
+        """Replace the rows with `rows`, an iterable of (key, cells)"""
+        self.model.set_rows(rows)
+        self._selection = {key for key in self._selection if key in self.model}
+        self._changed()
+
+    def apply(self, upserts=(), removals=()):
+        """Add or change (key, cells) rows and remove `removals` in one batch"""
+        if self.model.apply(upserts, removals):
+            self._selection = {key for key in self._selection if key in self.model}
+            self._changed()
+
+    def sync(self, rows):
+        """Like set_rows(), but only rows that differ are touched and an unchanged table is not redrawn"""
+        if self.model.sync(rows):
+            self._selection = {key for key in self._selection if key in self.model}
+            self._changed()
+
+    def clear(self, placeholder=None):
+        if placeholder is not None:
+            self.placeholder = placeholder
+        self.set_rows(())
+
+    def sort_by(self, column, reverse=None):
+        self.model.sort_by(column, reverse)
+        self._draw_header()
+        self._changed()
+
+    def set_filter(self, text):
+        self.model.set_filter(text)
+        self._top = 0
+        self._changed()
+
+    def _changed(self):
+        if self._redraw_after is None:
+            self._redraw_after = self.after_idle(self._redraw)
+
+    # tk.Listbox-style access
+
+    def size(self):
+        return len(self.model)
+
+    def get(self, first, last=None):
+        """The line of row `first`, or a list of the lines from `first` to `last` ("end" for the last row)"""
+        view = self.model.view()
+        if last is None:
+            return self.model.line(view[first])
+        last = len(view) - 1 if last == "end" else last
+        return [self.model.line(key) for key in view[first:last + 1]]
+
+    def key(self, index):
+        return self.model.key(index)
+
+    def curselection(self):
+        """Display indices of the selected rows"""
+        return tuple(index for index, key in enumerate(self.model.view()) if key in self._selection)
+
+    def selected_keys(self):
+        """Keys of the selected rows, in display order"""
+        return [key for key in self.model.view() if key in self._selection]
+
+    def selection_set(self, keys):
+        self._selection = {key for key in keys if key in self.model}
+        self._changed()
+
+    def selection_clear(self):
+        self._selection.clear()
+        self._changed()
+
+    # Scrolling
+
+    def _visible_rows(self):
+        return max(1, self.body.winfo_height() // self._row_height)
+
+    def yview(self):
+        total = len(self.model)
+        if not total:
+            return 0.0, 1.0
+        return self._top / total, min(1.0, (self._top + self._visible_rows()) / total)
+
+    def yview_moveto(self, fraction):
+        self._scroll_to(int(fraction * len(self.model)))
+
+    def yview_scroll(self, number, what):
+        step = self._visible_rows() if what == "pages" else 1
+        self._scroll_to(self._top + number * step)
+
+    def see(self, index):
+        if index < self._top:
+            self._scroll_to(index)
+        elif index >= self._top + self._visible_rows():
+            self._scroll_to(index - self._visible_rows() + 1)
+
+    def _scroll_command(self, action, value, what=None):
+        if action == "moveto":
+            self.yview_moveto(float(value))
+        else:
+            self.yview_scroll(int(value), what)
+
+    def _scroll_to(self, top):
+        top = max(0, min(top, len(self.model) - self._visible_rows()))
+        if top != self._top:
+            self._top = top
+            self._redraw()
+            if self.on_scroll:
+                self.on_scroll()
+
+    # Drawing
+
+    def _column_x(self):
+        x, positions = 8, []
+        for column in self.model.columns:
+            width = column.width * self._char
+            positions.append(x + width if column.anchor == "e" else x)
+            x += width + self._char
+        return positions
+
+    def _draw_header(self):
+        self.header.delete("all")
+        for index, (column, x) in enumerate(zip(self.model.columns, self._column_x())):
+            title = column.title
+            if index == self.model.sort_column:
+                title += " ▼" if self.model.sort_reverse else " ▲"
+            self.header.create_text(x, self._row_height // 2, text=title, anchor=column.anchor, font=self._font,
+                                    fill='#00BCD4')
+
+    def _ensure_items(self, count):
+        positions = self._column_x()
+        while len(self._items) < count:
+            y = len(self._items) * self._row_height
+            background = self.body.create_rectangle(0, y, 0, y + self._row_height, width=0, fill="")
+            texts = [self.body.create_text(x, y + self._row_height // 2, anchor=column.anchor, font=self._font,
+                                           fill='#DCE4EE')
+                     for column, x in zip(self.model.columns, positions)]
+            self._items.append((background, texts))
+
+    def _redraw(self):
+        self._redraw_after = None
+        if not self.winfo_exists():
+            return
+        view = self.model.view()
+        visible = self._visible_rows()
+        self._top = max(0, min(self._top, len(view) - visible))
+        # Only rows on screen have canvas items; scrolling re-labels the same slots
+        self._ensure_items(visible + 1)
+        width = self.body.winfo_width()
+        for slot, (background, texts) in enumerate(self._items):
+            index = self._top + slot
+            if slot > visible or index >= len(view):
+                self.body.itemconfigure(background, state="hidden")
+                for item in texts:
+                    self.body.itemconfigure(item, state="hidden")
+                continue
+            key = view[index]
+            y = slot * self._row_height
+            self.body.coords(background, 0, y, width, y + self._row_height)
+            self.body.itemconfigure(background, state="normal",
+                                    fill='#00838F' if key in self._selection else "")
+            for item, column, text in zip(texts, self.model.columns, self.model.texts(key)):
+                self.body.itemconfigure(item, text=_fit(text, column.width), state="normal")
+        self.body.itemconfigure(self._placeholder_item, text="" if view else self.placeholder)
+        self.scrollbar.set(*self.yview())
+
+    # Selection
+
+    def _clicked(self, event, mode):
+        self.body.focus_set()
+        view = self.model.view()
+        index = self._top + event.y // self._row_height
+        if index >= len(view):
+            return
+        key = view[index]
+        if mode == "range" and self.selectmode == "extended" and self._anchor in self._selection:
+            start = self.model.index(self._anchor)
+            if start is not None:
+                low, high = sorted((start, index))
+                self._selection = set(view[low:high + 1])
+        elif mode == "toggle" and self.selectmode == "extended":
+            self._selection ^= {key}
+            self._anchor = key
+        else:
+            self._selection = {key}
+            self._anchor = key
+        self._selected()
+
+    def _step(self, offset):
+        view = self.model.view()
+        if not view:
+            return
+        current = self.model.index(self._anchor) if self._anchor in self._selection else None
+        index = 0 if current is None else max(0, min(current + offset, len(view) - 1))
+        self._selection = {view[index]}
+        self._anchor = view[index]
+        self.see(index)
+        self._selected()
+
+    def _selected(self):
+        self._redraw()
+        if self.on_select:
+            self.on_select(self.selected_keys())
+
+    def _header_clicked(self, event):
+        x = 8
+        for index, column in enumerate(self.model.columns):
+            x += (column.width + 1) * self._char
+            if event.x < x:
+                self.sort_by(index)
+                return
@@ -0,0 +1,62 @@
+import json
+import os
+import uuid
+
+from task_runner import run_process
+from vm_profiles import disk_format
+
+DEFAULT_CLONE_DIR = os.path.join(os.path.expanduser("~"), ".cloud_manager", "clones")
+
+
+class CloneManager:
+    """Create and maintain qcow2 copy-on-write overlays of shared base images.
+
+    A clone only stores the blocks its VM writes, so creating one costs a few
+    KB of I/O; the base image must not be modified while clones depend on it.
+    """
+
+    def __init__(self, clone_dir=DEFAULT_CLONE_DIR):
+        self.clone_dir = clone_dir
+
+    def clone_path(self, base, name=None):
+        stem = os.path.splitext(os.path.basename(base))[0]
+        return os.path.join(self.clone_dir, f"{name or stem}-{uuid.uuid4().hex[:8]}.qcow2")
+
+    def create_clone(self, base, name=None, base_format=None):
+        """Create an overlay backed by `base` and return its path"""
+        base = os.path.abspath(base)
+        if not os.path.exists(base):
+            raise FileNotFoundError(f"Base image does not exist: {base}")
+        os.makedirs(self.clone_dir, exist_ok=True)
+        overlay = self.clone_path(base, name)
+        run_process(["qemu-img", "create", "-q", "-f", "qcow2",
+                     "-b", base, "-F", base_format or disk_format(base), overlay])
+        return overlay
+
+    def is_clone(self, path):
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.clone_dir)
+
+    def backing_file(self, overlay):
+        """Return the image `overlay` is backed by, or None for a standalone image"""
+        info = json.loads(run_process(["qemu-img", "info", "--output=json", overlay]).stdout)
+        return info.get("full-backing-filename") or info.get("backing-filename")
+
+    def list_clones(self):
+        """Paths of all overlays in the clone directory"""
+        if not os.path.isdir(self.clone_dir):
+            return []
+        return sorted(os.path.join(self.clone_dir, name) for name in os.listdir(self.clone_dir)
+                      if name.endswith(".qcow2"))
+
+    def flatten(self, overlay):
+        """Copy everything the overlay still reads from its base into it, making it standalone"""
+        run_process(["qemu-img", "rebase", "-f", "qcow2", "-b", "", overlay])
+
+    def commit(self, overlay):
+        """Write the overlay's changes back into its base image (affects every clone of that base)"""
+        run_process(["qemu-img", "commit", "-f", "qcow2", overlay])
+
+    def delete(self, overlay):
+        if not self.is_clone(overlay):
+            raise ValueError(f"{overlay} is not in the clone directory")
+        os.remove(overlay)
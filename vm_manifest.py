@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from task_runner import TaskCancelled, current_token, run_process
+from vm_profiles import PROFILES
+
+try:
+    import yaml
+except ImportError:  # YAML manifests need PyYAML; JSON always works
+    yaml = None
+
+DEFAULT_SEED_DIR = os.path.join(os.path.expanduser("~"), ".cloud_manager", "seeds")
+
+# One VM of a manifest. network is "user", "none", "bridge:<bridge>" or "tap:<ifname>";
+# user_data is cloud-init user-data text (None boots without a seed ISO);
+# ssh_port forwards a host port to the guest's port 22 and makes readiness wait for sshd.
+VMSpec = namedtuple("VMSpec", "name vcpus memory image network user_data ssh_port profile")
+
+# Outcome of provisioning one VM; seconds is its time to ready since the batch started
+ProvisionResult = namedtuple("ProvisionResult", "name ok vm_id disk seconds error")
+
+_FIELDS = {"name", "vcpus", "memory", "image", "network", "user_data", "user_data_file", "ssh_port", "profile",
+           "count"}
+
+# ISO authoring tools and how they write a NoCloud seed (volume label "cidata")
+_ISO_TOOLS = [
+    ("cloud-localds", lambda iso, user_data, meta_data: ["cloud-localds", iso, user_data, meta_data]),
+    ("genisoimage", lambda iso, user_data, meta_data: ["genisoimage", "-quiet", "-output", iso, "-volid", "cidata",
+                                                       "-joliet", "-rock", user_data, meta_data]),
+    ("mkisofs", lambda iso, user_data, meta_data: ["mkisofs", "-quiet", "-output", iso, "-volid", "cidata",
+                                                   "-joliet", "-rock", user_data, meta_data]),
+    ("xorriso", lambda iso, user_data, meta_data: ["xorriso", "-as", "mkisofs", "-quiet", "-output", iso,
+                                                   "-volid", "cidata", "-joliet", "-rock", user_data, meta_data]),
+]
+
+
+def load_manifest(path):
+    """Read a JSON or YAML (.yaml/.yml) manifest into a list of VMSpecs"""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise ValueError("YAML manifests need PyYAML (pip install pyyaml); use JSON instead")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    return parse_manifest(data, os.path.dirname(os.path.abspath(path)))
+
+
+def parse_manifest(data, base_dir="."):
+    """Validate a manifest and expand it into VMSpecs.
+
+    The manifest is a list of VMs or {"defaults": {...}, "vms": [...]}. An entry with
+    "count": N stands for N VMs named <name>-1 .. <name>-N. Relative image and
+    user_data_file paths are resolved against `base_dir`.
+    """
+    if isinstance(data, dict):
+        defaults, entries = data.get("defaults") or {}, data.get("vms")
+    else:
+        defaults, entries = {}, data
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("Manifest must list at least one VM under \"vms\"")
+
+    specs = []
+    for index, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"VM #{index} must be a mapping")
+        entry = dict(defaults, **entry)
+        unknown = set(entry) - _FIELDS
+        if unknown:
+            raise ValueError(f"VM #{index} has unknown fields: {', '.join(sorted(unknown))}")
+        name = str(entry.get("name") or "")
+        if not name or not name.replace("-", "").replace("_", "").isalnum():
+            raise ValueError(f"VM #{index} needs a name of letters, digits, '-' and '_'")
+        if not entry.get("image"):
+            raise ValueError(f"VM {name} has no base image")
+        try:
+            vcpus, memory = int(entry.get("vcpus", 1)), int(entry.get("memory", 1024))
+            count = int(entry.get("count", 1))
+            ssh_port = int(entry["ssh_port"]) if entry.get("ssh_port") else None
+        except (TypeError, ValueError):
+            raise ValueError(f"VM {name}: vcpus, memory, count and ssh_port must be numbers")
+        if vcpus < 1 or memory < 64 or count < 1:
+            raise ValueError(f"VM {name} needs at least 1 vCPU, 64 MB of memory and a count of 1")
+        if entry.get("profile") and entry["profile"] not in PROFILES:
+            raise ValueError(f"VM {name} has unknown profile {entry['profile']}: choose {', '.join(PROFILES)}")
+
+        user_data = entry.get("user_data")
+        if entry.get("user_data_file"):
+            with open(os.path.join(base_dir, entry["user_data_file"])) as f:
+                user_data = f.read()
+        image = os.path.join(base_dir, os.path.expanduser(entry["image"]))
+        network = entry.get("network", "user")
+        for number in range(1, count + 1):
+            specs.append(VMSpec(name if count == 1 else f"{name}-{number}", vcpus, memory, image, network,
+                                user_data, ssh_port + number - 1 if ssh_port and count > 1 else ssh_port,
+                                entry.get("profile")))
+
+    names = [spec.name for spec in specs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate VM names: {', '.join(duplicates)}")
+    ports = [spec.ssh_port for spec in specs if spec.ssh_port]
+    if len(ports) != len(set(ports)):
+        raise ValueError("Two VMs forward the same ssh_port")
+    return specs
+
+
+def make_seed_iso(spec, seed_dir=DEFAULT_SEED_DIR):
+    """Write a cloud-init NoCloud seed ISO for `spec` and return its path"""
+    tool = next(((name, command) for name, command in _ISO_TOOLS if shutil.which(name)), None)
+    if tool is None:
+        raise FileNotFoundError(2, "No ISO tool found (cloud-localds, genisoimage, mkisofs or xorriso)", "genisoimage")
+    os.makedirs(seed_dir, exist_ok=True)
+    iso = os.path.join(seed_dir, f"{spec.name}-seed.iso")
+    with tempfile.TemporaryDirectory() as workdir:
+        # The ISO tools name files after their paths, so they must be called exactly this
+        user_data, meta_data = os.path.join(workdir, "user-data"), os.path.join(workdir, "meta-data")
+        with open(user_data, "w") as f:
+            f.write(spec.user_data)
+        with open(meta_data, "w") as f:
+            f.write(f"instance-id: {spec.name}-{int(time.time())}\nlocal-hostname: {spec.name}\n")
+        run_process(tool[1](iso, user_data, meta_data))
+    return iso
+
+
+def seed_args(iso):
+    return ["-drive", f"file={iso},format=raw,media=cdrom,readonly=on"]
+
+
+def ssh_banner(port, timeout=2.0):
+    """True once something on localhost:`port` greets like an SSH server"""
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout) as sock:
+            return sock.recv(4).startswith(b"SSH-")
+    except OSError:
+        return False
+
+
+class ProvisionReport:
+    """Per-VM results and the wall time until the last VM was ready"""
+
+    def __init__(self, results, seconds):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def failed(self):
+        return [result for result in self.results if not result.ok]
+
+    @property
+    def ready(self):
+        return [result for result in self.results if result.ok]
+
+
+class BatchProvisioner:
+    """Stand up every VM of a manifest: overlays and seed ISOs in parallel, then bounded launches.
+
+    `launch(spec, disk, seed_iso)` starts one VM (from a worker thread) and returns its
+    vm_id once QMP is being connected. At most `concurrency` VMs boot at the same time;
+    a VM stops counting once it is ready: running per QMP and, with an ssh_port,
+    answering with an SSH banner. `on_update(name, state, result)` is called from worker
+    threads with "preparing", "waiting", "booting", "ready" and "failed".
+    """
+
+    def __init__(self, clone_manager, qmp, launch, concurrency=4, seed_dir=DEFAULT_SEED_DIR, ready_timeout=300,
+                 prepare_workers=8):
+        self.clone_manager = clone_manager
+        self.qmp = qmp
+        self.launch = launch
+        self.concurrency = max(1, concurrency)
+        self.seed_dir = seed_dir
+        self.ready_timeout = ready_timeout
+        self.prepare_workers = prepare_workers
+
+    def run(self, specs, on_update=None):
+        on_update = on_update or (lambda name, state, result: None)
+        token = current_token()
+        started = time.monotonic()
+        booting = threading.Semaphore(self.concurrency)
+
+        # Preparing is disk I/O and qemu-img calls, so it runs wider than the boot limit
+        workers = min(len(specs), max(self.concurrency, self.prepare_workers)) or 1
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="provision") as pool:
+            futures = [pool.submit(self._provision, spec, token, booting, started, on_update) for spec in specs]
+            results = [future.result() for future in futures]
+
+        token.raise_if_cancelled()
+        return ProvisionReport(results, time.monotonic() - started)
+
+    def _provision(self, spec, token, booting, started, on_update):
+        disk = vm_id = None
+        try:
+            token.raise_if_cancelled()
+            on_update(spec.name, "preparing", None)
+            disk = self.clone_manager.create_clone(spec.image, spec.name)
+            seed = make_seed_iso(spec, self.seed_dir) if spec.user_data else None
+
+            on_update(spec.name, "waiting", None)
+            while not booting.acquire(timeout=0.2):
+                token.raise_if_cancelled()
+            try:
+                token.raise_if_cancelled()
+                on_update(spec.name, "booting", None)
+                vm_id = self.launch(spec, disk, seed)
+                self._wait_ready(spec, vm_id, token)
+            finally:
+                booting.release()
+        except Exception as e:
+            error = "cancelled" if isinstance(e, TaskCancelled) else str(e)
+            if vm_id is None and disk is not None and os.path.exists(disk):
+                # Nothing runs on the overlay yet, so it is just clutter
+                os.remove(disk)
+            result = ProvisionResult(spec.name, False, vm_id, disk, time.monotonic() - started, error)
+            on_update(spec.name, "failed", result)
+            return result
+
+        result = ProvisionResult(spec.name, True, vm_id, disk, time.monotonic() - started, None)
+        on_update(spec.name, "ready", result)
+        return result
+
+    def _wait_ready(self, spec, vm_id, token):
+        deadline = time.monotonic() + self.ready_timeout
+        running = False
+        while time.monotonic() < deadline:
+            if not running:
+                try:
+                    running = self.qmp.status(vm_id, timeout=2) == "running"
+                except Exception:
+                    pass  # QMP socket not up yet
+            if running and (spec.ssh_port is None or ssh_banner(spec.ssh_port)):
+                return
+            if token.wait(0.5):
+                token.raise_if_cancelled()
+        raise TimeoutError(f"{spec.name} was not ready after {self.ready_timeout}s")
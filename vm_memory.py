@@ -0,0 +1,191 @@
+import os
+import threading
+
+import psutil
+
+from task_runner import current_token
+from vm_scheduler import command_resources
+
+HUGEPAGE_DIR = "/sys/kernel/mm/hugepages"
+KSM_DIR = "/sys/kernel/mm/ksm"
+MB = 2 ** 20
+
+
+def hugetlbfs_mount(mounts_file="/proc/mounts"):
+    """Mount point of a hugetlbfs filesystem, or None"""
+    try:
+        with open(mounts_file) as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == "hugetlbfs":
+                    return fields[1]
+    except OSError:
+        pass
+    return None
+
+
+def free_hugepages_mb(hugepage_dir=HUGEPAGE_DIR):
+    """Free memory in the default (2 MB) hugepage pool, in MB"""
+    try:
+        with open(os.path.join(hugepage_dir, "hugepages-2048kB", "free_hugepages")) as f:
+            return int(f.read()) * 2
+    except (OSError, ValueError):
+        return 0
+
+
+def ksm_running(ksm_dir=KSM_DIR):
+    try:
+        with open(os.path.join(ksm_dir, "run")) as f:
+            return f.read().strip() == "1"
+    except OSError:
+        return False
+
+
+def enable_ksm(ksm_dir=KSM_DIR):
+    """Start the kernel's same-page merging daemon; needs root. Returns whether KSM is running"""
+    if ksm_running(ksm_dir):
+        return True
+    try:
+        with open(os.path.join(ksm_dir, "run"), "w") as f:
+            f.write("1")
+    except OSError:
+        return False
+    return ksm_running(ksm_dir)
+
+
+def ksm_merged_bytes(pid):
+    """Memory of one process deduplicated by KSM (Linux 6.1+), or None if unknown"""
+    try:
+        with open(f"/proc/{pid}/ksm_merging_pages") as f:
+            return int(f.read()) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def memory_pressure(pressure_file="/proc/pressure/memory"):
+    """PSI "some avg10": % of the last 10s some task stalled on memory, or None without PSI"""
+    try:
+        with open(pressure_file) as f:
+            for line in f:
+                if line.startswith("some"):
+                    return float(line.split("avg10=")[1].split()[0])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def memory_args(memory, node=None, hugepages=False, merge=True, balloon=False):
+    """Return (qemu flags, notes) for how guest RAM of `memory` MB is backed.
+
+    Hugepages fall back to normal pages when no hugetlbfs mount has enough free pages;
+    KSM cannot merge hugepages, so `merge` only applies to normal pages.
+    """
+    args, notes = [], []
+    backend = None
+    if hugepages:
+        mount = hugetlbfs_mount()
+        if mount is None:
+            notes.append("No hugetlbfs mount found: using normal pages.")
+        elif free_hugepages_mb() < memory:
+            notes.append(f"Only {free_hugepages_mb()} MB of free hugepages: using normal pages.")
+        else:
+            backend = f"memory-backend-file,id=mem0,size={memory}M,mem-path={mount},prealloc=on"
+    if backend is None and node is not None:
+        backend = f"memory-backend-ram,id=mem0,size={memory}M,merge={'on' if merge else 'off'}"
+    if backend is not None and node is not None:
+        backend += f",host-nodes={node},policy=bind"
+
+    if backend is not None:
+        args += ["-object", backend]
+        args += ["-numa", "node,memdev=mem0"] if node is not None else ["-machine", "memory-backend=mem0"]
+    elif not merge:
+        args += ["-machine", "mem-merge=off"]
+    elif not ksm_running():
+        notes.append("KSM is not running on this host: identical guest pages will not be merged.")
+
+    if balloon:
+        # Free page reporting hands memory the guest frees back to the host without waiting for the policy
+        args += ["-device", "virtio-balloon-pci,id=balloon0,deflate-on-oom=on,free-page-reporting=on"]
+    return args, notes
+
+
+def has_balloon(cmdline):
+    return any("virtio-balloon" in arg for arg in cmdline)
+
+
+class BalloonController:
+    """Inflates VM balloons while the host is short of memory and deflates them when it recovers.
+
+    Every `interval` seconds all ballooned VMs move `step` of their configured memory
+    towards `floor` x memory when available host memory drops below `low` (or PSI shows
+    stalls), and back towards their full size once it is above `high`.
+    """
+
+    def __init__(self, registry, qmp, interval=5.0, low=0.10, high=0.25, step=0.1, floor=0.5, stall=10.0):
+        self.registry = registry
+        self.qmp = qmp
+        self.interval = interval
+        self.low = low
+        self.high = high
+        self.step_size = step
+        self.floor = floor
+        self.stall = stall
+        self._lock = threading.Lock()
+        self._actual = {}
+        self._maximum = {}
+
+    def reclaimed(self, vm_id):
+        """Bytes the balloon currently holds back from the VM"""
+        with self._lock:
+            if vm_id not in self._actual:
+                return 0
+            return max(0, self._maximum[vm_id] - self._actual[vm_id])
+
+    def forget(self, vm_id):
+        with self._lock:
+            self._actual.pop(vm_id, None)
+            self._maximum.pop(vm_id, None)
+
+    def run(self):
+        token = current_token()
+        while not token.cancelled:
+            try:
+                self.step()
+            except Exception:
+                pass  # A VM going away mid-step is retried next round
+            token.wait(self.interval)
+
+    def step(self, available=None, pressure=None):
+        """Run the policy once; returns {vm_id: new balloon target} for VMs that were resized"""
+        connected = set(self.qmp.connected())
+        vms = [vm for vm in self.registry.running() if vm.vm_id in connected and has_balloon(vm.cmdline)]
+        if not vms:
+            return {}
+        if available is None:
+            memory = psutil.virtual_memory()
+            available = memory.available / memory.total
+        if pressure is None:
+            pressure = memory_pressure()
+
+        if available < self.low or (pressure is not None and pressure >= self.stall):
+            direction = -1
+        elif available > self.high and (pressure is None or pressure < 1.0):
+            direction = 1
+        else:
+            direction = 0
+
+        balloons = self.qmp.query_all("query-balloon")
+        targets = {}
+        for vm in vms:
+            info = balloons.get(vm.vm_id)
+            if not isinstance(info, dict):
+                continue
+            maximum = command_resources(vm.cmdline)[1] * MB
+            actual = info["actual"]
+            with self._lock:
+                self._actual[vm.vm_id], self._maximum[vm.vm_id] = actual, maximum
+            target = min(maximum, max(int(maximum * self.floor), actual + direction * int(maximum * self.step_size)))
+            if direction and target != actual:
+                self.qmp.execute(vm.vm_id, "balloon", {"value": target})
+                targets[vm.vm_id] = target
+        return targets
@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from array import array
+
+import psutil
+
+from task_runner import current_token
+
+# Per-VM metrics: CPU % (of one core), resident memory in bytes, and I/O rates in bytes/s
+METRICS = ("cpu", "rss", "disk_read", "disk_write", "net_rx", "net_tx")
+
+NET_DIR = "/sys/class/net"
+
+
+def tap_interfaces(pid, cmdline=()):
+    """Host tap interfaces of a QEMU process: tap ifname= options plus tun fds such as the bridge helper's"""
+    names = []
+    for flag, value in zip(cmdline, cmdline[1:]):
+        if flag in ("-netdev", "-net", "-nic") and value.split(",")[0] == "tap":
+            names += [option[len("ifname="):] for option in value.split(",") if option.startswith("ifname=")]
+    fdinfo = f"/proc/{pid}/fdinfo"
+    try:
+        fds = os.listdir(fdinfo)
+    except OSError:
+        fds = []
+    for fd in fds:
+        try:
+            with open(os.path.join(fdinfo, fd)) as f:
+                names += [line.split()[1] for line in f if line.startswith("iff:")]
+        except (OSError, IndexError):
+            continue
+    return list(dict.fromkeys(names))
+
+
+def interface_bytes(names, net_dir=NET_DIR):
+    """(guest received, guest sent) bytes over host tap interfaces; the host's tx is the guest's rx"""
+    received = sent = 0
+    for name in names:
+        statistics = os.path.join(net_dir, name, "statistics")
+        try:
+            with open(os.path.join(statistics, "tx_bytes")) as f:
+                received += int(f.read())
+            with open(os.path.join(statistics, "rx_bytes")) as f:
+                sent += int(f.read())
+        except (OSError, ValueError):
+            continue
+    return received, sent
+
+
+class TimeSeries:
+    """Fixed-size ring of (timestamp, value) samples kept in two array('d') buffers"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self):
+        return self._values[self._next - 1] if self._count else None
+
+    def samples(self, since=None):
+        """(timestamp, value) pairs, oldest first, optionally only those at or after `since`"""
+        times, values = self._ordered(self._times), self._ordered(self._values)
+        pairs = zip(times, values)
+        return [pair for pair in pairs if pair[0] >= since] if since is not None else list(pairs)
+
+    def downsample(self, points, since=None):
+        """At most `points` samples, each the average of a run of consecutive samples"""
+        samples = self.samples(since)
+        if len(samples) <= points:
+            return samples
+        step = len(samples) / points
+        result = []
+        for i in range(points):
+            bucket = samples[int(i * step):int((i + 1) * step)]
+            result.append((bucket[-1][0], sum(value for _, value in bucket) / len(bucket)))
+        return result
+
+    def _ordered(self, buffer):
+        start = self._next - self._count
+        if start >= 0:
+            return buffer[start:self._next]
+        return buffer[start:] + buffer[:self._next]
+
+
+class MetricHistory:
+    """Recent samples at full resolution plus an averaged rollup covering a longer period"""
+
+    def __init__(self, capacity=300, rollup=10, rollup_capacity=360):
+        self.recent = TimeSeries(capacity)
+        self.history = TimeSeries(rollup_capacity)
+        self.rollup = rollup
+        self._sum = 0.0
+        self._pending = 0
+
+    def append(self, timestamp, value):
+        self.recent.append(timestamp, value)
+        self._sum += value
+        self._pending += 1
+        if self._pending == self.rollup:
+            self.history.append(timestamp, self._sum / self.rollup)
+            self._sum, self._pending = 0.0, 0
+
+    def latest(self):
+        return self.recent.latest()
+
+    def series(self, seconds=None, points=None):
+        """Samples from the last `seconds`, from the rollup when they predate the recent buffer"""
+        recent = self.recent.samples()
+        since = recent[-1][0] - seconds if recent and seconds else None
+        source = self.recent
+        if since is not None and len(self.history) and recent[0][0] > since:
+            source = self.history
+        return source.downsample(points, since) if points else source.samples(since)
+
+
+class ResourceMonitor:
+    """Samples CPU, memory, disk and network of every registered VM into ring buffers.
+
+    One pass reads each QEMU process once through psutil's oneshot() and sends a
+    single query-blockstats fan-out over QMP; guest disk counters from QMP are
+    preferred over the host process counters when the VM has a QMP connection.
+    Network I/O is read from the host tap interfaces of tap and bridge networks;
+    user-mode networking has no host interface, so those VMs report none.
+    """
+
+    def __init__(self, registry, qmp=None, interval=2.0, capacity=300, rollup=10, on_sample=None):
+        self.registry = registry
+        self.qmp = qmp
+        self.interval = interval
+        self.capacity = capacity
+        self.rollup = rollup
+        self.on_sample = on_sample
+        self._lock = threading.Lock()
+        self._processes = {}
+        self._interfaces = {}
+        self._last = {}
+        self._history = {}
+
+    def history(self, vm_id, metric):
+        with self._lock:
+            return self._history.get(vm_id, {}).get(metric)
+
+    def latest(self, vm_id):
+        with self._lock:
+            metrics = self._history.get(vm_id, {})
+            return {metric: series.latest() for metric, series in metrics.items()}
+
+    def forget(self, vm_id):
+        with self._lock:
+            self._history.pop(vm_id, None)
+            self._processes.pop(vm_id, None)
+            self._interfaces.pop(vm_id, None)
+            self._last.pop(vm_id, None)
+
+    def run(self):
+        """Sample every `interval` seconds until the current task is cancelled"""
+        token = current_token()
+        while not token.cancelled:
+            started = time.monotonic()
+            sampled = self.sample(started)
+            if self.on_sample:
+                self.on_sample(sampled)
+            token.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def sample(self, now=None):
+        """Take one sample of every running VM; returns the ids that got new data"""
+        now = time.monotonic() if now is None else now
+        vms = self.registry.running()
+        blockstats = {}
+        if self.qmp is not None and self.qmp.connected():
+            try:
+                blockstats = self.qmp.query_all("query-blockstats")
+            except Exception:
+                blockstats = {}
+
+        sampled = []
+        for vm in vms:
+            counters = self._read_process(vm)
+            if counters is None:
+                continue
+            cpu, rss, disk_read, disk_write, net_rx, net_tx = counters
+            blocks = blockstats.get(vm.vm_id)
+            if isinstance(blocks, list):
+                disk_read = sum(block.get("stats", {}).get("rd_bytes", 0) for block in blocks)
+                disk_write = sum(block.get("stats", {}).get("wr_bytes", 0) for block in blocks)
+
+            totals = (disk_read, disk_write, net_rx, net_tx)
+            with self._lock:
+                # forget() runs on the Tk thread when a VM exits
+                previous = self._last.get(vm.vm_id)
+                self._last[vm.vm_id] = (now, totals)
+            if previous is None:
+                continue  # First sample only sets the baseline for rates and CPU %
+            elapsed = max(now - previous[0], 1e-6)
+            rates = [max(0.0, (current - last) / elapsed) for current, last in zip(totals, previous[1])]
+            self._record(vm.vm_id, now, [cpu, rss] + rates)
+            sampled.append(vm.vm_id)
+
+        live = {vm.vm_id for vm in vms}
+        with self._lock:
+            gone = [vm_id for vm_id in self._last if vm_id not in live]
+        for vm_id in gone:
+            self.forget(vm_id)
+        return sampled
+
+    def _record(self, vm_id, now, values):
+        with self._lock:
+            metrics = self._history.get(vm_id)
+            if metrics is None:
+                metrics = self._history[vm_id] = {metric: MetricHistory(self.capacity, self.rollup)
+                                                  for metric in METRICS}
+            for metric, value in zip(METRICS, values):
+                metrics[metric].append(now, value)
+
+    def _read_process(self, vm):
+        """(cpu %, rss, disk read, disk written, network received, network sent) of the QEMU process"""
+        if not isinstance(vm.pid, int):
+            return None
+        process = self._processes.get(vm.vm_id)
+        try:
+            if process is None or process.pid != vm.pid:
+                process = self._processes[vm.vm_id] = psutil.Process(vm.pid)
+                # The taps are opened before the guest boots, so they are looked up once per process
+                self._interfaces[vm.vm_id] = tap_interfaces(vm.pid, vm.cmdline)
+            with process.oneshot():
+                cpu = process.cpu_percent(None)
+                rss = process.memory_info().rss
+                try:
+                    io = process.io_counters()
+                except (psutil.AccessDenied, AttributeError):
+                    io = None
+        except psutil.Error:
+            self._processes.pop(vm.vm_id, None)
+            return None
+        received, sent = interface_bytes(self._interfaces.get(vm.vm_id, ()))
+        if io is None:
+            return cpu, rss, 0, 0, received, sent
+        return cpu, rss, io.read_bytes, io.write_bytes, received, sent
@@ -0,0 +1,139 @@
+import os
+import platform
+from collections import OrderedDict, namedtuple
+
+from disk_images import detect_format
+
+QEMU_BINARY = "qemu-system-x86_64"
+
+# Host address port forwards listen on; loopback keeps guest services (sshd) off the network
+FORWARD_ADDRESS = "127.0.0.1"
+
+# What the host can accelerate; detected once per process
+HostCapabilities = namedtuple("HostCapabilities", "kvm io_uring cpu_count")
+
+# A VM performance profile.
+# accel: use KVM + host CPU model when /dev/kvm is usable
+# virtio: virtio-blk/virtio-net devices instead of emulated IDE/e1000
+# iothread: give the disk its own I/O thread; queues: virtio-blk queues ("vcpus" = one per vCPU)
+# cache/aio: host page cache and async I/O engine for the disk ("io_uring" falls back to "native")
+VMProfile = namedtuple("VMProfile", "name description accel virtio iothread queues cache aio")
+
+PROFILES = OrderedDict((profile.name, profile) for profile in [
+    VMProfile("Max throughput", "KVM, virtio with one queue per vCPU on a dedicated iothread",
+              accel=True, virtio=True, iothread=True, queues="vcpus", cache="none", aio="io_uring"),
+    VMProfile("Low latency", "KVM, virtio on a dedicated iothread, single queue, native AIO",
+              accel=True, virtio=True, iothread=True, queues=1, cache="none", aio="native"),
+    VMProfile("Dense", "KVM, virtio without extra threads to pack many VMs per host",
+              accel=True, virtio=True, iothread=False, queues=1, cache="none", aio="native"),
+    VMProfile("Compatibility", "Plain emulation with IDE disk and legacy NIC, works everywhere",
+              accel=False, virtio=False, iothread=False, queues=1, cache=None, aio=None),
+])
+
+DEFAULT_PROFILE = "Max throughput"
+
+_host = None
+
+
+def kvm_available():
+    """True if /dev/kvm exists and this user may open it"""
+    return os.path.exists("/dev/kvm") and os.access("/dev/kvm", os.R_OK | os.W_OK)
+
+
+def io_uring_available():
+    """io_uring needs Linux 5.1+ and must not be disabled by sysctl"""
+    if platform.system() != "Linux":
+        return False
+    try:
+        major, minor = (int(part) for part in platform.release().split(".")[:2])
+    except ValueError:
+        return False
+    if (major, minor) < (5, 1):
+        return False
+    try:
+        with open("/proc/sys/kernel/io_uring_disabled") as f:
+            return f.read().strip() == "0"
+    except OSError:
+        return True
+
+
+def detect_host(refresh=False):
+    global _host
+    if _host is None or refresh:
+        _host = HostCapabilities(kvm_available(), io_uring_available(), os.cpu_count() or 1)
+    return _host
+
+
+def disk_format(disk):
+    """Format from the image header, or from the extension when the file cannot be read"""
+    return detect_format(disk) or ("qcow2" if disk.endswith(".qcow2") else "raw")
+
+
+def netdev_backend(network="user", forwards=(), listen=FORWARD_ADDRESS):
+    """QEMU network backend options for "user", "bridge:<bridge>" or "tap:<ifname>".
+
+    `forwards` are (host port, guest port) TCP forwards, only possible on user networking;
+    they listen on `listen` ("" for every host address).
+    """
+    kind, _, device = network.partition(":")
+    if kind == "user":
+        return "user" + "".join(f",hostfwd=tcp:{listen}:{host}-:{guest}" for host, guest in forwards)
+    if forwards:
+        raise ValueError(f"Port forwards need user networking, not {network}")
+    if kind == "bridge":
+        return f"bridge,br={device or 'br0'}"
+    if kind == "tap" and device:
+        return f"tap,ifname={device},script=no,downscript=no"
+    raise ValueError(f"Unknown network: {network}")
+
+
+def build_qemu_command(profile, cpus, memory, disk, fmt=None, host=None, network="user", forwards=(),
+                       listen=FORWARD_ADDRESS):
+    """Return (qemu argv, notes) for launching a VM with `profile`.
+
+    Notes explain every fallback taken because the host lacks a feature.
+    `network` is "none" or a netdev_backend() network, `listen` the forwards' host address.
+    """
+    if isinstance(profile, str):
+        profile = PROFILES[profile]
+    host = host or detect_host()
+    fmt = fmt or disk_format(disk)
+    notes = []
+
+    cmd = [QEMU_BINARY, "-smp", str(cpus), "-m", str(memory)]
+
+    if profile.accel and host.kvm:
+        cmd += ["-machine", "q35,accel=kvm", "-enable-kvm", "-cpu", "host"]
+    elif profile.accel:
+        cmd += ["-machine", "q35,accel=tcg", "-cpu", "max"]
+        notes.append("/dev/kvm is not available: falling back to TCG emulation (slow).")
+
+    if not profile.virtio:
+        cmd += ["-drive", f"file={disk},format={fmt}", "-vga", "virtio"]
+        cmd += ["-net", "none"] if network == "none" else ["-net", "nic", "-net", netdev_backend(network, forwards, listen)]
+        return cmd, notes
+
+    # Disk: virtio-blk with explicit cache/aio settings
+    aio = profile.aio
+    if aio == "io_uring" and not host.io_uring:
+        aio = "native"
+        notes.append("io_uring is not available: using aio=native.")
+    drive = f"file={disk},format={fmt},if=none,id=disk0,cache={profile.cache},aio={aio},discard=unmap"
+    device = "virtio-blk-pci,drive=disk0"
+    if profile.iothread:
+        cmd += ["-object", "iothread,id=iothread0"]
+        device += ",iothread=iothread0"
+    queues = min(cpus, host.cpu_count) if profile.queues == "vcpus" else profile.queues
+    if queues > 1:
+        device += f",num-queues={queues}"
+    cmd += ["-drive", drive, "-device", device]
+
+    # Network: virtio-net on the user-mode backend (multiqueue would need a tap backend)
+    if network == "none":
+        cmd += ["-nic", "none"]
+    else:
+        backend, _, options = netdev_backend(network, forwards, listen).partition(",")
+        cmd += ["-netdev", ",".join([backend, "id=net0"] + ([options] if options else [])),
+                "-device", "virtio-net-pci,netdev=net0"]
+    cmd += ["-vga", "virtio"]
+    return cmd, notes
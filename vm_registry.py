@@ -0,0 +1,252 @@
+import os
+import select
+import threading
+import time
+import uuid
+
+import psutil
+
+from qmp import parse_qmp_socket
+
+# /proc/<pid>/comm is truncated to 15 characters ("qemu-system-x86")
+QEMU_COMM_PREFIX = "qemu-system"
+
+
+class VMRecord:
+    """A VM launched (or adopted) by this application"""
+
+    def __init__(self, vm_id, name, disk, pid, process=None, cmdline=None, ports=(), qmp_path=None):
+        self.vm_id = vm_id
+        self.name = name
+        self.disk = disk
+        self.pid = pid
+        self.process = process
+        self.cmdline = cmdline or []
+        self.ports = list(ports)
+        self.qmp_path = qmp_path
+        self.pidfd = None
+        self.started = time.time()
+        self.ended = None
+        self.exit_code = None
+
+    @property
+    def adopted(self):
+        """True for VMs found running at startup rather than launched by us"""
+        return self.process is None
+
+    @property
+    def running(self):
+        return self.ended is None
+
+    def __repr__(self):
+        return f"VMRecord({self.vm_id}, {self.name}, pid={self.pid})"
+
+
+def new_vm_id():
+    return uuid.uuid4().hex[:8]
+
+
+def parse_vm_cmdline(cmdline):
+    """Return (name, disk) from a QEMU command line"""
+    name = disk = None
+    for flag, value in zip(cmdline, cmdline[1:]):
+        if flag == "-name" and name is None:
+            name = value.split(",")[0]
+            if name.startswith("guest="):
+                name = name[len("guest="):]
+        elif flag == "-drive" and disk is None:
+            for option in value.split(","):
+                if option.startswith("file="):
+                    disk = option[len("file="):]
+    return name, disk
+
+
+def scan_qemu_processes(proc_root="/proc"):
+    """Yield (pid, cmdline) of running QEMU processes.
+
+    Only /proc/<pid>/comm is read for every process; cmdline is read for QEMU ones alone.
+    """
+    try:
+        entries = os.listdir(proc_root)
+    except OSError:
+        # No procfs (e.g. macOS): fall back to psutil, still filtering on the name first
+        for proc in psutil.process_iter(attrs=["name"]):
+            if (proc.info["name"] or "").startswith(QEMU_COMM_PREFIX):
+                try:
+                    yield proc.pid, proc.cmdline()
+                except psutil.Error:
+                    continue
+        return
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_root, entry, "comm")) as f:
+                if not f.read().startswith(QEMU_COMM_PREFIX):
+                    continue
+            with open(os.path.join(proc_root, entry, "cmdline"), "rb") as f:
+                cmdline = [arg.decode(errors="replace") for arg in f.read().split(b"\0") if arg]
+        except OSError:
+            continue  # Process exited while we were looking
+        yield int(entry), cmdline
+
+
+class VMRegistry:
+    """Tracks VMs by process handle and notices their exit without scanning the host.
+
+    Each VM gets a pidfd (Linux 5.3+) that one watcher thread polls; where pidfds
+    are unavailable the watcher checks the tracked PIDs every `poll_interval` seconds.
+    `on_exit(record)` is called from the watcher thread, which is started on the first
+    registration with `spawn(func)` (a daemon thread by default).
+    """
+
+    def __init__(self, on_exit=None, poll_interval=1.0, spawn=None):
+        self.on_exit = on_exit
+        self.poll_interval = poll_interval
+        self.spawn = spawn or (lambda func: threading.Thread(target=func, name="vm-registry", daemon=True).start())
+        self._records = {}
+        self._lock = threading.Lock()
+        self._wake = None
+        self._closed = False
+
+    def register(self, process, name, disk, cmdline, ports=(), vm_id=None):
+        """Track a VM we just launched with subprocess.Popen"""
+        record = VMRecord(vm_id or new_vm_id(), name, disk, process.pid, process, cmdline, ports,
+                          parse_qmp_socket(cmdline))
+        return self._add(record)
+
+    def adopt(self, pid, cmdline):
+        """Track a QEMU process that was already running"""
+        name, disk = parse_vm_cmdline(cmdline)
+        record = VMRecord(new_vm_id(), name or f"qemu-{pid}", disk, pid, None, cmdline,
+                          qmp_path=parse_qmp_socket(cmdline))
+        return self._add(record)
+
+    def reconcile(self, processes=None, proc_root="/proc"):
+        """Adopt QEMU processes we are not tracking yet; run once at startup.
+
+        `processes` is a list of (pid, cmdline), scanned from `proc_root` when omitted.
+        """
+        if processes is None:
+            processes = list(scan_qemu_processes(proc_root))
+        with self._lock:
+            known = {record.pid for record in self._records.values() if record.running}
+        return [self.adopt(pid, cmdline) for pid, cmdline in processes if pid not in known]
+
+    def get(self, vm_id):
+        with self._lock:
+            return self._records.get(vm_id)
+
+    def running(self):
+        with self._lock:
+            return [record for record in self._records.values() if record.running]
+
+    def records(self):
+        with self._lock:
+            return list(self._records.values())
+
+    def forget(self, vm_id):
+        with self._lock:
+            record = self._records.pop(vm_id, None)
+        if record is not None:
+            self._close_pidfd(record)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake_watcher()
+        for record in self.records():
+            self._close_pidfd(record)
+
+    # Exit detection
+
+    def _add(self, record):
+        try:
+            record.pidfd = os.pidfd_open(record.pid)
+        except (AttributeError, OSError, TypeError):
+            record.pidfd = None  # Old kernel/Python, or the process is already gone
+        with self._lock:
+            self._records[record.vm_id] = record
+            start = self._wake is None
+            if start:
+                self._wake = os.pipe()
+        if start:
+            self.spawn(self._watch)
+        else:
+            self._wake_watcher()
+        return record
+
+    def _wake_watcher(self):
+        if self._wake is not None:
+            try:
+                os.write(self._wake[1], b"x")
+            except OSError:
+                pass
+
+    def _alive(self, record):
+        if record.process is not None:
+            return record.process.poll() is None
+        return psutil.pid_exists(record.pid)
+
+    def _mark_exited(self, record):
+        with self._lock:
+            if record.ended is not None:
+                return
+            record.ended = time.time()
+        if record.process is not None:
+            record.exit_code = record.process.poll()
+        self._close_pidfd(record)
+        if self.on_exit:
+            self.on_exit(record)
+
+    def _close_pidfd(self, record):
+        fd, record.pidfd = record.pidfd, None
+        if fd is not None:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _watch(self):
+        use_poll = hasattr(select, "poll")
+        poller = select.poll() if use_poll else None
+        wake_fd = self._wake[0]
+        if use_poll:
+            poller.register(wake_fd, select.POLLIN)
+        registered = {}
+
+        while not self._closed:
+            running = self.running()
+            by_fd = {record.pidfd: record for record in running if record.pidfd is not None and use_poll}
+            polled = [record for record in running if record not in by_fd.values()]
+
+            if use_poll:
+                for fd in set(registered) - set(by_fd):
+                    poller.unregister(fd)
+                    del registered[fd]
+                for fd, record in by_fd.items():
+                    if fd not in registered:
+                        poller.register(fd, select.POLLIN)
+                        registered[fd] = record
+                timeout = self.poll_interval * 1000 if polled else None
+                events = poller.poll(timeout)
+            else:
+                readable, _, _ = select.select([wake_fd], [], [], self.poll_interval)
+                events = [(fd, 0) for fd in readable]
+
+            for fd, _ in events:
+                if fd == wake_fd:
+                    os.read(wake_fd, 1024)
+                elif fd in registered:
+                    record = registered.pop(fd)
+                    poller.unregister(fd)
+                    self._mark_exited(record)
+
+            for record in polled:
+                if not self._alive(record):
+                    self._mark_exited(record)
+
+        os.close(wake_fd)
+        os.close(self._wake[1])
@@ -0,0 +1,261 @@
+import os
+import threading
+from collections import deque, namedtuple
+
+import psutil
+
+NODE_DIR = "/sys/devices/system/node"
+
+# Outcome of an admission check. decision is "admit", "queue" or "reject";
+# cores are the host CPUs the VM is pinned to (empty when not pinned), node its NUMA node.
+Admission = namedtuple("Admission", "decision reason cores node")
+
+# Resources held by an admitted VM
+Allocation = namedtuple("Allocation", "vcpus memory cores node")
+
+
+def parse_cpulist(text):
+    """Expand a kernel cpulist such as "0-3,8,10-11" into a list of CPU numbers"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def detect_numa_nodes(node_dir=NODE_DIR):
+    """{node: [cpus]} from sysfs, or a single node holding every usable CPU"""
+    usable = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    nodes = {}
+    try:
+        entries = os.listdir(node_dir)
+    except OSError:
+        entries = []
+    for entry in entries:
+        if entry.startswith("node") and entry[4:].isdigit():
+            try:
+                with open(os.path.join(node_dir, entry, "cpulist")) as f:
+                    cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in usable]
+            except OSError:
+                continue
+            if cpus:
+                nodes[int(entry[4:])] = cpus
+    return nodes or {0: usable}
+
+
+# Binary size suffixes QEMU accepts for -m, as MB multipliers; a bare number is already MB
+SIZE_SUFFIXES = {"k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 ** 2}
+
+# -smp topology keys whose product is the vCPU count when cpus= is not given
+TOPOLOGY_KEYS = ("sockets", "dies", "clusters", "cores", "threads")
+
+
+def parse_smp(value):
+    """vCPU count of an -smp value: "4", "cpus=4,maxcpus=8" or a sockets/cores/threads topology"""
+    options = dict(option.partition("=")[::2] for option in value.split(",") if option)
+    cpus = options.get("cpus") or next((key for key, given in options.items() if not given), None)
+    if cpus:
+        return int(cpus)
+    topology = [int(options[key]) for key in TOPOLOGY_KEYS if key in options]
+    if not topology:
+        raise ValueError(f"No vCPU count in -smp {value}")
+    product = 1
+    for count in topology:
+        product *= count
+    return product
+
+
+def parse_memory(value):
+    """Memory MB of an -m value such as "2048", "2G" or "size=4194304k,maxmem=8G" """
+    options = dict(option.partition("=")[::2] for option in value.split(",") if option)
+    size = options.get("size") or next((key for key, given in options.items() if not given), "")
+    size = size.strip().lower().rstrip("b")
+    multiplier = SIZE_SUFFIXES.get(size[-1:])
+    number = float(size[:-1] if multiplier else size)
+    return int(number * (multiplier or 1))
+
+
+def command_resources(cmdline):
+    """(vcpus, memory MB) requested by a QEMU command line; QEMU's defaults where unparseable"""
+    vcpus, memory = 1, 128
+    for flag, value in zip(cmdline, cmdline[1:]):
+        try:
+            if flag == "-smp":
+                vcpus = parse_smp(value)
+            elif flag == "-m":
+                memory = parse_memory(value)
+        except ValueError:
+            continue
+    return vcpus, memory
+
+
+class VMScheduler:
+    """Admission control for VM launches against host cores and memory.
+
+    A VM is admitted while the vCPUs and memory of all tracked VMs stay within the host's
+    cores x `cpu_overcommit` and RAM x `memory_overcommit` (minus `reserve_memory` MB for
+    the host); otherwise it is queued, or rejected if it could never fit. Without CPU
+    overcommit every vCPU gets a dedicated host core, preferring a single NUMA node
+    (see vm_memory.memory_args for binding guest RAM to it).
+    """
+
+    def __init__(self, cpu_overcommit=1.0, memory_overcommit=1.0, reserve_memory=512, pin=True, nodes=None,
+                 total_memory=None):
+        self.cpu_overcommit = cpu_overcommit
+        self.memory_overcommit = memory_overcommit
+        self.reserve_memory = reserve_memory
+        self.pin = pin
+        self.nodes = nodes or detect_numa_nodes()
+        self.total_memory = total_memory or psutil.virtual_memory().total // 2 ** 20
+        self._lock = threading.Lock()
+        self._allocations = {}
+        self._queue = deque()
+
+    @property
+    def cores(self):
+        return sorted(cpu for cpus in self.nodes.values() for cpu in cpus)
+
+    def capacity(self):
+        """(vCPUs, memory MB) the host may hand out at the configured overcommit ratios"""
+        with self._lock:
+            return self._capacity_locked()
+
+    def committed(self):
+        """(vCPUs, memory MB) held by tracked VMs"""
+        with self._lock:
+            return self._committed_locked()
+
+    def check(self, vcpus, memory):
+        """Decide without reserving anything"""
+        with self._lock:
+            return self._check(vcpus, memory)
+
+    def admit(self, vm_id, vcpus, memory):
+        """Check a launch and, if admitted, reserve its resources under `vm_id`"""
+        with self._lock:
+            admission = self._check(vcpus, memory)
+            if admission.decision == "admit":
+                self._allocations[vm_id] = Allocation(vcpus, memory, admission.cores, admission.node)
+            return admission
+
+    def track(self, vm_id, vcpus, memory):
+        """Account for a VM that was started without admission (e.g. found running at startup)"""
+        with self._lock:
+            self._allocations[vm_id] = Allocation(vcpus, memory, (), None)
+
+    def release(self, vm_id):
+        """Free a VM's resources; returns the queued launches that fit now, in queue order"""
+        with self._lock:
+            self._allocations.pop(vm_id, None)
+            ready = []
+            vcpus, memory = self._committed_locked()
+            cpu_capacity, memory_capacity = self._capacity_locked()
+            free = self._free_memory() if self.memory_overcommit <= 1 else None
+            # Queued launches start in order: a big VM at the head is not overtaken by smaller ones
+            while self._queue:
+                want_vcpus, want_memory, launch = self._queue[0]
+                if vcpus + want_vcpus > cpu_capacity or memory + want_memory > memory_capacity:
+                    break
+                if free is not None:
+                    # Same free-memory check as admission, so the launch is not queued straight back
+                    if free < want_memory:
+                        break
+                    free -= want_memory
+                self._queue.popleft()
+                vcpus, memory = vcpus + want_vcpus, memory + want_memory
+                ready.append(launch)
+            return ready
+
+    def enqueue(self, vcpus, memory, launch, front=False):
+        """Hold `launch()` until enough tracked VMs exit; returns its queue position.
+
+        `front` puts back a launch that left the queue but was not admitted, keeping its turn.
+        """
+        with self._lock:
+            if front:
+                self._queue.appendleft((vcpus, memory, launch))
+                return 1
+            self._queue.append((vcpus, memory, launch))
+            return len(self._queue)
+
+    def queued(self):
+        with self._lock:
+            return len(self._queue)
+
+    def allocation(self, vm_id):
+        with self._lock:
+            return self._allocations.get(vm_id)
+
+    # Placement
+
+    def numa_node(self, admission):
+        """Host node to bind the VM's RAM to, so it stays local to its cores (multi-node hosts only)"""
+        if admission.node is None or len(self.nodes) < 2:
+            return None
+        return admission.node
+
+    def pin_process(self, pid, cores):
+        """Restrict every current thread of the QEMU process to the VM's cores"""
+        if not cores or not isinstance(pid, int):
+            return
+        try:
+            for thread in psutil.Process(pid).threads():
+                os.sched_setaffinity(thread.id, cores)
+        except (psutil.Error, OSError, AttributeError):
+            pass
+
+    def pin_vcpus(self, pid, cores, vcpu_threads):
+        """Give each vCPU thread its own core; other threads share the VM's cores"""
+        self.pin_process(pid, cores)
+        for tid, core in zip(vcpu_threads, cores):
+            try:
+                os.sched_setaffinity(tid, {core})
+            except (OSError, AttributeError):
+                pass
+
+    # Internals (lock held)
+
+    def _committed_locked(self):
+        return (sum(a.vcpus for a in self._allocations.values()),
+                sum(a.memory for a in self._allocations.values()))
+
+    def _capacity_locked(self):
+        return (int(len(self.cores) * self.cpu_overcommit),
+                int(self.total_memory * self.memory_overcommit) - self.reserve_memory)
+
+    def _check(self, vcpus, memory):
+        cpu_capacity, memory_capacity = self._capacity_locked()
+        if vcpus > cpu_capacity:
+            return Admission("reject", f"{vcpus} vCPUs exceed the host's {cpu_capacity} schedulable vCPUs", (), None)
+        if memory > memory_capacity:
+            return Admission("reject", f"{memory} MB exceeds the host's {memory_capacity} MB for VMs", (), None)
+
+        committed_vcpus, committed_memory = self._committed_locked()
+        if committed_vcpus + vcpus > cpu_capacity:
+            return Admission("queue", f"{committed_vcpus} of {cpu_capacity} vCPUs are in use", (), None)
+        if committed_memory + memory > memory_capacity:
+            return Admission("queue", f"{committed_memory} of {memory_capacity} MB are in use", (), None)
+        if self.memory_overcommit <= 1 and self._free_memory() < memory:
+            # Only an exiting VM frees memory here; with none tracked the launch would wait forever
+            decision = "queue" if self._allocations else "reject"
+            return Admission(decision, "not enough free memory on the host right now", (), None)
+
+        cores, node = self._place(vcpus) if self.pin and self.cpu_overcommit <= 1 else ((), None)
+        return Admission("admit", "", cores, node)
+
+    def _free_memory(self):
+        return psutil.virtual_memory().available // 2 ** 20
+
+    def _place(self, vcpus):
+        """Pick free cores, all from one NUMA node when possible"""
+        taken = {core for a in self._allocations.values() for core in a.cores}
+        free = {node: [cpu for cpu in cpus if cpu not in taken] for node, cpus in self.nodes.items()}
+        # Tightest node that fits keeps larger nodes free for larger VMs
+        fitting = sorted((len(cpus), node) for node, cpus in free.items() if len(cpus) >= vcpus)
+        if fitting:
+            node = fitting[0][1]
+            return tuple(free[node][:vcpus]), node
+        spread = [cpu for node in sorted(free) for cpu in free[node]]
+        return (tuple(spread[:vcpus]), None) if len(spread) >= vcpus else ((), None)